@@ -10,17 +10,96 @@ class Config:
     
     # API Retry Settings
     MAX_RETRIES: int = 5
-    RETRY_DELAY: int = 2  # seconds
+    RETRY_DELAY: int = 2  # seconds (base for jittered backoff)
+    RETRY_MAX_DELAY: int = 30  # seconds, backoff cap
+    RETRY_AFTER_MAX: int = 120  # seconds, cap on server Retry-After hints
+    RETRY_BUDGET: int = 200  # max retries per job (all workers combined)
+    
+    # Circuit Breaker (per site)
+    CIRCUIT_FAILURE_THRESHOLD: int = 10  # consecutive failures before opening
+    CIRCUIT_COOLDOWN: int = 30  # seconds before a probe request is allowed
     
     # Batch Processing
     BATCH_SIZE: int = 50
     WORKER_COUNT: int = 20
     CHUNK_SIZE: int = 50
     
+    # Adaptive Concurrency (AIMD, per site & pool)
+    PHASE1_WORKERS: int = 5  # initial concurrent import batches
+    PHASE1_MAX_WORKERS: int = 12  # ceiling for import batches
+    AIMD_WINDOW: int = 20  # successful samples per increase decision
+    AIMD_LATENCY_TOLERANCE: float = 3.0  # healthy if p95 <= baseline median * this
+    AIMD_MAX_ERROR_RATE: float = 0.05
+    AIMD_DECREASE_FACTOR: float = 0.5
+    
+    # HTTP Connection Pool (keep-alive sessions per site)
+    HTTP_POOL_SIZE: int = 20  # default max pooled connections per site
+    ASYNC_CONCURRENCY: int = 100  # max in-flight requests per site (async client)
+    STREAM_CHUNK_BYTES: int = 64 * 1024  # read size for streamed list endpoints
+    
+    # Compression (gzip request bodies; opt-in per site, needs snippet V12.6+)
+    GZIP_REQUESTS: bool = False  # True = compress for every site
+    GZIP_MIN_BYTES: int = 1024  # smaller bodies are sent as-is
+    GZIP_LEVEL: int = 6
+    
+    # Keyset Pagination (get-media-list / get-product-list with after_id)
+    KEYSET_PAGE_SIZE: int = 1000
+    KEYSET_WORKERS: int = 4
+    KEYSET_RANGES_PER_WORKER: int = 4
+    KEYSET_PAGE_RETRIES: int = 3
+    
+    # Local cache (SKU maps and per-site SQLite catalogs)
+    CACHE_DIR: str = "cache"
+    CATALOG_MAX_AGE: int = 300  # seconds before a lookup triggers an incremental refresh
+    CATALOG_WATERMARK_SKEW: int = 120  # seconds of overlap between incremental scans
+    JOURNAL_KEEP_DAYS: int = 14  # job checkpoints (cache/jobs.sqlite) older than this are pruned
+    JOURNAL_STALE_SECONDS: int = 600  # running job without a checkpoint for this long counts as cut off (resumable)
+    
+    # Background Jobs (Supabase job_queue + scripts/job_worker.py)
+    BACKGROUND_JOBS: bool = False  # dashboard default: queue jobs instead of running them in the page
+    JOB_WORKER_CONCURRENCY: int = 2  # jobs one worker process runs at the same time
+    JOB_POLL_SECONDS: float = 3.0  # idle worker: wait between claims
+    JOB_HEARTBEAT_SECONDS: float = 5.0  # running job: progress / heartbeat / cancel check interval
+    JOB_STALE_SECONDS: int = 600  # running job without heartbeat for this long is failed
+    JOB_UI_REFRESH_SECONDS: float = 3.0  # dashboard job panel poll interval
+    
+    # Request Metrics (src/utils/metrics.py)
+    METRICS_FILE: str = "logs/woo_metrics.prom"  # Prometheus text file ("" = don't write)
+    METRICS_FLUSH_INTERVAL: int = 15  # seconds between file rewrites
+    METRICS_LATENCY_BUCKETS: tuple = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+    
     # Timeouts
     IMPORT_TIMEOUT: int = 300  # 5 minutes
     API_TIMEOUT: int = 30  # 30 seconds
     
+    # Import Pipeline
+    IMPORT_PIPELINED: bool = True  # start media drainers after the first successful batch
+    ADAPTIVE_BATCHING: bool = True  # size batches by payload bytes and server time (CHUNK_SIZE = start)
+    BATCH_TARGET_BYTES: int = 512 * 1024  # max JSON payload per batch (before gzip)
+    BATCH_TARGET_SECONDS: float = 10.0  # aim well under API_TIMEOUT
+    BATCH_MIN_SIZE: int = 1
+    BATCH_MAX_SIZE: int = 200
+    BATCH_SPLIT_ATTEMPTS: int = 2  # tries before a failed batch is split in half
+    MEDIA_CLAIM_MAX: int = 10  # products per process-pending-media call (server caps at 25)
+    MEDIA_CLAIM_TARGET_SECONDS: float = 20.0  # per call, far below its 120s timeout
+    MEDIA_IDLE_BACKOFF_MIN: float = 0.5  # first wait on an empty queue, doubled up to the max
+    MEDIA_IDLE_BACKOFF_MAX: float = 10.0
+    PROGRESS_RATE_WINDOW: float = 60.0  # seconds of history behind throughput and ETA
+    PROGRESS_INTERVAL: float = 1.0  # seconds between progress events while waiting on drainers
+    SHEET_FLUSH_ROWS: int = 500  # status updates buffered before a write-back flush
+    SHEET_FLUSH_SECONDS: float = 10.0  # max seconds between flushes while an import runs
+    SHEET_MAX_UPDATES_PER_REQUEST: int = 1000  # ranges per batch_update call
+    SHEET_MAX_REQUEST_BYTES: int = 1024 * 1024  # well under the Sheets API request size limit
+    SHEET_WRITES_PER_MINUTE: int = 50  # write requests/min of this process (Sheets allows 60 per user)
+    SHEET_WRITE_BURST: int = 5  # write requests allowed back to back before pacing starts
+    SHEET_WRITE_ATTEMPTS: int = 5  # per request, retrying 429 and 5xx answers
+    SHEET_SNAPSHOT_CHECK_SECONDS: float = 5.0  # reuse a cached tab this long before re-checking the sheet's revision
+    SHEET_SNAPSHOT_MAX_TABS: int = 16  # cached tab snapshots (LRU)
+    SHEET_HANDLE_TTL_SECONDS: float = 60.0  # reuse opened spreadsheet/worksheet handles (and the tab list) this long
+    IMPORT_SKIP_UNCHANGED: bool = True  # skip rows whose payload hash matches the last successful import
+    IMPORT_PREFLIGHT: bool = True  # validate rows (validators.preflight_products) before sending; bad rows get their error
+    FANOUT_STATUS_HEADER: str = "Status {site}"  # per-site status column of a multi-site import
+    
     # Sleep Delays
     PHASE_DELAY: float = 0.5  # seconds between phases
     WORKER_COMPLETION_DELAY: int = 2  # seconds after workers complete
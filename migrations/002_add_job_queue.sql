@@ -0,0 +1,112 @@
+-- ============================================
+-- POD Automation System - Database Migration
+-- Version: Background Jobs
+-- Date: 2026-10-18
+-- ============================================
+
+-- IMPORTANT: Run this in Supabase SQL Editor
+-- This migration adds the job_queue table used by scripts/job_worker.py:
+-- the dashboard submits jobs, the worker claims and runs them, and the
+-- dashboard polls the table for state, progress, logs and results.
+
+-- ============================================
+-- STEP 1: Create job_queue table
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS job_queue (
+    id BIGSERIAL PRIMARY KEY,
+    kind TEXT NOT NULL                           -- the RUNNERS of src/services/jobs.py
+        CHECK (kind IN ('import', 'import-multi', 'sync', 'delete', 'delete-media', 'media-sync')),
+    site_id BIGINT NOT NULL REFERENCES woo_sites(id) ON DELETE CASCADE,
+    params JSONB NOT NULL DEFAULT '{}'::jsonb,   -- keyword arguments of the runner (src/services/jobs.py)
+    state TEXT NOT NULL DEFAULT 'queued'
+        CHECK (state IN ('queued', 'running', 'done', 'failed', 'cancelled')),
+    progress JSONB,                              -- last progress event {phase, fraction, done, total, ...}
+    logs JSONB,                                  -- log lines of the finished job
+    result JSONB,                                -- {ok, summary, ...}
+    error TEXT,
+    cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+    worker TEXT,                                 -- host:pid of the worker running it
+    created_by TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    started_at TIMESTAMPTZ,
+    heartbeat_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_job_queue_state ON job_queue (state, created_at);
+CREATE INDEX IF NOT EXISTS idx_job_queue_site ON job_queue (site_id, created_at DESC);
+
+COMMENT ON TABLE job_queue IS 'Background jobs submitted by the dashboard and run by scripts/job_worker.py';
+
+-- ============================================
+-- STEP 2: Atomic claim for workers
+-- ============================================
+
+-- Hands the oldest queued job to one worker (SKIP LOCKED: concurrent
+-- workers never get the same row). Running jobs whose worker stopped
+-- sending heartbeats for p_stale_seconds are failed first.
+CREATE OR REPLACE FUNCTION claim_job(p_worker TEXT, p_stale_seconds INTEGER DEFAULT 600)
+RETURNS SETOF job_queue
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE job_queue
+    SET state = 'failed', error = 'Worker stopped responding', finished_at = now()
+    WHERE state = 'running'
+      AND heartbeat_at < now() - make_interval(secs => p_stale_seconds);
+
+    RETURN QUERY
+    UPDATE job_queue
+    SET state = 'running', worker = p_worker, started_at = now(), heartbeat_at = now()
+    WHERE id = (
+        SELECT id FROM job_queue
+        WHERE state = 'queued'
+        ORDER BY created_at
+        FOR UPDATE SKIP LOCKED
+        LIMIT 1
+    )
+    RETURNING *;
+END;
+$$;
+
+-- ============================================
+-- STEP 3: Verify migration
+-- ============================================
+
+SELECT
+    column_name,
+    data_type,
+    is_nullable
+FROM information_schema.columns
+WHERE table_name = 'job_queue'
+ORDER BY ordinal_position;
+
+-- Expected: a job submitted from the dashboard shows up as 'queued'
+-- SELECT id, kind, state, created_at FROM job_queue ORDER BY id DESC LIMIT 5;
+
+-- ============================================
+-- STEP 4: Cleanup (OPTIONAL - periodic)
+-- ============================================
+
+-- Finished jobs are kept for history; delete old ones when needed:
+-- DELETE FROM job_queue
+-- WHERE state IN ('done', 'failed', 'cancelled')
+--   AND finished_at < now() - interval '30 days';
+
+-- ============================================
+-- ROLLBACK (Emergency Only)
+-- ============================================
+
+-- DROP FUNCTION IF EXISTS claim_job(TEXT, INTEGER);
+-- DROP TABLE IF EXISTS job_queue;
+
+-- ============================================
+-- Migration Complete!
+-- ============================================
+
+-- After running this migration:
+-- 1. Start a worker: python scripts/job_worker.py
+-- 2. Turn on "Run jobs in background" in the dashboard sidebar settings
+-- 3. Start an import and reload the page: the job keeps running and
+--    shows up again under "Background jobs"
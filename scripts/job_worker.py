@@ -0,0 +1,69 @@
+"""
+Background job worker: runs the jobs the dashboard queues in Supabase.
+
+    python scripts/job_worker.py [--concurrency 2] [--once]
+
+Needs migrations/002_add_job_queue.sql and the same .streamlit/secrets.toml
+as the app. Each slot claims the oldest queued job (claim_job() in
+Postgres, so several workers can share one queue), runs it through
+src/services/jobs.py and stores state, progress, logs and result in
+job_queue. Start as many workers as the box can take; stop with Ctrl+C
+(running jobs finish first).
+"""
+
+import argparse
+import os
+import socket
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from src.repositories import db
+from src.services import jobs
+from src.utils.logger import logger
+
+
+def work(worker_id, stopping, once=False):
+    """One slot: claim, run, repeat until `stopping` is set (or the queue is empty with once=True)."""
+    while not stopping.is_set():
+        job = db.claim_job(worker_id)
+        if job is None:
+            if once:
+                return
+            stopping.wait(Config.JOB_POLL_SECONDS)
+            continue
+        logger.info(f"[{worker_id}] Running job #{job['id']} ({job['kind']}) for site {job['site_id']}")
+        # Re-read sites per job so new sites and changed credentials are picked up
+        jobs.run_queued(job, db.get_all_sites())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run queued dashboard jobs.")
+    parser.add_argument("--concurrency", type=int, default=Config.JOB_WORKER_CONCURRENCY,
+                        help="jobs run at the same time")
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = parser.parse_args(argv)
+
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    stopping = threading.Event()
+    slots = [threading.Thread(target=work, args=(f"{name}/{i}", stopping, args.once), name=f"job-slot-{i}")
+             for i in range(max(1, args.concurrency))]
+    logger.info(f"Job worker {name} started with {len(slots)} slots")
+    for t in slots:
+        t.start()
+    try:
+        for t in slots:
+            while t.is_alive():
+                t.join(1)
+    except KeyboardInterrupt:
+        logger.info(f"Job worker {name} stopping; waiting for running jobs")
+        stopping.set()
+        for t in slots:
+            t.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
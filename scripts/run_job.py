@@ -0,0 +1,163 @@
+"""
+Run a dashboard job from the command line (cron, tmux, a bigger box).
+
+    python scripts/run_job.py sites
+    python scripts/run_job.py import --site "My Shop" --tab Action [--filter 55,56] [--force-all] [--resume]
+    python scripts/run_job.py import --site "My Shop" --to-site "Shop 2" --to-site "Shop 3" --tab Action
+    python scripts/run_job.py sync --site "My Shop" --tab Action
+    python scripts/run_job.py delete --site "My Shop" --ids 101,102 [--tab Action]
+    python scripts/run_job.py delete --site "My Shop" --wipe --yes [--tab Action]
+    python scripts/run_job.py delete-media --site "My Shop" --yes
+    python scripts/run_job.py media-sync --site "My Shop" --tab UpdateImage [--limit 5000]
+
+Sites come from the Supabase woo_sites table (credentials in
+.streamlit/secrets.toml, same as the app); --site takes the id, the name
+or the domain. stdout is JSON lines: {"event": "progress", ...} while the
+job runs, then {"event": "log", ...} lines and one {"event": "result", ...}.
+
+Exit codes: 0 ok, 1 job failed, 2 bad arguments or site config,
+3 unexpected error, 130 interrupted.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+EXIT_OK, EXIT_FAILED, EXIT_USAGE, EXIT_ERROR, EXIT_INTERRUPTED = 0, 1, 2, 3, 130
+
+_out = None  # the JSON stream, pinned by main() before stray print()s are sent to stderr
+
+
+def emit(event, **data):
+    print(json.dumps({"event": event, "ts": round(time.time(), 3), **data}, ensure_ascii=False, default=str),
+          file=_out or sys.stdout, flush=True)
+
+
+def split_list(value):
+    return [x.strip() for x in value.replace('\n', ',').split(',') if x.strip()] if value else []
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run POD automation jobs without the dashboard.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("sites", help="list configured sites")
+
+    def job(name, help_text, tab=True, threads=None):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--site", required=True, help="site id, name or domain")
+        if tab:
+            p.add_argument("--tab", required=True, help="worksheet name")
+        if threads:
+            p.add_argument("--threads", type=int, default=threads)
+        p.add_argument("--progress-interval", type=float, default=2.0,
+                       help="min seconds between progress lines (0 = every event)")
+        return p
+
+    p = job("import", "import sheet rows to WooCommerce", threads=15)
+    p.add_argument("--filter", help="comma separated ID/SKU prefixes")
+    p.add_argument("--force-all", action="store_true", help="also send rows unchanged since their last import")
+    p.add_argument("--resume", action="store_true", help="continue the last unfinished import of this tab")
+    p.add_argument("--to-site", action="append", default=[],
+                   help="also import the sheet into this site (repeatable; statuses go to per-site columns)")
+
+    job("sync", "mark sheet rows Done/Holding from the site's SKU list", threads=20)
+
+    p = job("delete", "delete products (and mark their rows Holding)", tab=False, threads=10)
+    p.add_argument("--tab", help="worksheet to mark deleted rows in")
+    p.add_argument("--ids", help="comma separated product IDs")
+    p.add_argument("--wipe", action="store_true", help="delete every published product")
+    p.add_argument("--yes", action="store_true", help="confirm --wipe")
+
+    p = job("delete-media", "delete every media library item", tab=False, threads=10)
+    p.add_argument("--yes", action="store_true", help="confirm")
+
+    p = job("media-sync", "sync the media library with an image tab")
+    p.add_argument("--limit", type=int, default=5000)
+    return parser
+
+
+def job_params(args):
+    if args.command == "import" and args.to_site:
+        return dict(tab=args.tab, site_ids=[args.site] + args.to_site, threads=args.threads,
+                    filter_ids=split_list(args.filter), force_all=args.force_all, resume=args.resume)
+    if args.command == "import":
+        return dict(tab=args.tab, threads=args.threads, filter_ids=split_list(args.filter),
+                    force_all=args.force_all, resume=args.resume)
+    if args.command == "sync":
+        return dict(tab=args.tab, threads=args.threads)
+    if args.command == "delete":
+        if args.wipe and not args.yes:
+            raise ValueError("--wipe needs --yes")
+        return dict(ids=split_list(args.ids), wipe=args.wipe, tab=args.tab, threads=args.threads)
+    if args.command == "delete-media":
+        if not args.yes:
+            raise ValueError("delete-media needs --yes")
+        return dict(threads=args.threads)
+    if args.command == "media-sync":
+        return dict(tab=args.tab, limit=args.limit)
+    raise ValueError(f"unknown command {args.command}")
+
+
+def main(argv=None):
+    global _out
+    args = build_parser().parse_args(argv)  # exits with 2 on bad arguments
+    _out = sys.stdout
+    # Streamlit-backed modules print connection debug lines on import; keep stdout pure JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        from src.repositories import db
+        from src.services import jobs
+
+    if args.command == "sites":
+        with contextlib.redirect_stdout(sys.stderr):
+            sites = db.get_all_sites()
+        for s in sites:
+            emit("site", id=s.get('id'), name=s.get('site_name'), domain=s.get('domain_url'))
+        return EXIT_OK if sites else EXIT_USAGE
+
+    try:
+        params = job_params(args)
+        with contextlib.redirect_stdout(sys.stderr):
+            site = jobs.find_site(args.site)
+    except (ValueError, jobs.JobError) as e:
+        emit("result", ok=False, error=str(e))
+        return EXIT_USAGE
+
+    last = [0.0]
+
+    def on_progress(data):
+        now = time.monotonic()
+        if now - last[0] >= args.progress_interval or data.get('fraction') == 1.0:
+            last[0] = now
+            emit("progress", job=args.command, **data)
+
+    emit("start", job=args.command, site=site.get('site_name'), params=params)
+    started = time.monotonic()
+    try:
+        with contextlib.redirect_stdout(sys.stderr):  # services still print() in places
+            kind = "import-multi" if 'site_ids' in params else args.command
+            result = jobs.run_job(kind, site, params, progress=on_progress)
+    except jobs.JobError as e:
+        emit("result", ok=False, error=str(e))
+        return EXIT_USAGE
+    except KeyboardInterrupt:
+        emit("result", ok=False, error="interrupted")
+        return EXIT_INTERRUPTED
+    except Exception as e:
+        emit("result", ok=False, error=f"{type(e).__name__}: {e}")
+        return EXIT_ERROR
+
+    for line in result.get('logs', []):
+        emit("log", message=line)
+    extra = {k: v for k, v in result.items() if k not in ('logs',)}
+    emit("result", seconds=round(time.monotonic() - started, 1), **extra)
+    return EXIT_OK if result['ok'] else EXIT_FAILED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
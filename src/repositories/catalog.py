@@ -0,0 +1,333 @@
+"""
+Persistent per-site product catalog (SQLite under Config.CACHE_DIR).
+
+Keeps ID, SKU, status, title, modified time and image count for every
+non-trashed product so existence checks, filtered deletes and searches are
+local lookups. refresh() is incremental on snippets V12.6+: a keyset scan
+of products modified since the last watermark, plus the get-all-skus delta
+to drop products that were deleted or trashed. Snippets without the SKU
+change token get a full keyset rescan on every refresh; without keyset
+support there is no catalog and callers go to the REST API as before.
+
+The same file keeps the payload hash of the last successful import per
+SKU (import_hashes), which refresh() never touches.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Set, Tuple
+from config import Config
+from src.repositories import woo
+from src.utils.logger import logger
+from src.utils.prefix_index import PrefixIndex
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    sku TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT '',
+    title TEXT NOT NULL DEFAULT '',
+    modified TEXT,
+    image_count INTEGER NOT NULL DEFAULT 0,
+    image TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_products_sku ON products (sku);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS import_hashes (
+    sku TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    imported_at REAL NOT NULL
+);
+"""
+
+# One refresh at a time per site (Streamlit reruns can overlap)
+_refresh_locks: Dict[str, threading.Lock] = {}
+_refresh_locks_guard = threading.Lock()
+
+# Case-folded PrefixIndex of ids and SKUs per site, with the (refreshed_at, changed_at) it was built at
+_indexes: Dict[str, Tuple[Tuple[Optional[str], Optional[str]], PrefixIndex]] = {}
+_indexes_lock = threading.Lock()
+
+# Database files whose schema is in place (see _ensure_schema)
+_ready_paths: Set[str] = set()
+_ready_lock = threading.Lock()
+
+
+def _site_key(domain):
+    return domain.rstrip('/').lower()
+
+
+def db_path(domain):
+    digest = hashlib.sha1(_site_key(domain).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(Config.CACHE_DIR, f"catalog_{digest}.sqlite")
+
+
+def _ensure_schema(path):
+    """Create the tables and switch the file to WAL (persistent) once per path and process."""
+    if path in _ready_paths and os.path.exists(path):
+        return
+    with _ready_lock:
+        if path in _ready_paths and os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+        _ready_paths.add(path)
+
+
+@contextmanager
+def _connect(domain):
+    path = db_path(domain)
+    _ensure_schema(path)
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        with conn:  # commit / rollback
+            yield conn
+    finally:
+        conn.close()
+
+
+def _get_meta(conn, key):
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_meta(conn, **values):
+    conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                     [(k, None if v is None else str(v)) for k, v in values.items()])
+
+
+def _prefix_index(domain, conn):
+    """The site's id/SKU PrefixIndex, rebuilt only after a refresh or remove_ids moved the catalog."""
+    key = _site_key(domain)
+    version = (_get_meta(conn, 'refreshed_at'), _get_meta(conn, 'changed_at'))
+    with _indexes_lock:
+        cached = _indexes.get(key)
+    if cached and cached[0] == version:
+        return cached[1]
+    keys = conn.execute("SELECT id, sku FROM products").fetchall()
+    index = PrefixIndex([(str(i), i) for i, _ in keys] + [(sku, i) for i, sku in keys if sku], fold_case=True)
+    with _indexes_lock:
+        _indexes[key] = (version, index)
+    return index
+
+
+def _drop_index(domain):
+    with _indexes_lock:
+        _indexes.pop(_site_key(domain), None)
+
+
+def _row(item):
+    return (int(item['id']), str(item.get('sku') or ''), str(item.get('status') or ''),
+            str(item.get('name') or ''), item.get('modified'), int(item.get('image_count') or 0),
+            str(item.get('image') or ''))
+
+
+def _upsert(conn, items):
+    conn.executemany(
+        "INSERT OR REPLACE INTO products (id, sku, status, title, modified, image_count, image) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", [_row(i) for i in items])
+
+
+def _next_watermark(server_date, items, current):
+    """
+    Server clock at scan start (minus a skew margin) so edits made while the
+    scan ran are picked up next time; falls back to the newest modified seen.
+    modified_after is inclusive, so overlap only means a few re-upserts.
+    """
+    try:
+        start = parsedate_to_datetime(server_date).astimezone(timezone.utc)
+        return (start - timedelta(seconds=Config.CATALOG_WATERMARK_SKEW)).strftime('%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError):
+        stamps = [i['modified'] for i in items if i.get('modified')]
+        if current:
+            stamps.append(current)
+        return max(stamps) if stamps else None
+
+
+# --- REFRESH ---
+def refresh(domain, secret, full=False, policy=None):
+    """
+    Bring the local catalog up to date. Returns a short summary string;
+    raises WooStreamError if the site could not be read (the existing
+    catalog is left untouched in that case).
+    """
+    key = _site_key(domain)
+    with _refresh_locks_guard:
+        lock = _refresh_locks.setdefault(key, threading.Lock())
+    with lock:
+        head = woo.fetch_product_list_head(domain, secret, policy)
+        token = head['token']
+        with _connect(domain) as conn:
+            old_token = _get_meta(conn, 'sku_token')
+            watermark = _get_meta(conn, 'modified_watermark')
+        incremental = not full and token is not None and old_token is not None and watermark
+        if incremental:
+            delta = woo.fetch_sku_delta(domain, secret, old_token, policy=policy)
+            if delta is None:
+                incremental = False  # token expired: rescan
+        if not incremental:
+            return _full_refresh(domain, secret, head, policy)
+
+        changed = list(woo.iter_products_keyset(domain, secret, policy=policy, modified_after=watermark))
+        seen = {int(i['id']) for i in changed}
+        gone = [int(pid) for pid, _ in delta.get('removed', []) if int(pid) not in seen]
+        with _connect(domain) as conn:
+            _upsert(conn, changed)
+            # Unpublished products show up in `changed` (still listed); the rest are deleted/trashed
+            conn.executemany("DELETE FROM products WHERE id = ?", [(pid,) for pid in gone])
+            _set_meta(conn, sku_token=delta['token'], refreshed_at=time.time(),
+                      modified_watermark=_next_watermark(head['date'], changed, watermark))
+        _drop_index(domain)
+        msg = f"Catalog refreshed: {len(changed)} changed, {len(gone)} removed"
+        logger.info(f"{key}: {msg}")
+        return msg
+
+
+def _full_refresh(domain, secret, head, policy):
+    items = list(woo.iter_products_keyset(domain, secret, policy=policy))
+    with _connect(domain) as conn:
+        conn.execute("DELETE FROM products")
+        _upsert(conn, items)
+        _set_meta(conn, sku_token=head['token'], refreshed_at=time.time(),
+                  modified_watermark=_next_watermark(head['date'], items, None))
+    _drop_index(domain)
+    msg = f"Catalog rebuilt: {len(items)} products"
+    logger.info(f"{_site_key(domain)}: {msg}")
+    return msg
+
+
+def age(domain):
+    """Seconds since the last successful refresh (None if never refreshed)."""
+    if not os.path.exists(db_path(domain)):
+        return None
+    with _connect(domain) as conn:
+        at = _get_meta(conn, 'refreshed_at')
+    return time.time() - float(at) if at else None
+
+
+def ensure_fresh(domain, secret, max_age=None, policy=None):
+    """
+    Refresh if older than max_age (Config.CATALOG_MAX_AGE). Returns True if
+    the local catalog can be used, False if it is missing and the site could
+    not be read (callers then go to the REST API directly).
+    """
+    max_age = Config.CATALOG_MAX_AGE if max_age is None else max_age
+    current = age(domain)
+    if current is not None and current <= max_age:
+        return True
+    try:
+        refresh(domain, secret, policy=policy)
+        return True
+    except woo.WooStreamError as e:
+        logger.warning(f"Catalog refresh failed: {e}")
+        return current is not None  # stale data beats none for lookups
+
+
+# --- LOCAL QUERIES ---
+def exists(domain, id_or_sku):
+    """True/False from the local catalog (published or not), None if there is no catalog yet."""
+    if age(domain) is None:
+        return None
+    value = str(id_or_sku).strip()
+    with _connect(domain) as conn:
+        if value.isdigit() and conn.execute("SELECT 1 FROM products WHERE id = ?", (int(value),)).fetchone():
+            return True
+        return conn.execute("SELECT 1 FROM products WHERE sku = ? LIMIT 1", (value,)).fetchone() is not None
+
+
+def search(domain, prefixes=None, limit=50):
+    """
+    Newest-first products whose ID or SKU starts with any of `prefixes`,
+    shaped like get-product-list items (id, name, sku, status, image, ...).
+    """
+    sql = "SELECT id, title, sku, status, image, modified, image_count FROM products"
+    prefixes = [p for p in (prefixes or []) if p and str(p).strip()]
+    with _connect(domain) as conn:
+        if not prefixes:
+            rows = conn.execute(sql + " ORDER BY id DESC" + (" LIMIT ?" if limit else ""),
+                                [int(limit)] if limit else []).fetchall()
+        else:
+            # Thousands of pasted prefixes: one PrefixIndex lookup instead of an OR of LIKEs (case-insensitive, as LIKE)
+            ids = sorted(_prefix_index(domain, conn).match(prefixes), reverse=True)[:limit or None]
+            rows = []
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows += conn.execute(f"{sql} WHERE id IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+            rows.sort(key=lambda r: r[0], reverse=True)
+    return [{"id": r[0], "name": r[1], "sku": r[2], "status": r[3], "image": r[4],
+             "modified": r[5], "image_count": r[6]} for r in rows]
+
+
+def count(domain):
+    with _connect(domain) as conn:
+        return conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+
+def remove_ids(domain, ids):
+    """Drop products we just deleted ourselves, so lookups are right before the next refresh."""
+    if not ids or age(domain) is None:
+        return
+    with _connect(domain) as conn:
+        conn.executemany("DELETE FROM products WHERE id = ?", [(int(i),) for i in ids if str(i).isdigit()])
+        _set_meta(conn, changed_at=time.time())  # other processes' cached indexes are stale too
+    _drop_index(domain)
+
+
+# --- IMPORT HASHES ---
+def get_import_hashes(domain):
+    """{sku: payload hash} of every SKU imported successfully from this machine."""
+    if not os.path.exists(db_path(domain)):
+        return {}
+    with _connect(domain) as conn:
+        return dict(conn.execute("SELECT sku, hash FROM import_hashes").fetchall())
+
+
+def save_import_hashes(domain, hashes):
+    """Remember {sku: hash} after the server confirmed those products."""
+    if not hashes:
+        return
+    now = time.time()
+    with _connect(domain) as conn:
+        conn.executemany("INSERT OR REPLACE INTO import_hashes (sku, hash, imported_at) VALUES (?, ?, ?)",
+                         [(str(sku), h, now) for sku, h in hashes.items()])
+
+
+def forget_import_hashes(domain, skus=None):
+    """Drop stored hashes (all of them when skus is None) so those rows are sent again."""
+    if not os.path.exists(db_path(domain)):
+        return
+    with _connect(domain) as conn:
+        if skus is None:
+            conn.execute("DELETE FROM import_hashes")
+        else:
+            conn.executemany("DELETE FROM import_hashes WHERE sku = ?", [(str(s),) for s in skus])
+
+
+def clear(domain):
+    _drop_index(domain)
+    _ready_paths.discard(db_path(domain))
+    for suffix in ('', '-wal', '-shm'):
+        try:
+            os.remove(db_path(domain) + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def product_exists(domain, secret, sku, policy=None):
+    """check_product_exists answered locally when the catalog is fresh; REST call otherwise."""
+    if ensure_fresh(domain, secret, policy=policy):
+        found = exists(domain, sku)
+        if found is not None:
+            return found
+    return woo.check_product_exists(domain, secret, sku, policy=policy)
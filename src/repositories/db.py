@@ -7,9 +7,18 @@ import pandas as pd
 from google.oauth2 import service_account
 import bcrypt
 import secrets
-from datetime import datetime, timedelta
-from typing import Tuple, Optional, List, Dict
+import re
+import threading
+import time
+from functools import lru_cache
+from collections import OrderedDict
+from gspread.utils import a1_range_to_grid_range, rowcol_to_a1
+from datetime import datetime, timedelta, timezone
+from typing import Any, Tuple, Optional, List, Dict
 from src.utils.logger import logger
+from src.utils.common import col_idx_to_letter
+from src.utils.concurrency import TokenBucket
+from src.utils.retry import RetryPolicy, RETRY_STATUSES
 from config import Config
 
 # --- 1. CONFIGURATION ---
@@ -37,7 +46,7 @@ def init_supabase():
         return None
 
 @st.cache_resource
-def init_google_sheets():
+def _google_credentials():
     try:
         if "google" not in st.secrets or "service_account_base64" not in st.secrets["google"]:
             st.error("Missing Google Credentials in secrets.toml")
@@ -47,12 +56,75 @@ def init_google_sheets():
         json_str = base64.b64decode(b64_json).decode("utf-8")
         service_account_info = json.loads(json_str)
         scopes = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-        creds = service_account.Credentials.from_service_account_info(service_account_info, scopes=scopes)
-        return gspread.authorize(creds)
+        return service_account.Credentials.from_service_account_info(service_account_info, scopes=scopes)
     except Exception as e:
         st.error(f"Google Sheets Connection Error: {e}")
         return None
 
+_sheet_clients = threading.local()
+
+def init_google_sheets():
+    """gspread client of the calling thread: a client's HTTP session is not safe to share between worker threads."""
+    gc = getattr(_sheet_clients, 'gc', None)
+    if gc is None:
+        creds = _google_credentials()
+        if not creds: return None
+        try:
+            gc = _sheet_clients.gc = gspread.authorize(creds)
+        except Exception as e:
+            logger.error(f"Google Sheets client error: {e}")
+            return None
+    return gc
+
+# Worksheet handle pool: sheet_id -> (Spreadsheet, {tab title: worksheet properties}, monotonic open time).
+# Opening a spreadsheet costs two metadata calls (open_by_key + sheet metadata) that count against the
+# same per-minute quota as our writes; pooled handles skip them for Config.SHEET_HANDLE_TTL_SECONDS.
+_handles: Dict[str, Tuple[gspread.Spreadsheet, Dict[str, Dict], float]] = {}
+_handle_lock = threading.Lock()  # guards the dicts only, never held across a network call
+_open_locks: Dict[str, threading.Lock] = {}  # sheet_id -> lock held while that spreadsheet is (re)opened
+
+def _fresh_handle(entry):
+    return entry is not None and time.monotonic() - entry[2] < Config.SHEET_HANDLE_TTL_SECONDS
+
+def _sheet_handles(gc, sheet_id, refresh=False):
+    with _handle_lock:
+        entry = _handles.get(sheet_id)
+        if not refresh and _fresh_handle(entry):
+            return entry
+        open_lock = _open_locks.setdefault(sheet_id, threading.Lock())
+    with open_lock:  # one metadata fetch per spreadsheet; other spreadsheets are not held up
+        with _handle_lock:
+            current = _handles.get(sheet_id)
+        if current is not entry and _fresh_handle(current):
+            return current  # another thread (re)opened it while we waited
+        sh = gc.open_by_key(sheet_id)
+        tabs = {ws['properties']['title']: ws['properties'] for ws in sh.fetch_sheet_metadata()['sheets']}
+        entry = (sh, tabs, time.monotonic())
+        with _handle_lock:
+            _handles[sheet_id] = entry
+        return entry
+
+def open_worksheet(sheet_id, tab_name):
+    """
+    Same as init_google_sheets().open_by_key(sheet_id).worksheet(tab_name), but
+    built from the handle pool (no metadata call while the entry is fresh) and
+    bound to the calling thread's client. Raises on connection errors and
+    gspread.WorksheetNotFound.
+    """
+    gc = init_google_sheets()
+    if not gc: raise ConnectionError("Google Sheets connection failed")
+    sh, tabs, _ = _sheet_handles(gc, sheet_id)
+    if tab_name not in tabs:  # created after the pool entry was opened?
+        sh, tabs, _ = _sheet_handles(gc, sheet_id, refresh=True)
+        if tab_name not in tabs: raise gspread.WorksheetNotFound(tab_name)
+    return gspread.Worksheet(sh, tabs[tab_name], sheet_id, gc.http_client)
+
+def invalidate_handles(sheet_id=None):
+    """Drop pooled handles of one spreadsheet (or all), e.g. after a tab was renamed or a write failed."""
+    with _handle_lock:
+        if sheet_id is None: _handles.clear()
+        else: _handles.pop(sheet_id, None)
+
 # --- 3. DATA ACCESS FUNCTIONS ---
 
 def get_all_sites():
@@ -73,8 +145,7 @@ def get_worksheet_titles(sheet_id):
     client = init_google_sheets()
     if not client: return []
     try:
-        sh = client.open_by_key(sheet_id)
-        return [ws.title for ws in sh.worksheets()]
+        return list(_sheet_handles(client, sheet_id)[1])
     except Exception as e:
         logger.error(f"Error fetching worksheets for {sheet_id}: {e}")
         st.error(f"Could not load Sheet Tabs: {e}")
@@ -201,25 +272,279 @@ def check_admin_login(username: str, password: str) -> bool:
         return False
 
 # --- 4. SHEET UPDATE FUNCTIONS (GIỮ NGUYÊN) ---
+# Every write request of this process draws from one bucket: the Sheets write quota is per service account
+_write_quota = TokenBucket(Config.SHEET_WRITES_PER_MINUTE / 60.0, Config.SHEET_WRITE_BURST)
+_write_retry = RetryPolicy(max_attempts=Config.SHEET_WRITE_ATTEMPTS, budget=None)
+
+
+def _sheets_write(send):
+    """Run one write request under the write quota, retrying 429/5xx answers with backoff."""
+    delay = Config.RETRY_DELAY
+    for attempt in range(1, Config.SHEET_WRITE_ATTEMPTS + 1):
+        _write_quota.acquire()
+        try:
+            return send()
+        except gspread.exceptions.APIError as e:
+            status = e.response.status_code
+            if status not in RETRY_STATUSES or attempt == Config.SHEET_WRITE_ATTEMPTS:
+                raise
+            delay = _write_retry.delay_for(status, e.response.headers, delay)
+            logger.warning(f"Sheets write got {status}, retry {attempt}/{Config.SHEET_WRITE_ATTEMPTS} in {delay:.1f}s")
+            if status == 429:
+                _write_quota.hold(delay)  # the quota is shared: pause every writer, not just this one
+            time.sleep(delay)
+
+
+_A1_BOUNDED = re.compile(r"\$?([A-Z]+)\$?(\d+)(?::\$?[A-Z]+\$?\d+)?")
+
+
+@lru_cache(maxsize=1024)
+def _col_index(letters):
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n - 1
+
+
+def _block_update(row, col, rows):
+    """{'range', 'values'} for a block of values whose top-left cell is (row, col), 0-based."""
+    start = rowcol_to_a1(row + 1, col + 1)
+    end = rowcol_to_a1(row + len(rows), col + len(rows[0]))
+    return {'range': start if start == end else f"{start}:{end}", 'values': rows}
+
+
+def coalesce_updates(updates, max_bytes=None):
+    """
+    Merge [{'range', 'values'}] updates into as few rectangular ranges as
+    possible: cells become runs of consecutive rows per column, and runs over
+    the same rows in adjacent columns become one block. A later update of a
+    cell wins; None cells are left out (the API skips them as well). Blocks
+    over max_bytes (Config.SHEET_MAX_REQUEST_BYTES) are cut into row slices.
+    If any range is not a plain A1 cell or range, updates are returned as is.
+    """
+    max_bytes = max_bytes or Config.SHEET_MAX_REQUEST_BYTES
+    cells = {}
+    for u in updates:
+        m = _A1_BOUNDED.fullmatch(str(u['range']).upper())
+        if not m:
+            return list(updates)  # sheet-qualified or open-ended range: nothing to merge safely
+        r0, c0 = int(m.group(2)) - 1, _col_index(m.group(1))
+        for dr, row in enumerate(u['values']):
+            for dc, v in enumerate(row):
+                if v is not None:
+                    cells[(r0 + dr, c0 + dc)] = v
+
+    rows_by_col = {}
+    for r, c in cells:
+        rows_by_col.setdefault(c, []).append(r)
+    runs = {}  # (first row, last row) -> columns having exactly that run
+    for c, rows in rows_by_col.items():
+        rows.sort()
+        first = last = rows[0]
+        for r in rows[1:] + [None]:
+            if r is not None and r == last + 1:
+                last = r
+                continue
+            runs.setdefault((first, last), []).append(c)
+            first = last = r
+    blocks = []
+    for (first, last), cols in runs.items():
+        cols.sort()
+        c_first = c_last = cols[0]
+        for c in cols[1:] + [None]:
+            if c is not None and c == c_last + 1:
+                c_last = c
+                continue
+            blocks.append((first, c_first, last, c_last))
+            c_first = c_last = c
+
+    merged = []
+    for r0, c0, r1, c1 in sorted(blocks):
+        rows = [[cells[(r, c)] for c in range(c0, c1 + 1)] for r in range(r0, r1 + 1)]
+        if len(json.dumps(rows, default=str)) <= max_bytes:
+            merged.append(_block_update(r0, c0, rows))
+            continue
+        start, size = 0, 0
+        for i, row in enumerate(rows):
+            n = len(json.dumps(row, default=str)) + 2
+            if i > start and size + n > max_bytes:
+                merged.append(_block_update(r0 + start, c0, rows[start:i]))
+                start, size = i, 0
+            size += n
+        merged.append(_block_update(r0 + start, c0, rows[start:]))
+    return merged
+
+
+def _write_requests(updates):
+    """Split updates into batch_update requests within SHEET_MAX_UPDATES_PER_REQUEST / SHEET_MAX_REQUEST_BYTES."""
+    request, size = [], 0
+    for u in updates:
+        n = len(json.dumps(u['values'], default=str)) + len(u['range']) + 32
+        if request and (len(request) >= Config.SHEET_MAX_UPDATES_PER_REQUEST or size + n > Config.SHEET_MAX_REQUEST_BYTES):
+            yield request
+            request, size = [], 0
+        request.append(u)
+        size += n
+    if request:
+        yield request
+
+
 def update_sheet_batch(sheet_id, tab_name, updates):
+    """
+    True once the sheet accepted every update (or there was nothing to write).
+    Updates are coalesced into rectangular ranges and sent as paced requests;
+    on False, requests before the failing one may already be written.
+    """
+    if not updates: return True
     gc = init_google_sheets()
-    if not gc or not updates: return
+    if not gc: return False
+    merged = coalesce_updates(updates)
     try:
-        sh = gc.open_by_key(sheet_id)
-        ws = sh.worksheet(tab_name)
-        ws.batch_update(updates)
+        ws = open_worksheet(sheet_id, tab_name)
+        for request in _write_requests(merged):
+            _sheets_write(lambda: ws.batch_update(request))
     except Exception as e:
         print(f"Batch Update Error: {e}")
+        invalidate_handles(sheet_id)
+        return False
+    _patch_snapshot(gc, sheet_id, tab_name, merged)
+    return True
+
+def ensure_columns(sheet_id, tab_name, headers):
+    """{header: column letter}, appending missing headers after the last column. None on error."""
+    gc = init_google_sheets()
+    if not gc: return None
+    try:
+        ws = open_worksheet(sheet_id, tab_name)
+        current = [str(h).strip() for h in ws.row_values(1)]
+        missing = [h for h in headers if h not in current]
+        if missing:
+            if len(current) + len(missing) > ws.col_count:
+                _sheets_write(lambda: ws.add_cols(len(current) + len(missing) - ws.col_count))
+            header_update = [{'range': f"{col_idx_to_letter(len(current))}1", 'values': [missing]}]
+            _sheets_write(lambda: ws.batch_update(header_update))
+            _patch_snapshot(gc, sheet_id, tab_name, header_update)
+            current += missing
+        return {h: col_idx_to_letter(current.index(h)) for h in headers}
+    except Exception as e:
+        print(f"Column Setup Error: {e}")
+        invalidate_handles(sheet_id)
+        return None
 
 def update_row_status(sheet_id, tab_name, row_index, status_message):
     gc = init_google_sheets()
     if not gc: return
     try:
-        sh = gc.open_by_key(sheet_id)
-        ws = sh.worksheet(tab_name)
-        ws.update_cell(row_index, 1, str(status_message))
+        ws = open_worksheet(sheet_id, tab_name)
+        _sheets_write(lambda: ws.update_cell(row_index, 1, str(status_message)))
     except Exception as e:
         print(f"Row Update Error: {e}")
+        invalidate_handles(sheet_id)
+        return
+    _patch_snapshot(gc, sheet_id, tab_name, [{'range': f"A{row_index}", 'values': [[str(status_message)]]}])
+
+
+# --- 4b. SHEET SNAPSHOT CACHE ---
+# (sheet_id, tab) -> [values, Drive modifiedTime, monotonic time of the last check]; LRU order
+_snapshots: 'OrderedDict[Tuple[str, str], List[Any]]' = OrderedDict()
+_snapshot_lock = threading.Lock()
+
+
+def _sheet_revision(gc, sheet_id):
+    """Drive modifiedTime of the spreadsheet (one cheap metadata call), None if unavailable."""
+    try:
+        return gc.get_file_drive_metadata(sheet_id).get('modifiedTime')
+    except Exception as e:
+        logger.warning(f"Could not read revision of sheet {sheet_id}: {e}")
+        return None
+
+
+def get_sheet_values(sheet_id, tab_name):
+    """
+    All values of a tab, like ws.get_all_values(), served from a snapshot
+    cache while the spreadsheet's Drive modifiedTime is unchanged (checked
+    at most every Config.SHEET_SNAPSHOT_CHECK_SECONDS). The returned lists
+    are shared: treat them as read-only. Raises on connection/API errors.
+    """
+    key = (sheet_id, tab_name)
+    with _snapshot_lock:
+        snap = _snapshots.get(key)
+        if snap and time.monotonic() - snap[2] < Config.SHEET_SNAPSHOT_CHECK_SECONDS:
+            _snapshots.move_to_end(key)
+            return snap[0]
+    gc = init_google_sheets()
+    if not gc: raise ConnectionError("Google Sheets connection failed")
+    revision = _sheet_revision(gc, sheet_id)
+    with _snapshot_lock:
+        snap = _snapshots.get(key)
+        if snap and revision and snap[1] == revision:
+            snap[2] = time.monotonic()
+            _snapshots.move_to_end(key)
+            return snap[0]
+    # Revision read before the download: an edit in between only costs one extra download later
+    values = open_worksheet(sheet_id, tab_name).get_all_values()
+    with _snapshot_lock:
+        if revision:
+            _snapshots[key] = [values, revision, time.monotonic()]
+            _snapshots.move_to_end(key)
+            while len(_snapshots) > Config.SHEET_SNAPSHOT_MAX_TABS:
+                _snapshots.popitem(last=False)
+        else:
+            _snapshots.pop(key, None)
+    return values
+
+
+def invalidate_sheet(sheet_id, tab_name=None):
+    """Drop cached snapshots of one tab (or every tab of the spreadsheet)."""
+    with _snapshot_lock:
+        for key in [k for k in _snapshots if k[0] == sheet_id and (tab_name is None or k[1] == tab_name)]:
+            del _snapshots[key]
+
+
+def _patch_snapshot(gc, sheet_id, tab_name, updates):
+    """
+    Apply our own successful writes to the cached snapshot (copy-on-write,
+    readers keep their lists) and adopt the new revision, so the next read
+    does not download the tab again. Other tabs of the spreadsheet see the
+    new revision and are re-read; an external edit landing between our
+    write and the revision read is missed until the next change.
+    """
+    key = (sheet_id, tab_name)
+    with _snapshot_lock:
+        if key not in _snapshots: return
+    revision = _sheet_revision(gc, sheet_id)
+    with _snapshot_lock:
+        snap = _snapshots.get(key)
+        if not snap: return
+        if not revision:
+            del _snapshots[key]
+            return
+        values = list(snap[0])
+        copied = set()
+        try:
+            for u in updates:
+                grid = a1_range_to_grid_range(u['range'])
+                r0, c0 = grid.get('startRowIndex', 0), grid.get('startColumnIndex', 0)
+                for dr, row_vals in enumerate(u['values']):
+                    r = r0 + dr
+                    while len(values) <= r:
+                        values.append([])
+                    if r not in copied:
+                        values[r] = list(values[r])
+                        copied.add(r)
+                    row = values[r]
+                    for dc, v in enumerate(row_vals):
+                        while len(row) <= c0 + dc:
+                            row.append('')
+                        row[c0 + dc] = '' if v is None else str(v)
+        except (KeyError, ValueError, TypeError) as e:
+            logger.warning(f"Sheet snapshot of {tab_name} dropped (could not apply update: {e})")
+            del _snapshots[key]
+            return
+        # Keep the grid rectangular, as get_all_values returns it
+        width = max((len(row) for row in values), default=0)
+        values = [row if len(row) == width else row + [''] * (width - len(row)) for row in values]
+        _snapshots[key] = [values, revision, time.monotonic()]
 
 
 # --- 5. USER MANAGEMENT FUNCTIONS ---
@@ -598,3 +923,142 @@ def get_admin_info(username: str) -> Optional[Dict]:
     except Exception as e:
         logger.error(f"Error getting admin info: {e}")
         return None
+
+
+# --- 6. JOB QUEUE (migrations/002_add_job_queue.sql) ---
+
+JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED, JOB_CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+JOB_ACTIVE_STATES = (JOB_QUEUED, JOB_RUNNING)
+
+
+def submit_job(kind: str, site_id: int, params: Dict, created_by: Optional[str] = None) -> Optional[int]:
+    """
+    Queue a job for scripts/job_worker.py.
+
+    Returns:
+        New job id, or None if it could not be queued
+    """
+    supabase = init_supabase()
+    if not supabase:
+        return None
+
+    try:
+        res = supabase.table('job_queue').insert({
+            'kind': kind,
+            'site_id': site_id,
+            'params': params,
+            'created_by': created_by
+        }).execute()
+        job_id = res.data[0]['id'] if res.data else None
+        logger.info(f"Job queued: {kind} #{job_id} on site {site_id} by {created_by}")
+        return job_id
+    except Exception as e:
+        logger.error(f"Error queueing {kind} job: {e}", exc_info=True)
+        return None
+
+
+def claim_job(worker: str, stale_seconds: Optional[int] = None) -> Optional[Dict]:
+    """
+    Atomically take the oldest queued job (claim_job() in Postgres) and
+    mark it running for `worker`. None when the queue is empty.
+    """
+    supabase = init_supabase()
+    if not supabase:
+        return None
+
+    try:
+        res = supabase.rpc('claim_job', {
+            'p_worker': worker,
+            'p_stale_seconds': stale_seconds or Config.JOB_STALE_SECONDS
+        }).execute()
+        return res.data[0] if res.data else None
+    except Exception as e:
+        logger.error(f"Error claiming job: {e}")
+        return None
+
+
+def heartbeat_job(job_id: int, progress: Optional[Dict] = None) -> Optional[bool]:
+    """
+    Refresh a running job's heartbeat (and its last progress event).
+
+    Returns:
+        cancel_requested of the job, or None if the row could not be updated
+    """
+    supabase = init_supabase()
+    if not supabase:
+        return None
+
+    # Aware UTC: claim_job compares heartbeat_at (TIMESTAMPTZ) with the server's now()
+    data: Dict[str, Any] = {'heartbeat_at': datetime.now(timezone.utc).isoformat()}
+    if progress is not None:
+        data['progress'] = progress
+    try:
+        res = supabase.table('job_queue').update(data).eq('id', job_id).execute()
+        return bool(res.data[0].get('cancel_requested')) if res.data else None
+    except Exception as e:
+        logger.error(f"Error updating job #{job_id} heartbeat: {e}")
+        return None
+
+
+def complete_job(job_id: int, state: str, progress: Optional[Dict] = None, logs: Optional[List[str]] = None,
+                 result: Optional[Dict] = None, error: Optional[str] = None) -> bool:
+    """Store the final state (done / failed / cancelled) and outcome of a job."""
+    supabase = init_supabase()
+    if not supabase:
+        return False
+
+    try:
+        supabase.table('job_queue').update({
+            'state': state,
+            'progress': progress,
+            'logs': logs or [],
+            'result': result,
+            'error': error,
+            'finished_at': datetime.now(timezone.utc).isoformat()
+        }).eq('id', job_id).execute()
+        return True
+    except Exception as e:
+        logger.error(f"Error finishing job #{job_id}: {e}", exc_info=True)
+        return False
+
+
+def cancel_job(job_id: int) -> bool:
+    """
+    Cancel a job: a queued job is cancelled right away, a running one is
+    flagged and stops at its next progress checkpoint.
+    """
+    supabase = init_supabase()
+    if not supabase:
+        return False
+
+    try:
+        res = supabase.table('job_queue').update({
+            'state': JOB_CANCELLED,
+            'finished_at': datetime.now(timezone.utc).isoformat()
+        }).eq('id', job_id).eq('state', JOB_QUEUED).execute()
+        if not res.data:
+            res = supabase.table('job_queue').update({
+                'cancel_requested': True
+            }).eq('id', job_id).eq('state', JOB_RUNNING).execute()
+        logger.info(f"Cancel requested for job #{job_id}")
+        return bool(res.data)
+    except Exception as e:
+        logger.error(f"Error cancelling job #{job_id}: {e}")
+        return False
+
+
+def list_jobs(site_id: Optional[int] = None, limit: int = 20) -> List[Dict]:
+    """Newest jobs first (of one site if given)."""
+    supabase = init_supabase()
+    if not supabase:
+        return []
+
+    try:
+        query = supabase.table('job_queue').select('*')
+        if site_id is not None:
+            query = query.eq('site_id', site_id)
+        res = query.order('created_at', desc=True).limit(limit).execute()
+        return res.data if res.data else []
+    except Exception as e:
+        logger.error(f"Error listing jobs: {e}")
+        return []
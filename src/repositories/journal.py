@@ -0,0 +1,212 @@
+"""
+On-disk job journal (SQLite under Config.CACHE_DIR).
+
+Every finished import batch is checkpointed in one transaction: its
+per-SKU results and the sheet writes it produced. Sheet writes stay
+pending until the sheet confirms them, so a job cut off by a crash, a
+browser disconnect or a Streamlit rerun can be resumed: pending writes are
+replayed and SKUs that already succeeded are not sent again.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Set
+from config import Config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    site TEXT NOT NULL,
+    sheet_id TEXT NOT NULL DEFAULT '',
+    tab TEXT NOT NULL DEFAULT '',
+    total INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_lookup ON jobs (kind, site, sheet_id, tab, status);
+CREATE TABLE IF NOT EXISTS job_chunks (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    done_at REAL NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+CREATE TABLE IF NOT EXISTS job_results (
+    job_id TEXT NOT NULL,
+    sku TEXT NOT NULL,
+    status TEXT NOT NULL,
+    PRIMARY KEY (job_id, sku)
+);
+CREATE TABLE IF NOT EXISTS sheet_writes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    range TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    written INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_sheet_writes_job ON sheet_writes (job_id, written);
+"""
+
+RUNNING = 'running'
+DONE = 'done'
+INCOMPLETE = 'incomplete'  # finished, but some sheet writes never went through
+
+
+def journal_path():
+    return os.path.join(Config.CACHE_DIR, "jobs.sqlite")
+
+
+# Journal files whose schema is in place (see _ensure_schema)
+_ready_paths: Set[str] = set()
+_ready_lock = threading.Lock()
+
+
+def _ensure_schema(path):
+    """Create the tables and switch the file to WAL (persistent) once per path and process."""
+    if path in _ready_paths and os.path.exists(path):
+        return
+    with _ready_lock:
+        if path in _ready_paths and os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+        _ready_paths.add(path)
+
+
+@contextmanager
+def _connect():
+    path = journal_path()
+    _ensure_schema(path)
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        with conn:  # commit / rollback
+            yield conn
+    finally:
+        conn.close()
+
+
+def _site_key(domain):
+    return domain.rstrip('/').lower()
+
+
+# --- JOBS ---
+def start_job(kind, domain, sheet_id, tab, total):
+    """New job id; also prunes jobs older than Config.JOURNAL_KEEP_DAYS."""
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with _connect() as conn:
+        conn.execute("INSERT INTO jobs (id, kind, site, sheet_id, tab, total, status, created_at, updated_at) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                     (job_id, kind, _site_key(domain), sheet_id or '', tab or '', int(total), RUNNING, now, now))
+        _prune(conn, now - Config.JOURNAL_KEEP_DAYS * 86400)
+    return job_id
+
+
+def _prune(conn, before):
+    old = [r[0] for r in conn.execute("SELECT id FROM jobs WHERE updated_at < ?", (before,)).fetchall()]
+    for table, col in (('sheet_writes', 'job_id'), ('job_results', 'job_id'), ('job_chunks', 'job_id'), ('jobs', 'id')):
+        conn.executemany(f"DELETE FROM {table} WHERE {col} = ?", [(j,) for j in old])
+
+
+def get_job(job_id):
+    """Job row plus progress counters, or None."""
+    with _connect() as conn:
+        row = conn.execute("SELECT id, kind, site, sheet_id, tab, total, status, created_at, updated_at "
+                           "FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+        job = dict(zip(('id', 'kind', 'site', 'sheet_id', 'tab', 'total', 'status', 'created_at', 'updated_at'), row))
+        job['rows_done'] = conn.execute("SELECT COALESCE(SUM(rows), 0) FROM job_chunks WHERE job_id = ?",
+                                        (job_id,)).fetchone()[0]
+        job['succeeded'] = conn.execute("SELECT COUNT(*) FROM job_results WHERE job_id = ? AND status = 'success'",
+                                        (job_id,)).fetchone()[0]
+        job['pending_writes'] = conn.execute("SELECT COUNT(*) FROM sheet_writes WHERE job_id = ? AND written = 0",
+                                             (job_id,)).fetchone()[0]
+    return job
+
+
+def find_resumable(kind, domain, sheet_id, tab):
+    """
+    Newest job on this site/sheet/tab that did not finish cleanly (see
+    get_job), or None. A RUNNING job only counts once it has gone
+    Config.JOURNAL_STALE_SECONDS without a checkpoint: before that another
+    session or worker may still be running it.
+    """
+    stale_before = time.time() - Config.JOURNAL_STALE_SECONDS
+    with _connect() as conn:
+        row = conn.execute("SELECT id FROM jobs WHERE kind = ? AND site = ? AND sheet_id = ? AND tab = ? "
+                           "AND status != ? AND (status != ? OR updated_at < ?) ORDER BY updated_at DESC LIMIT 1",
+                           (kind, _site_key(domain), sheet_id or '', tab or '', DONE, RUNNING, stale_before)).fetchone()
+    return get_job(row[0]) if row else None
+
+
+def finish_job(job_id):
+    """DONE if every sheet write went through, INCOMPLETE otherwise (still resumable)."""
+    with _connect() as conn:
+        pending = conn.execute("SELECT COUNT(*) FROM sheet_writes WHERE job_id = ? AND written = 0",
+                               (job_id,)).fetchone()[0]
+        status = INCOMPLETE if pending else DONE
+        conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (status, time.time(), job_id))
+    return status
+
+
+def abandon_job(job_id):
+    """Mark a job as not to be resumed (its results stay until pruned)."""
+    with _connect() as conn:
+        conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (DONE, time.time(), job_id))
+
+
+# --- CHECKPOINTS ---
+def record_chunk(job_id, rows, results, updates):
+    """
+    Checkpoint one finished batch: `rows` sent, {sku: 'success' | error
+    message} and the sheet updates ({'range', 'values'}) still to be written.
+    """
+    now = time.time()
+    with _connect() as conn:
+        seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM job_chunks WHERE job_id = ?", (job_id,)).fetchone()[0]
+        conn.execute("INSERT INTO job_chunks (job_id, seq, rows, done_at) VALUES (?, ?, ?, ?)",
+                     (job_id, seq, int(rows), now))
+        conn.executemany("INSERT OR REPLACE INTO job_results (job_id, sku, status) VALUES (?, ?, ?)",
+                         [(job_id, str(sku), str(status)) for sku, status in results.items()])
+        conn.executemany("INSERT INTO sheet_writes (job_id, range, payload) VALUES (?, ?, ?)",
+                         [(job_id, u['range'], json.dumps(u['values'])) for u in updates])
+        conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (now, job_id))
+
+
+def succeeded_skus(job_id):
+    with _connect() as conn:
+        rows = conn.execute("SELECT sku FROM job_results WHERE job_id = ? AND status = 'success'",
+                            (job_id,)).fetchall()
+    return {r[0] for r in rows}
+
+
+def pending_writes(job_id, limit=None):
+    """[(seq, {'range', 'values'})] not yet confirmed by the sheet, oldest first."""
+    sql = "SELECT seq, range, payload FROM sheet_writes WHERE job_id = ? AND written = 0 ORDER BY seq"
+    args = [job_id]
+    if limit:
+        sql += " LIMIT ?"
+        args.append(int(limit))
+    with _connect() as conn:
+        rows = conn.execute(sql, args).fetchall()
+    return [(seq, {'range': rng, 'values': json.loads(payload)}) for seq, rng, payload in rows]
+
+
+def mark_written(seqs):
+    if not seqs:
+        return
+    with _connect() as conn:
+        conn.executemany("UPDATE sheet_writes SET written = 1 WHERE seq = ?", [(int(s),) for s in seqs])
@@ -0,0 +1,114 @@
+"""
+Locally persisted SKU map per site, kept current with get-all-skus deltas.
+
+The first sync downloads every published [id, sku] pair together with the
+server's change token; later syncs send that token and merge only the
+added/removed pairs (or nothing at all on 304). Sites without versioned
+sync (snippet < V12.6) fall back to the full flat download every time.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from config import Config
+from src.repositories import woo
+from src.utils.logger import logger
+
+_lock = threading.Lock()
+
+
+def _cache_path(domain):
+    digest = hashlib.sha1(woo._site_key(domain).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(Config.CACHE_DIR, f"skus_{digest}.json")
+
+
+def load_state(domain):
+    """{'token': str, 'pairs': {id: sku}} or None if nothing usable is stored."""
+    path = _cache_path(domain)
+    try:
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('site') == woo._site_key(domain) and state.get('token') is not None:
+            return state
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logger.warning(f"SKU cache unreadable ({path}): {e}")
+    return None
+
+
+def save_state(domain, token, pairs):
+    """Write atomically so a crash never leaves a half-written cache behind."""
+    os.makedirs(Config.CACHE_DIR, exist_ok=True)
+    path = _cache_path(domain)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'site': woo._site_key(domain), 'token': token, 'pairs': pairs}, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def clear(domain):
+    try:
+        os.remove(_cache_path(domain))
+    except FileNotFoundError:
+        pass
+
+
+def apply_delta(pairs, delta):
+    """Merge a server delta into {id: sku} in place (removals first, then adds)."""
+    for pid, _sku in delta.get('removed', []):
+        pairs.pop(str(pid), None)
+    for pid, sku in delta.get('added', []):
+        pairs[str(pid)] = str(sku or '')
+    return pairs
+
+
+def to_lookup_set(pairs):
+    """Same shape as the legacy flat list: every ID and every non-empty SKU."""
+    found = set(pairs.keys())
+    found.update(sku for sku in pairs.values() if sku)
+    return found
+
+
+def _full_download(domain, secret, policy):
+    meta = {}
+    pairs = {}
+    for pid, sku in woo.iter_sku_pairs(domain, secret, meta, policy=policy):
+        pairs[str(pid)] = str(sku or '')
+    return meta['token'], pairs
+
+
+def sync_sku_set(domain, secret, policy=None):
+    """
+    Return the set of published IDs and SKUs for a site, downloading only
+    what changed since the last call. Raises WooStreamError if neither the
+    delta nor a full download succeeds (never returns a partial set).
+    """
+    with _lock:
+        state = load_state(domain)
+    if state:
+        delta = woo.fetch_sku_delta(domain, secret, state['token'], policy=policy)
+        if delta is not None:
+            pairs = state['pairs']
+            changed = bool(delta.get('added') or delta.get('removed'))
+            apply_delta(pairs, delta)
+            if changed or str(delta['token']) != str(state['token']):
+                with _lock:
+                    save_state(domain, str(delta['token']), pairs)
+            logger.info(f"SKU delta sync: +{len(delta.get('added', []))} / -{len(delta.get('removed', []))} "
+                        f"({len(pairs)} products cached)")
+            return to_lookup_set(pairs)
+        logger.info("SKU delta unavailable (token expired or call failed), re-downloading")
+
+    try:
+        token, pairs = _full_download(domain, secret, policy)
+    except woo.WooStreamError as e:
+        # Old snippet: no versioned mode, keep the legacy full flat download
+        logger.info(f"Versioned SKU sync unavailable ({e}); using full list")
+        clear(domain)
+        return set(woo.iter_all_skus(domain, secret, policy=policy))
+    with _lock:
+        save_state(domain, str(token), pairs)
+    logger.info(f"SKU full sync: {len(pairs)} products cached at token {token}")
+    return to_lookup_set(pairs)
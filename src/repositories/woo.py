@@ -1,180 +1,543 @@
 import requests
+import gzip
 import json
+import threading
 import time
+import concurrent.futures
+from typing import Dict, Set, Tuple
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 from config import Config
 from src.utils.logger import logger  
+from src.utils.retry import DEFAULT_POLICY
+from src.utils.json_stream import iter_json_array
+from src.utils import metrics
 
-# --- [NEW] FAST SKU FETCHING ---
-def get_all_skus_fast(domain, secret):
-    url = f"{domain.rstrip('/')}/wp-json/test-secret/v1/get-all-skus"
-    headers = {"x-secret": secret}
-    
-    for attempt in range(1, Config.MAX_RETRIES + 1):
-        try:
-            res = requests.get(url, headers=headers, timeout=60)
-            if res.status_code == 200:
-                return set(res.json().get('skus', []))
-            if res.status_code in [500, 502, 503, 504, 429]:
-                logger.warning(f"get_all_skus retry {attempt}/{Config.MAX_RETRIES} - Status: {res.status_code}")
-                time.sleep(Config.RETRY_DELAY * attempt)
-                continue
-            return set()
-        except requests.exceptions.Timeout as e:
-            logger.error(f"get_all_skus timeout on attempt {attempt}: {e}")
-            if attempt < Config.MAX_RETRIES:
-                time.sleep(Config.RETRY_DELAY * attempt)
-            else:
-                return set()
-        except requests.exceptions.ConnectionError as e:
-            logger.error(f"get_all_skus connection error on attempt {attempt}: {e}")
-            if attempt < Config.MAX_RETRIES:
-                time.sleep(Config.RETRY_DELAY * attempt)
-            else:
-                return set()
-        except Exception as e:
-            logger.error(f"get_all_skus unexpected error: {e}", exc_info=True)
-            return set()
-    return set()
+TRANSIENT_ERRORS = (requests.exceptions.Timeout, requests.exceptions.ConnectionError)
 
-# --- V12 CORE APIs ---
-def post_product_batch_v12(domain, secret, products_list):
-    url = f"{domain.rstrip('/')}/wp-json/test-secret/v1/import-product-batch"
-    headers = {"x-secret": secret, "Content-Type": "application/json"}
-    payload = {"products": products_list}
-    
-    for attempt in range(1, Config.MAX_RETRIES + 1):
+# --- KEEP-ALIVE SESSION POOL (1 session / site) ---
+_sessions: Dict[str, Tuple[requests.Session, int]] = {}  # site key -> (session, pool_size)
+_sessions_lock = threading.Lock()
+
+def _site_key(domain):
+    return domain.rstrip('/').lower()
+
+def _mount_pool(session, pool_size):
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+def get_session(domain, pool_size=None):
+    """
+    Shared keep-alive session for a site. Every woo call goes through it so
+    worker threads reuse TCP/TLS connections instead of reconnecting per call.
+    The pool only grows: asking for a bigger pool remounts the adapter.
+    """
+    key = _site_key(domain)
+    size = max(pool_size or Config.HTTP_POOL_SIZE, 1)
+    with _sessions_lock:
+        entry = _sessions.get(key)
+        if entry is None:
+            session = requests.Session()
+            session.headers['Accept-Encoding'] = 'gzip, deflate'
+            _mount_pool(session, size)
+            _sessions[key] = (session, size)
+            return session
+        session, current = entry
+        if size > current:
+            # In-flight requests keep their connections; the old adapter is dropped once idle.
+            _mount_pool(session, size)
+            _sessions[key] = (session, size)
+        return session
+
+def configure_pool(domain, workers):
+    """Size the site's connection pool to the number of concurrent workers."""
+    return get_session(domain, pool_size=workers)
+
+def release_session(domain):
+    """Close pooled connections of a site (e.g. when it is deselected)."""
+    with _sessions_lock:
+        entry = _sessions.pop(_site_key(domain), None)
+    if entry:
+        entry[0].close()
+
+def release_all_sessions():
+    with _sessions_lock:
+        entries = list(_sessions.values())
+        _sessions.clear()
+    for session, _ in entries:
+        session.close()
+
+# --- REQUEST CORE (pooled session + unified retry policy) ---
+def _api_url(domain, path):
+    return f"{domain.rstrip('/')}/wp-json/test-secret/v1/{path}"
+
+# --- COMPRESSION & BYTES-ON-WIRE COUNTERS ---
+_compress_sites: Set[str] = set()
+_transfer: Dict[Tuple[str, str], Dict[str, int]] = {}  # (site key, endpoint) -> counters
+_transfer_lock = threading.Lock()
+
+def set_compression(domain, enabled):
+    """Opt a site in/out of gzip request bodies (needs snippet V12.6+)."""
+    key = _site_key(domain)
+    if enabled: _compress_sites.add(key)
+    else: _compress_sites.discard(key)
+
+def compression_enabled(domain):
+    return Config.GZIP_REQUESTS or _site_key(domain) in _compress_sites
+
+def encode_json_body(domain, payload):
+    """
+    Serialize a JSON request body, gzipped when the site opted in and the
+    body is big enough to benefit. Returns (data, headers, raw_size).
+    """
+    raw = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    headers = {"Content-Type": "application/json"}
+    if compression_enabled(domain) and len(raw) >= Config.GZIP_MIN_BYTES:
+        headers["Content-Encoding"] = "gzip"
+        return gzip.compress(raw, compresslevel=Config.GZIP_LEVEL), headers, len(raw)
+    return raw, headers, len(raw)
+
+def record_transfer(domain, endpoint, sent_wire, sent_raw, recv_wire, recv_raw):
+    key = (_site_key(domain), endpoint)
+    with _transfer_lock:
+        c = _transfer.setdefault(key, {"calls": 0, "sent_wire": 0, "sent_raw": 0, "recv_wire": 0, "recv_raw": 0})
+        c["calls"] += 1
+        c["sent_wire"] += sent_wire
+        c["sent_raw"] += sent_raw
+        c["recv_wire"] += recv_wire
+        c["recv_raw"] += recv_raw
+    logger.debug(f"{endpoint}: sent {sent_wire}/{sent_raw} B, received {recv_wire}/{recv_raw} B (wire/raw)")
+
+def get_transfer_stats(domain=None):
+    """{(site, endpoint): {calls, sent_wire, sent_raw, recv_wire, recv_raw}} (optionally one site)."""
+    with _transfer_lock:
+        return {k: dict(v) for k, v in _transfer.items() if domain is None or k[0] == _site_key(domain)}
+
+def reset_transfer_stats():
+    with _transfer_lock:
+        _transfer.clear()
+
+def _endpoint_of(url):
+    return urlparse(url).path.rstrip('/').rsplit('/', 1)[-1]
+
+def _wire_bytes_received(res, decoded_len):
+    # urllib3 counts raw (still compressed) bytes pulled off the socket
+    try:
+        return res.raw.tell() or decoded_len
+    except (AttributeError, OSError):
+        return int(res.headers.get('Content-Length') or decoded_len)
+
+def _request(method, domain, url, name, timeout, policy=None, attempts=None, **kwargs):
+    """
+    Send one request through the site's session under `policy` (jittered
+    backoff, Retry-After, job retry budget, per-site circuit breaker).
+    JSON bodies are gzipped for opted-in sites; every attempt is recorded in
+    src/utils/metrics.py (latency, status, retry, bytes) under policy.job.
+    Returns the last response, or None if the site never answered.
+    """
+    policy = policy or DEFAULT_POLICY
+    session = get_session(domain)
+    endpoint = _endpoint_of(url)
+    sent_raw = 0
+    if 'json' in kwargs:
+        data, body_headers, sent_raw = encode_json_body(domain, kwargs.pop('json'))
+        kwargs['data'] = data
+        kwargs['headers'] = {**kwargs.get('headers', {}), **body_headers}
+    sent_wire = len(kwargs['data']) if isinstance(kwargs.get('data'), bytes) else 0
+    tries = 0
+
+    def send():
+        nonlocal tries
+        tries += 1
+        started = time.monotonic()
         try:
-            res = requests.post(url, json=payload, headers=headers, timeout=Config.API_TIMEOUT)
-            if res.status_code == 200: return res
-            if res.status_code in [500, 502, 503, 504, 429]:
-                time.sleep(Config.RETRY_DELAY * attempt)
-                continue
-            return res 
+            res = session.request(method, url, timeout=timeout, **kwargs)
+            received = 0
+            if not kwargs.get('stream'):  # streamed bodies are counted by _stream_array
+                n = len(res.content)
+                received = _wire_bytes_received(res, n)
+                record_transfer(domain, endpoint, sent_wire, sent_raw, received, n)
         except requests.exceptions.RequestException as e:
-            logger.warning(f"Post batch attempt {attempt} failed: {str(e)}")
-            time.sleep(Config.RETRY_DELAY * attempt)
+            metrics.observe_request(domain, endpoint, type(e).__name__, time.monotonic() - started,
+                                    sent_wire, 0, policy.job, retry=tries > 1)
+            raise
+        metrics.observe_request(domain, endpoint, res.status_code, time.monotonic() - started,
+                                sent_wire, received, policy.job, retry=tries > 1)
+        return res
+
+    try:
+        return policy.call(domain, name, send, TRANSIENT_ERRORS, attempts=attempts)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"{name} failed: {e}")
+        return None
+
+class WooStreamError(Exception):
+    """A streamed list endpoint failed before the whole list was received."""
+
+def _stream_array(domain, url, name, timeout, key=None, policy=None, on_response=None, **kwargs):
+    """
+    Generator over the items of a JSON array response, decoded as the body
+    arrives. Raises WooStreamError if the list cannot be read completely, so
+    callers never mistake a truncated list for the full one.
+    on_response(res) sees the headers before the body is read (it may raise WooStreamError).
+    """
+    res = _request("GET", domain, url, name, timeout, policy, stream=True, **kwargs)
+    if res is None or res.status_code != 200:
+        if res is not None: res.close()
+        raise WooStreamError(f"{name}: HTTP {res.status_code if res is not None else 'no response'}")
+    if on_response:
+        try:
+            on_response(res)
+        except WooStreamError:
+            res.close()
+            raise
+    decoded = 0
+
+    def counted(chunks):
+        nonlocal decoded
+        for chunk in chunks:
+            decoded += len(chunk)
+            yield chunk
+
+    try:
+        yield from iter_json_array(counted(res.iter_content(chunk_size=Config.STREAM_CHUNK_BYTES)), key=key)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.error(f"{name} stream broken: {e}")
+        raise WooStreamError(f"{name}: {e}") from e
+    finally:
+        wire = _wire_bytes_received(res, decoded)
+        record_transfer(domain, _endpoint_of(url), 0, 0, wire, decoded)
+        metrics.add_bytes(domain, _endpoint_of(url), wire, (policy or DEFAULT_POLICY).job)
+        res.close()
+
+# --- [NEW] FAST SKU FETCHING ---
+def get_all_skus_fast(domain, secret, policy=None):
+    res = _request("GET", domain, _api_url(domain, "get-all-skus"), "get_all_skus",
+                   60, policy, headers={"x-secret": secret})
+    try:
+        if res is not None and res.status_code == 200:
+            return set(res.json().get('skus', []))
+    except ValueError as e:
+        logger.error(f"get_all_skus invalid JSON: {e}")
+    return set()
+
+def iter_all_skus(domain, secret, policy=None):
+    """Stream published IDs and SKUs (flat list of strings) from get-all-skus."""
+    return _stream_array(domain, _api_url(domain, "get-all-skus"), "get_all_skus", 60,
+                         key="skus", policy=policy, headers={"x-secret": secret})
+
+def iter_sku_pairs(domain, secret, meta, policy=None):
+    """
+    [V12.6] Stream [id, sku] pairs of published products. meta['token'] is
+    set to the snapshot token (X-Sku-Token) to pass to fetch_sku_delta later.
+    Raises WooStreamError on sites without versioned sync.
+    """
+    def on_response(res):
+        token = res.headers.get('X-Sku-Token')
+        if token is None:
+            raise WooStreamError("get_all_skus: site has no versioned sync (needs snippet V12.6+)")
+        meta['token'] = token
+
+    return _stream_array(domain, _api_url(domain, "get-all-skus"), "get_all_skus", 60, key="items",
+                         policy=policy, on_response=on_response,
+                         headers={"x-secret": secret}, params={"format": "pairs"})
+
+def fetch_sku_delta(domain, secret, token, policy=None):
+    """
+    [V12.6] Changes since `token`: {'token', 'added': [[id, sku]...], 'removed': [[id, sku]...]}.
+    304 (nothing changed) comes back as an empty delta. None if the token
+    expired (410) or the call failed -- the caller re-downloads everything.
+    """
+    res = _request("GET", domain, _api_url(domain, "get-all-skus"), "get_sku_delta", 60, policy,
+                   headers={"x-secret": secret, "If-None-Match": f'"{token}"'}, params={"since": token})
+    if res is None:
+        return None
+    if res.status_code == 304:
+        return {"token": token, "added": [], "removed": []}
+    try:
+        if res.status_code == 200:
+            data = res.json()
+            if isinstance(data, dict) and 'token' in data and 'added' in data:
+                return data
+    except ValueError as e:
+        logger.error(f"get_sku_delta invalid JSON: {e}")
     return None
 
-def trigger_process_media(domain, secret, limit=1):
-    url = f"{domain.rstrip('/')}/wp-json/test-secret/v1/process-pending-media"
+# --- V12 CORE APIs ---
+def post_product_batch_v12(domain, secret, products_list, policy=None, attempts=None):
     headers = {"x-secret": secret}
-    params = {"limit": limit}
-    
-    for attempt in range(1, Config.MAX_RETRIES + 1):
+    return _request("POST", domain, _api_url(domain, "import-product-batch"), f"post_product_batch ({len(products_list)})",
+                    Config.API_TIMEOUT, policy, attempts=attempts, json={"products": products_list}, headers=headers)
+
+def trigger_process_media(domain, secret, limit=1, policy=None):
+    """
+    The process-pending-media answer ({'status': 'processing' | 'done', ...});
+    {'status': 'error', 'http_status', 'message'} if the site answered with an
+    error or a non-JSON page; None if it never answered.
+    """
+    res = _request("POST", domain, _api_url(domain, "process-pending-media"), "trigger_process_media",
+                   120, policy, headers={"x-secret": secret}, params={"limit": limit})
+    if res is None:
+        return None
+    if res.status_code == 200:
         try:
-            res = requests.post(url, headers=headers, params=params, timeout=120)
-            if res.status_code == 200:
-                return res.json()
-            if res.status_code in [500, 502, 503, 504, 429]:
-                logger.warning(f"trigger_process_media retry {attempt}/{Config.MAX_RETRIES}")
-                time.sleep(Config.RETRY_DELAY * attempt)
-                continue
-            return None
-        except requests.exceptions.Timeout as e:
-            logger.error(f"trigger_process_media timeout: {e}")
-            if attempt < Config.MAX_RETRIES:
-                time.sleep(Config.RETRY_DELAY * attempt)
-            else:
-                return None
-        except requests.exceptions.RequestException as e:
-            logger.error(f"trigger_process_media request error: {e}")
-            if attempt < Config.MAX_RETRIES:
-                time.sleep(Config.RETRY_DELAY * attempt)
-            else:
-                return None
-        except Exception as e:
-            logger.error(f"trigger_process_media unexpected error: {e}", exc_info=True)
-            return None
-    return None
+            return res.json()
+        except ValueError as e:
+            logger.error(f"trigger_process_media invalid JSON: {e}")
+            return {"status": "error", "http_status": 200, "message": f"Invalid JSON: {e}"}
+    return {"status": "error", "http_status": res.status_code, "message": f"HTTP {res.status_code}"}
 
 # --- LEGACY APIs ---
-def fetch_product_ids_page(domain, ck, cs, page=1, status='publish'):
+def fetch_product_ids_page(domain, ck, cs, page=1, status='publish', policy=None):
     url = f"{domain.rstrip('/')}/wp-json/wc/v3/products"
     params = {"per_page": 100, "page": page, "fields": "id", "status": status}
-    try:
-        return requests.get(url, auth=HTTPBasicAuth(ck, cs), params=params, timeout=30)
-    except requests.exceptions.RequestException as e:
-        logger.error(f"fetch_product_ids_page failed (page {page}): {e}")
-        return None
+    return _request("GET", domain, url, f"fetch_product_ids_page (page {page})",
+                    30, policy, auth=HTTPBasicAuth(ck, cs), params=params)
 
-def fetch_product_list_custom(domain, secret, limit=50, search_term=None):
-    url = f"{domain.rstrip('/')}/wp-json/test-secret/v1/get-product-list"
-    headers = {"x-secret": secret}
+def fetch_product_list_custom(domain, secret, limit=50, search_term=None, policy=None):
     params = {"limit": limit}
     if search_term: params["search"] = search_term
+    res = _request("GET", domain, _api_url(domain, "get-product-list"), "fetch_product_list_custom",
+                   30, policy, headers={"x-secret": secret}, params=params)
     try:
-        return requests.get(url, headers=headers, params=params, timeout=30).json()
-    except requests.exceptions.RequestException as e:
-        logger.error(f"fetch_product_list_custom failed: {e}")
+        return res.json() if res is not None and res.status_code == 200 else []
+    except ValueError as e:
+        logger.error(f"fetch_product_list_custom invalid JSON: {e}")
         return []
 
-def fetch_media_preview_custom(domain, secret, limit=50, search_term=None):
-    url = f"{domain.rstrip('/')}/wp-json/test-secret/v1/get-media-list"
-    headers = {"x-secret": secret}
+def fetch_media_preview_custom(domain, secret, limit=50, search_term=None, policy=None):
     params = {"limit": limit}
     if search_term: params["search"] = search_term
+    # Timeout 10 mins for large datasets (e.g. 50k+ images); at most one retry
+    res = _request("GET", domain, _api_url(domain, "get-media-list"), "fetch_media_preview_custom",
+                   600, policy, attempts=2, headers={"x-secret": secret}, params=params)
     try:
-        # Timeout 10 mins for large datasets (e.g. 50k+ images)
-        return requests.get(url, headers=headers, params=params, timeout=600).json()
-    except requests.exceptions.RequestException as e:
-        logger.error(f"fetch_media_preview_custom failed: {e}")
+        return res.json() if res is not None and res.status_code == 200 else []
+    except ValueError as e:
+        logger.error(f"fetch_media_preview_custom invalid JSON: {e}")
         return []
 
-def check_product_exists(domain, secret, sku):
-    url = f"{domain.rstrip('/')}/wp-json/test-secret/v1/check-product"
-    headers = {"x-secret": secret}
+def iter_media_preview(domain, secret, limit=50, search_term=None, policy=None):
+    """Streaming twin of fetch_media_preview_custom: yields media records as they are decoded."""
+    params = {"limit": limit}
+    if search_term: params["search"] = search_term
+    return _stream_array(domain, _api_url(domain, "get-media-list"), "fetch_media_preview_custom", 600,
+                         policy=policy, headers={"x-secret": secret}, params=params)
+
+# --- KEYSET (after_id) PAGINATION ---
+def _page_ids(path, page):
+    """int ids of a list page; WooStreamError if the page is not a list of items with ids."""
     try:
-        res = requests.post(url, json={"sku": sku}, headers=headers, timeout=10)
-        return res.json().get('status') == 'exists' if res.status_code == 200 else None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"check_product_exists failed for SKU {sku}: {e}")
+        return [int(item['id']) for item in page]
+    except (KeyError, TypeError, ValueError) as e:
+        raise WooStreamError(f"{path}: malformed list item ({e!r})") from e
+
+def fetch_keyset_page(domain, secret, path, after_id, max_id, page_size, policy=None, filters=None):
+    """
+    One page of get-media-list / get-product-list in cursor mode:
+    items with after_id < ID <= max_id, ascending. None if the page failed.
+    `filters` are extra query params (e.g. modified_after) applied server-side.
+    """
+    params = {**(filters or {}), "after_id": after_id, "max_id": max_id, "limit": page_size}
+    res = _request("GET", domain, _api_url(domain, path), f"{path} (after {after_id})",
+                   Config.API_TIMEOUT * 2, policy, headers={"x-secret": secret}, params=params)
+    if res is None or res.status_code != 200:
+        return None
+    try:
+        page = res.json()
+    except ValueError:
+        return None
+    if not isinstance(page, list):
         return None
+    # Old snippets ignore after_id and return the newest items instead
+    if any(not (after_id < i <= max_id) for i in _page_ids(path, page)):
+        raise WooStreamError(f"{path}: server does not support after_id pagination")
+    return page
 
-def delete_products_batch_custom(domain, secret, ids):
-    url = f"{domain.rstrip('/')}/wp-json/test-secret/v1/delete-product-batch"
-    headers = {"x-secret": secret, "Content-Type": "application/json"}
+def _newest_id(domain, secret, path, policy=None):
+    res = _request("GET", domain, _api_url(domain, path), f"{path} (newest id)",
+                   Config.API_TIMEOUT, policy, headers={"x-secret": secret}, params={"limit": 1})
+    if res is None or res.status_code != 200:
+        raise WooStreamError(f"{path}: HTTP {res.status_code if res is not None else 'no response'}")
     try:
-        res = requests.post(url, json={"ids": ids}, headers=headers, timeout=60)
-        if res.status_code == 200:
-            data = res.json()
-            return True, data.get('deleted_count', 0), data.get('deleted_items', [])
-        return False, 0, []
-    except requests.exceptions.RequestException as e:
-        logger.error(f"delete_products_batch failed for {len(ids)} products: {e}")
-        return False, 0, []
+        page = res.json()
+    except ValueError as e:
+        raise WooStreamError(f"{path}: invalid JSON ({e})") from e
+    if not isinstance(page, list):
+        raise WooStreamError(f"{path}: unexpected response")
+    return _page_ids(path, page[:1])[0] if page else 0
 
-def delete_media_batch(domain, secret, ids):
-    url = f"{domain.rstrip('/')}/wp-json/test-secret/v1/delete-media-batch"
-    headers = {"x-secret": secret}
+def fetch_newest_page(domain, secret, path, max_id, page_size, policy=None, filters=None):
+    """
+    One page of get-media-list / get-product-list, newest first: items with
+    ID <= max_id, descending (V12.6 max_id-only mode). None if the page failed.
+    """
+    params = {**(filters or {}), "max_id": max_id, "limit": page_size}
+    res = _request("GET", domain, _api_url(domain, path), f"{path} (max {max_id})",
+                   Config.API_TIMEOUT * 2, policy, headers={"x-secret": secret}, params=params)
+    if res is None or res.status_code != 200:
+        return None
     try:
-        res = requests.post(url, json={"ids": ids}, headers=headers, timeout=60)
-        return res.status_code == 200
-    except requests.exceptions.RequestException as e:
-        logger.error(f"delete_media_batch failed for {len(ids)} items: {e}")
-        return False
+        page = res.json()
+    except ValueError:
+        return None
+    if not isinstance(page, list):
+        return None
+    # Old snippets ignore max_id without after_id and return the newest items again
+    if any(i > max_id for i in _page_ids(path, page)):
+        raise WooStreamError(f"{path}: server does not support max_id pagination")
+    return page
+
+def _iter_newest(domain, secret, path, limit, page_size, policy=None, filters=None):
+    """The newest `limit` items, newest first, paged down with a max_id cursor."""
+    page_size = min(page_size, limit)
+    cursor = _newest_id(domain, secret, path, policy)
+    yielded = 0
+    while cursor > 0 and yielded < limit:
+        want = min(page_size, limit - yielded)
+        for attempt in range(1, Config.KEYSET_PAGE_RETRIES + 1):
+            page = fetch_newest_page(domain, secret, path, cursor, want, policy, filters)
+            if page is not None:
+                break
+            logger.warning(f"{path}: page below {cursor} failed, retrying ({attempt})")
+        else:
+            raise WooStreamError(f"{path}: page below {cursor} failed {Config.KEYSET_PAGE_RETRIES} times")
+        for item in page:
+            yield item
+        yielded += len(page)
+        if len(page) < want:
+            return
+        cursor = int(page[-1]['id']) - 1
+
+def iter_keyset_scan(domain, secret, path, page_size=None, workers=None, limit=None, policy=None, filters=None):
+    """
+    Parallel keyset scan of a list endpoint.
+
+    The ID space (0, newest] is cut into ranges, scanned newest-range first
+    by `workers` threads; each range is paged with an after_id cursor. A
+    failed page is retried on its own (up to KEYSET_PAGE_RETRIES) without
+    restarting the scan. Yields items as pages complete. With `limit`, the
+    newest `limit` items are paged newest first with a max_id cursor instead
+    (one page at a time, no larger than `limit`). Raises WooStreamError if a
+    page keeps failing or the server lacks after_id / max_id support.
+    """
+    if limit:
+        yield from _iter_newest(domain, secret, path, limit, page_size or Config.KEYSET_PAGE_SIZE, policy, filters)
+        return
+    page_size = page_size or Config.KEYSET_PAGE_SIZE
+    workers = workers or Config.KEYSET_WORKERS
+    top = _newest_id(domain, secret, path, policy)
+    if top <= 0:
+        return
+    n_ranges = max(1, min(workers * Config.KEYSET_RANGES_PER_WORKER, top // page_size + 1))
+    step = -(-top // n_ranges)  # ceil
+    # (after_id, max_id) pairs, newest range first
+    ranges = [(max(0, hi - step), hi) for hi in range(top, 0, -step)]
+    configure_pool(domain, workers)
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    pending = {}  # future -> (after_id, max_id, attempt)
 
-def get_all_media_ids(domain, secret):
-    url = f"{domain.rstrip('/')}/wp-json/test-secret/v1/get-all-media-ids"
+    def submit(after_id, max_id, attempt=1):
+        fut = executor.submit(fetch_keyset_page, domain, secret, path, after_id, max_id, page_size, policy, filters)
+        pending[fut] = (after_id, max_id, attempt)
+
+    try:
+        while ranges and len(pending) < workers:
+            submit(*ranges.pop(0))
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for fut in done:
+                after_id, max_id, attempt = pending.pop(fut)
+                page = fut.result()
+                if page is None:
+                    if attempt >= Config.KEYSET_PAGE_RETRIES:
+                        raise WooStreamError(f"{path}: page after {after_id} failed {attempt} times")
+                    logger.warning(f"{path}: page after {after_id} failed, retrying ({attempt})")
+                    submit(after_id, max_id, attempt + 1)
+                    continue
+                if len(page) >= page_size:
+                    submit(int(page[-1]['id']), max_id)  # continue this range first
+                elif ranges:
+                    submit(*ranges.pop(0))
+                yield from page
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def iter_media_keyset(domain, secret, limit=None, page_size=None, workers=None, policy=None):
+    return iter_keyset_scan(domain, secret, "get-media-list", page_size, workers, limit, policy)
+
+def iter_products_keyset(domain, secret, limit=None, page_size=None, workers=None, policy=None, modified_after=None):
+    """Products (any status but trash); with modified_after (GMT 'Y-m-d H:i:s') only those changed since (V12.6)."""
+    filters = {"modified_after": modified_after} if modified_after else None
+    return iter_keyset_scan(domain, secret, "get-product-list", page_size, workers, limit, policy, filters)
+
+def fetch_product_list_head(domain, secret, policy=None):
+    """
+    {'newest_id', 'token', 'date'} from one tiny get-product-list call:
+    the SKU change token (None on snippets older than V12.6) and the
+    server's Date header. Raises WooStreamError if the call fails.
+    """
+    res = _request("GET", domain, _api_url(domain, "get-product-list"), "get-product-list (head)",
+                   Config.API_TIMEOUT, policy, headers={"x-secret": secret}, params={"limit": 1})
+    if res is None or res.status_code != 200:
+        raise WooStreamError(f"get-product-list: HTTP {res.status_code if res is not None else 'no response'}")
+    try:
+        page = res.json()
+    except ValueError as e:
+        raise WooStreamError(f"get-product-list: invalid JSON ({e})") from e
+    if not isinstance(page, list):
+        raise WooStreamError("get-product-list: unexpected response")
+    return {"newest_id": _page_ids("get-product-list", page[:1])[0] if page else 0,
+            "token": res.headers.get('X-Sku-Token'), "date": res.headers.get('Date')}
+
+def check_product_exists(domain, secret, sku, policy=None):
+    res = _request("POST", domain, _api_url(domain, "check-product"), f"check_product_exists ({sku})",
+                   10, policy, json={"sku": sku}, headers={"x-secret": secret})
+    try:
+        return res.json().get('status') == 'exists' if res is not None and res.status_code == 200 else None
+    except ValueError:
+        return None
+
+def delete_products_batch_custom(domain, secret, ids, policy=None):
     headers = {"x-secret": secret}
+    res = _request("POST", domain, _api_url(domain, "delete-product-batch"),
+                   f"delete_products_batch ({len(ids)} products)", 60, policy, json={"ids": ids}, headers=headers)
     try:
-        res = requests.get(url, headers=headers, timeout=60)
-        return res.json().get('ids', []) if res.status_code == 200 else []
-    except requests.exceptions.RequestException as e:
-        logger.error(f"get_all_media_ids failed: {e}")
+        if res is not None and res.status_code == 200:
+            data = res.json()
+            return True, data.get('deleted_count', 0), data.get('deleted_items', [])
+    except ValueError as e:
+        logger.error(f"delete_products_batch invalid JSON: {e}")
+    return False, 0, []
+
+def delete_media_batch(domain, secret, ids, policy=None):
+    res = _request("POST", domain, _api_url(domain, "delete-media-batch"),
+                   f"delete_media_batch ({len(ids)} items)", 60, policy, json={"ids": ids}, headers={"x-secret": secret})
+    return res is not None and res.status_code == 200
+
+def get_all_media_ids(domain, secret, policy=None):
+    res = _request("GET", domain, _api_url(domain, "get-all-media-ids"), "get_all_media_ids",
+                   60, policy, headers={"x-secret": secret})
+    try:
+        return res.json().get('ids', []) if res is not None and res.status_code == 200 else []
+    except ValueError as e:
+        logger.error(f"get_all_media_ids invalid JSON: {e}")
         return []
 
-def update_media_batch_custom(domain, secret, updates):
+def update_media_batch_custom(domain, secret, updates, policy=None):
     """
     updates = [{'id': 123, 'title': 'New Name'}, ...]
     """
-    url = f"{domain.rstrip('/')}/wp-json/test-secret/v1/update-media-batch"
-    headers = {"x-secret": secret}
-    try:
-        res = requests.post(url, headers=headers, json={"updates": updates}, timeout=120)
-        if res.status_code == 200:
+    res = _request("POST", domain, _api_url(domain, "update-media-batch"), "update_media_batch_custom",
+                   120, policy, headers={"x-secret": secret}, json={"updates": updates})
+    if res is None:
+        return {"status": "error", "message": "Conn Error"}
+    if res.status_code == 200:
+        try:
             return res.json()
-        return {"status": "error", "message": f"HTTP {res.status_code}"}
-    except requests.exceptions.RequestException as e:
-        logger.error(f"update_media_batch_custom failed: {e}")
-        return {"status": "error", "message": str(e)}
\ No newline at end of file
+        except ValueError as e:
+            return {"status": "error", "message": f"Invalid JSON: {e}"}
+    return {"status": "error", "message": f"HTTP {res.status_code}"}
@@ -0,0 +1,173 @@
+"""
+Asyncio WooCommerce client.
+
+Mirrors the woo.py API for high-concurrency jobs: every call runs on the
+caller's event loop through one httpx.AsyncClient per site, bounded by a
+per-site semaphore instead of one blocked OS thread per request.
+
+Jobs bracket their calls with open_site() / aclose_site(): the client is
+shared by every job of a site on the same loop and closed after the last
+one releases it.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Tuple
+import httpx
+from config import Config
+from src.utils.logger import logger
+from src.utils.retry import DEFAULT_POLICY
+from src.repositories.woo import encode_json_body, record_transfer
+from src.utils import metrics
+
+TRANSIENT_ERRORS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+
+# (site key, loop) -> {'client', 'sem', 'limit', 'users'}. Clients are bound to the loop that created them.
+_clients: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+
+
+def _site_key(domain):
+    return domain.rstrip('/').lower()
+
+
+def _api_url(domain, path):
+    return f"{domain.rstrip('/')}/wp-json/test-secret/v1/{path}"
+
+
+def get_client(domain):
+    """
+    Return (client, semaphore) of a site opened with open_site() on the
+    running event loop; the semaphore bounds in-flight requests. Raises
+    RuntimeError for a site that was not opened, so no call can leave an
+    unowned client (and its connection pool) behind.
+    """
+    entry = _clients.get((_site_key(domain), asyncio.get_running_loop()))
+    if entry is None:
+        raise RuntimeError(f"{_site_key(domain)}: call woo_async.open_site() before sending requests")
+    return entry['client'], entry['sem']
+
+
+def open_site(domain, concurrency=None):
+    """
+    Start using the site's client for one job; pair with aclose_site(). A
+    larger `concurrency` than the current limit raises it (jobs sharing a
+    site share the largest limit).
+    """
+    key = (_site_key(domain), asyncio.get_running_loop())
+    entry = _clients.get(key)
+    if entry is None:
+        limit = concurrency or Config.ASYNC_CONCURRENCY
+        # Unbounded pool: the semaphore is the limit, so it can grow without a new client
+        client = httpx.AsyncClient(limits=httpx.Limits(max_connections=None, max_keepalive_connections=None))
+        entry = _clients[key] = {'client': client, 'sem': asyncio.Semaphore(limit), 'limit': limit, 'users': 0}
+    elif concurrency and concurrency > entry['limit']:
+        for _ in range(concurrency - entry['limit']):
+            entry['sem'].release()
+        entry['limit'] = concurrency
+    entry['users'] += 1
+
+
+async def aclose_site(domain):
+    """End one job's use of the site's client; the last user closes it."""
+    key = (_site_key(domain), asyncio.get_running_loop())
+    entry = _clients.get(key)
+    if entry is None:
+        return
+    entry['users'] -= 1
+    if entry['users'] <= 0:
+        del _clients[key]
+        await entry['client'].aclose()
+
+
+async def _send(domain, method, path, name, timeout, policy=None, **kwargs):
+    """Send one request under `policy` (see src/utils/retry.py); None if the site never answered."""
+    client, sem = get_client(domain)
+    url = _api_url(domain, path)
+    policy = policy or DEFAULT_POLICY
+    sent_raw = 0
+    if 'json' in kwargs:
+        data, body_headers, sent_raw = encode_json_body(domain, kwargs.pop('json'))
+        kwargs['content'] = data
+        kwargs['headers'] = {**kwargs.get('headers', {}), **body_headers}
+    sent_wire = len(kwargs.get('content') or b'')
+    tries = 0
+
+    async def send():
+        nonlocal tries
+        tries += 1
+        async with sem:
+            started = time.monotonic()
+            try:
+                res = await client.request(method, url, timeout=timeout, **kwargs)
+            except httpx.HTTPError as e:
+                metrics.observe_request(domain, path, type(e).__name__, time.monotonic() - started,
+                                        sent_wire, 0, policy.job, retry=tries > 1)
+                raise
+        metrics.observe_request(domain, path, res.status_code, time.monotonic() - started,
+                                sent_wire, res.num_bytes_downloaded, policy.job, retry=tries > 1)
+        record_transfer(domain, path, sent_wire, sent_raw, res.num_bytes_downloaded, len(res.content))
+        return res
+
+    try:
+        return await policy.call_async(domain, name, send, TRANSIENT_ERRORS)
+    except httpx.HTTPError as e:
+        logger.error(f"{name} failed: {e}")
+        return None
+
+
+# --- V12 CORE APIs ---
+async def post_product_batch_v12(domain, secret, products_list, policy=None):
+    headers = {"x-secret": secret}
+    return await _send(domain, "POST", "import-product-batch", "post_product_batch",
+                       Config.API_TIMEOUT, policy, json={"products": products_list}, headers=headers)
+
+
+async def trigger_process_media(domain, secret, limit=1, policy=None):
+    """Same answers as woo.trigger_process_media (error dict with http_status, None without an answer)."""
+    res = await _send(domain, "POST", "process-pending-media", "trigger_process_media",
+                      120, policy, headers={"x-secret": secret}, params={"limit": limit})
+    if res is None:
+        return None
+    if res.status_code == 200:
+        try:
+            return res.json()
+        except ValueError as e:
+            logger.error(f"trigger_process_media invalid JSON: {e}")
+            return {"status": "error", "http_status": 200, "message": f"Invalid JSON: {e}"}
+    return {"status": "error", "http_status": res.status_code, "message": f"HTTP {res.status_code}"}
+
+
+# --- DELETE / MEDIA APIs ---
+async def delete_products_batch_custom(domain, secret, ids, policy=None):
+    headers = {"x-secret": secret}
+    res = await _send(domain, "POST", "delete-product-batch", "delete_products_batch",
+                      60, policy, json={"ids": ids}, headers=headers)
+    try:
+        if res is not None and res.status_code == 200:
+            data = res.json()
+            return True, data.get('deleted_count', 0), data.get('deleted_items', [])
+    except ValueError as e:
+        logger.error(f"delete_products_batch invalid JSON: {e}")
+    return False, 0, []
+
+
+async def delete_media_batch(domain, secret, ids, policy=None):
+    res = await _send(domain, "POST", "delete-media-batch", "delete_media_batch",
+                      60, policy, json={"ids": ids}, headers={"x-secret": secret})
+    return res is not None and res.status_code == 200
+
+
+async def update_media_batch_custom(domain, secret, updates, policy=None):
+    """
+    updates = [{'id': 123, 'title': 'New Name'}, ...]
+    """
+    res = await _send(domain, "POST", "update-media-batch", "update_media_batch_custom",
+                      120, policy, json={"updates": updates}, headers={"x-secret": secret})
+    if res is None:
+        return {"status": "error", "message": "Conn Error"}
+    if res.status_code == 200:
+        try:
+            return res.json()
+        except ValueError as e:
+            return {"status": "error", "message": f"Invalid JSON: {e}"}
+    return {"status": "error", "message": f"HTTP {res.status_code}"}
@@ -1,4 +1,4 @@
-from src.repositories import woo, db
+from src.repositories import db, sku_cache
 from src.utils.common import get_val, col_idx_to_letter
 
 def run_sync_sheet_with_website(site, tab_name, max_workers=20, progress_callback=None):
@@ -16,12 +16,11 @@ def run_sync_sheet_with_website(site, tab_name, max_workers=20, progress_callbac
         # 1. Fetch WP SKUs
         if progress_callback: progress_callback(0.1)
         # Set này chứa cả ID (str) và SKU (str) từ Web
-        wp_sku_set = woo.get_all_skus_fast(site['domain_url'], site['secret_key'])
+        # Delta sync against the local cache; raises instead of returning a partial set
+        wp_sku_set = sku_cache.sync_sku_set(site['domain_url'], site['secret_key'])
         
         # 2. Fetch Sheet Data
-        sh = gc.open_by_key(site['google_sheet_id'])
-        ws = sh.worksheet(tab_name)
-        vals = ws.get_all_values()
+        vals = db.get_sheet_values(site['google_sheet_id'], tab_name)
         
         if len(vals) < 2: return ["Sheet is empty"]
         
@@ -1,16 +1,21 @@
+import asyncio
 import concurrent.futures
-from src.repositories import woo, db
+from src.repositories import woo, woo_async, db, catalog
 from src.utils.common import get_val, col_idx_to_letter
+from src.utils.retry import RetryPolicy
+from src.utils.concurrency import get_controller, run_in_slot
+from src.utils import metrics
 from config import Config
 from src.utils.logger import logger
 
 # --- WORKERS ---
-def worker_delete_product(ids_chunk, domain, secret):
-    success, count, deleted_skus = woo.delete_products_batch_custom(domain, secret, ids_chunk)
+def worker_delete_product(ids_chunk, domain, secret, policy=None, controller=None):
+    success, count, deleted_skus = run_in_slot(controller, woo.delete_products_batch_custom, domain, secret, ids_chunk,
+                                               policy=policy, is_ok=lambda r: r[0])
     return success, count, (deleted_skus if success else [])
 
-def worker_fetch_page(page, domain, ck, cs):
-    res = woo.fetch_product_ids_page(domain, ck, cs, page, status='publish')
+def worker_fetch_page(page, domain, ck, cs, policy=None):
+    res = woo.fetch_product_ids_page(domain, ck, cs, page, status='publish', policy=policy)
     return [p['id'] for p in res.json()] if res and res.status_code == 200 else []
 
 # --- UI FETCHERS (Same as before) ---
@@ -18,7 +23,12 @@ def get_products_for_ui(domain, secret, limit=50, search_input=None):
     search_term = None
     if search_input:
         search_term = ",".join(search_input) if isinstance(search_input, list) else str(search_input).strip()
-    raw_data = woo.fetch_product_list_custom(domain, secret, limit, search_term)
+    # Local catalog first (refreshed incrementally when stale); REST list if it cannot be built
+    if catalog.ensure_fresh(domain, secret):
+        prefixes = [s.strip() for s in search_term.split(',')] if search_term else None
+        raw_data = catalog.search(domain, prefixes, limit)
+    else:
+        raw_data = woo.fetch_product_list_custom(domain, secret, limit, search_term)
     if not raw_data: return []
     clean_data = []
     for p in raw_data:
@@ -42,11 +52,17 @@ def delete_product_list(domain, secret, id_list, max_workers=5, progress_callbac
     if not id_list: return ["List empty"], []
     chunk_size = 50 
     chunks = [id_list[i:i + chunk_size] for i in range(0, len(id_list), chunk_size)]
+    woo.configure_pool(domain, max_workers)
+    policy = RetryPolicy(job="delete")
+    started = metrics.snapshot()
+    ctrl = get_controller(domain, 'delete', min(max_workers, Config.PHASE1_WORKERS), max_workers)
     deleted_total = 0
     returned_skus = []
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(worker_delete_product, chunk, domain, secret) for chunk in chunks]
+    # A progress_callback that raises (job cancelled) drops the chunks not started yet
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = [executor.submit(worker_delete_product, chunk, domain, secret, policy, ctrl) for chunk in chunks]
         for i, future in enumerate(concurrent.futures.as_completed(futures)):
             is_ok, count, skus = future.result()
             if is_ok: 
@@ -54,18 +70,23 @@ def delete_product_list(domain, secret, id_list, max_workers=5, progress_callbac
                 returned_skus.extend(skus)
             if progress_callback: 
                 progress_callback((i + 1) / len(chunks), deleted_total, len(id_list))
-                
-    return [f"Deleted {deleted_total} items."], returned_skus
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        catalog.remove_ids(domain, returned_skus)
+    
+    return [f"Deleted {deleted_total} items."] + metrics.job_report(domain, policy.job, started), returned_skus
 
 def delete_all_products_scan_mode(domain, ck, cs, secret, max_workers=10, progress_callback=None):
-    res1 = woo.fetch_product_ids_page(domain, ck, cs, 1, status='publish')
+    policy = RetryPolicy(job="delete-scan")
+    res1 = woo.fetch_product_ids_page(domain, ck, cs, 1, status='publish', policy=policy)
     if not res1 or res1.status_code != 200: return ["Connect Fail"], []
     total_pages = int(res1.headers.get('X-WP-TotalPages', 0))
     all_ids = [p['id'] for p in res1.json()]
     if total_pages > 1:
+        woo.configure_pool(domain, max_workers)
         pages = list(range(2, total_pages + 1))
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [executor.submit(worker_fetch_page, p, domain, ck, cs) for p in pages]
+            futures = [executor.submit(worker_fetch_page, p, domain, ck, cs, policy) for p in pages]
             for f in concurrent.futures.as_completed(futures):
                 all_ids.extend(f.result())
     if not all_ids: return ["No products found."], []
@@ -80,9 +101,7 @@ def sync_deleted_rows(sheet_id, tab_name, deleted_skus):
     if not gc: return ["Connection Error"]
     
     try:
-        sh = gc.open_by_key(sheet_id)
-        ws = sh.worksheet(tab_name)
-        vals = ws.get_all_values()
+        vals = db.get_sheet_values(sheet_id, tab_name)
         if len(vals) < 2: return ["Sheet empty"]
         header = [str(x).strip() for x in vals[0]]
         data = vals[1:]
@@ -122,18 +141,53 @@ def sync_deleted_rows(sheet_id, tab_name, deleted_skus):
 
 def delete_all_media(domain, secret, max_workers=10, progress_callback=None):
     # (Same as before)
-    all_ids = woo.get_all_media_ids(domain, secret)
+    policy = RetryPolicy(job="delete-media")
+    all_ids = woo.get_all_media_ids(domain, secret, policy=policy)
     total = len(all_ids)
     if total == 0: return True, "Empty Library"
     chunks = [all_ids[i:i + 50] for i in range(0, total, 50)]
+    woo.configure_pool(domain, max_workers)
+    ctrl = get_controller(domain, 'delete-media', min(max_workers, Config.PHASE1_WORKERS), max_workers)
     deleted = 0
     def worker(chunk, dom, sec):
-        res = woo.delete_media_batch(dom, sec, chunk)
+        res = run_in_slot(ctrl, woo.delete_media_batch, dom, sec, chunk, policy=policy, is_ok=bool)
         return res, len(chunk)
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    try:
         futures = [executor.submit(worker, c, domain, secret) for c in chunks]
         for f in concurrent.futures.as_completed(futures):
             ok, n = f.result()
             if ok: deleted += n
             if progress_callback: progress_callback(1, deleted, total)
-    return True, f"Deleted {deleted} images."
\ No newline at end of file
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    return True, f"Deleted {deleted} images."
+
+# --- ASYNC DELETE (single event loop) ---
+async def delete_product_list_async(domain, secret, id_list, max_workers=5, progress_callback=None):
+    if not id_list: return ["List empty"], []
+    chunk_size = 50
+    chunks = [id_list[i:i + chunk_size] for i in range(0, len(id_list), chunk_size)]
+    woo_async.open_site(domain, concurrency=max_workers)
+    sem = asyncio.Semaphore(max_workers)
+    policy = RetryPolicy(job="delete")
+    deleted_total = 0
+    returned_skus = []
+
+    async def run_chunk(chunk):
+        async with sem:
+            return await woo_async.delete_products_batch_custom(domain, secret, chunk, policy=policy)
+
+    try:
+        for i, coro in enumerate(asyncio.as_completed([run_chunk(c) for c in chunks])):
+            is_ok, count, skus = await coro
+            if is_ok:
+                deleted_total += count
+                returned_skus.extend(skus)
+            if progress_callback:
+                progress_callback((i + 1) / len(chunks), deleted_total, len(id_list))
+    finally:
+        await woo_async.aclose_site(domain)
+
+    catalog.remove_ids(domain, returned_skus)
+    return [f"Deleted {deleted_total} items."], returned_skus
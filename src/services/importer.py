@@ -1,45 +1,206 @@
+import asyncio
 import concurrent.futures
+import hashlib
+import json
+import queue
+import threading
 import time
-from src.repositories import woo, db
+from src.repositories import woo, woo_async, db, catalog, sku_cache, journal
 from src.utils.common import get_val, col_idx_to_letter
+from src.utils.retry import RetryPolicy, get_breaker, RETRY_STATUSES
+from src.utils.concurrency import get_controller, run_in_slot
+from src.utils import metrics
+from src.utils.batching import AdaptiveBatcher, ClaimSizer, make_item
+from src.utils.progress import ThroughputTracker, overall_fraction
+from src.utils.validators import preflight_products
+from src.utils.prefix_index import PrefixIndex
+from src.services import writeback
 from config import Config
 from src.utils.logger import logger
 
 # --- PHASE 1: BATCH TEXT PROCESSING ---
-def worker_import_batch_v12(rows_chunk, domain, secret, pub_col_letter):
+def build_product_payload(row):
+    """One sheet row -> (sku, import-product-batch item), or None if the row has no ID/SKU."""
+    sheet_id_val = get_val(row, ['ID', 'id', 'Product ID'])
+    sheet_sku_val = get_val(row, ['SKU', 'sku', 'Model'])
+    final_sku = sheet_id_val if sheet_id_val else sheet_sku_val
+    if not final_sku: return None
+
+    # Extract images
+    raw_images = get_val(row, ['Images', 'images', 'Image URL'])
+    image_list = []
+    if raw_images:
+        parts = raw_images.replace('\n', ',').replace('\r', '').split(',')
+        image_list = [p.strip().strip('"') for p in parts if p.strip()]
+
+    return final_sku, {
+        "sku": final_sku,
+        "title": get_val(row, ['Name', 'Title', 'title']),
+        "price": get_val(row, ['Regular price', 'Price']),
+        "description": get_val(row, ['Description', 'description']),
+        "images": image_list
+    }
+
+def payload_hash(payload):
+    """Stable hash of one product payload (key order and whitespace do not matter)."""
+    blob = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+def row_hashes(data_rows):
+    """{sku: payload hash} for every row with an ID/SKU (a later duplicate wins, like on the server)."""
+    hashes = {}
+    for row in data_rows:
+        built = build_product_payload(row)
+        if built: hashes[built[0]] = payload_hash(built[1])
+    return hashes
+
+def select_changed_rows(data_rows, domain, secret, hashes, policy=None):
+    """
+    Drop rows whose payload hash matches the last successful import of that
+    SKU and whose product still exists on the site. Returns (rows to send,
+    skipped count). If the site's SKU list cannot be read nothing is skipped.
+    """
+    stored = catalog.get_import_hashes(domain)
+    if not stored: return data_rows, 0
+    candidates = {sku for sku, h in hashes.items() if stored.get(sku) == h}
+    if not candidates: return data_rows, 0
+    try:
+        on_site = sku_cache.sync_sku_set(domain, secret, policy=policy)
+    except woo.WooStreamError as e:
+        logger.warning(f"Could not verify unchanged SKUs on the site ({e}); sending every row")
+        return data_rows, 0
+    unchanged = candidates & on_site
+    rows = []
+    for row in data_rows:
+        built = build_product_payload(row)
+        if built and built[0] in unchanged: continue
+        rows.append(row)
+    return rows, len(data_rows) - len(rows)
+
+def preflight_rows(data_rows, status_col='A'):
+    """
+    Validate every row before anything is sent (validators.preflight_products).
+    Returns (rows to send, sheet updates for rejected rows, {sku: error} of
+    invalid rows, duplicate rows dropped). Rows without ID/SKU pass through
+    and are skipped at batch time, as before.
+    """
+    built = [(row, build_product_payload(row)) for row in data_rows]
+    checked = [(row, b) for row, b in built if b]
+    errors = preflight_products([b[1] for _, b in checked], [row.get('_real_row') for row, _ in checked])
+    rejected = {id(row): err for (row, _), err in zip(checked, errors) if err}
+    if not rejected: return data_rows, [], {}, 0
+    updates, results, duplicates = [], {}, 0
+    for (row, (sku, _)), err in zip(checked, errors):
+        if not err: continue
+        if err.startswith("Skipped"):
+            duplicates += 1
+        else:
+            err = f"Error: {err}"
+            results[sku] = err
+        if row.get('_real_row'):
+            updates.append({'range': f"{status_col}{row['_real_row']}", 'values': [[err]]})
+    rows = [row for row in data_rows if id(row) not in rejected]
+    return rows, updates, results, duplicates
+
+def apply_preflight(job_id, data_rows, writer, logs, status_col='A'):
+    """Drop rows that can never import; their errors go to the sheet through the job journal."""
+    if not Config.IMPORT_PREFLIGHT or not data_rows: return data_rows
+    rows, updates, results, duplicates = preflight_rows(data_rows, status_col)
+    if updates:
+        journal.record_chunk(job_id, 0, results, updates)
+        writer.added(len(updates))
+    if len(rows) < len(data_rows):
+        logs.append(f"Pre-flight: {len(results)} invalid rows rejected, {duplicates} duplicate SKU rows dropped "
+                    f"(last row wins), {len(rows)} to send")
+    return rows
+
+def batch_results(res, payload_list):
+    """{sku: 'success' | error message} for one import-product-batch call."""
+    if res is None or res.status_code != 200:
+        err = f"Error {res.status_code}" if res is not None else "Conn Error"
+        return {p['sku']: err for p in payload_list}
+    try:
+        return {str(i.get('sku')): 'success' if i.get('status') == 'success' else f"Error: {i.get('message')}"
+                for i in res.json().get('results', [])}
+    except ValueError:
+        return {p['sku']: "Error: invalid response" for p in payload_list}
+
+def remember_hashes(domain, hashes, results):
+    """Store the payload hash of each SKU the server confirmed so the next run can skip it."""
+    done = {sku: hashes[sku] for sku, status in results.items() if status == 'success' and sku in hashes}
+    if not done: return
+    try:
+        catalog.save_import_hashes(domain, done)
+    except Exception as e:  # sqlite3 / disk errors only cost a resend next time
+        logger.warning(f"Could not store import hashes: {e}")
+
+def checkpoint_batch(job_id, writer, domain, hashes, n_rows, results, updates):
+    """Journal one finished batch, queue its sheet writes and remember the hashes of its successes."""
+    journal.record_chunk(job_id, n_rows, results, updates)
+    writer.added(len(updates))
+    remember_hashes(domain, hashes, results)
+
+def open_import_job(data_rows, domain, sheet_id, tab_name, resume_job, logs):
+    """
+    (job id, rows still to send). Resuming drops rows whose SKU already
+    succeeded in that job and replays its pending sheet writes first.
+    """
+    job = journal.get_job(resume_job) if resume_job else None
+    if job and job['status'] != journal.DONE:
+        done = journal.succeeded_skus(job['id'])
+        rows = []
+        for row in data_rows:
+            built = build_product_payload(row)
+            if built and built[0] in done: continue
+            rows.append(row)
+        written, pending = writeback.flush_pending(job['id'], sheet_id, tab_name)
+        logs.append(f"Resuming job {job['id'][:8]}: {len(data_rows) - len(rows)} rows already imported, "
+                    f"{written} sheet writes replayed" + (f", {pending} still pending" if pending else ""))
+        return job['id'], rows
+    if resume_job:
+        logs.append("Job to resume not found or already finished; starting a new one.")
+    return journal.start_job('import', domain, sheet_id, tab_name, len(data_rows)), data_rows
+
+def close_import_job(job_id, writer, logs):
+    """Final sheet flush and mark the job finished (resumable if writes are still pending)."""
+    written, pending = writer.close()
+    if written:
+        logs.append(f"Phase 1 Done. Data uploaded. Sheet updated (Done | 1): {written} updates in {writer.flushes} flushes.")
+    if journal.finish_job(job_id) == journal.INCOMPLETE:
+        logs.append(f"Sheet update failed: {pending} status writes kept in the job journal, resume the job to retry.")
+
+def count_media_rows(data_rows):
+    """Rows whose product will queue images on the server (Phase 2 work estimate)."""
+    return sum(1 for row in data_rows if (built := build_product_payload(row)) and built[1]['images'])
+
+def build_batch_payload(rows_chunk):
     payload_list = []
     sku_map = {} 
 
     for row in rows_chunk:
-        sheet_id_val = get_val(row, ['ID', 'id', 'Product ID'])
-        sheet_sku_val = get_val(row, ['SKU', 'sku', 'Model'])
-        final_sku = sheet_id_val if sheet_id_val else sheet_sku_val
-        if not final_sku: continue
-
-        # Extract images
-        raw_images = get_val(row, ['Images', 'images', 'Image URL'])
-        image_list = []
-        if raw_images:
-            parts = raw_images.replace('\n', ',').replace('\r', '').split(',')
-            image_list = [p.strip().strip('"') for p in parts if p.strip()]
-
-        payload_list.append({
-            "sku": final_sku,
-            "title": get_val(row, ['Name', 'Title', 'title']),
-            "price": get_val(row, ['Regular price', 'Price']),
-            "description": get_val(row, ['Description', 'description']),
-            "images": image_list
-        })
+        built = build_product_payload(row)
+        if not built: continue
+        final_sku, payload = built
+        payload_list.append(payload)
         sku_map[final_sku] = row.get('_real_row')
+    return payload_list, sku_map
 
-    if not payload_list: return []
+def build_batch_items(data_rows):
+    """Sized BatchItems for the adaptive batcher (rows without ID/SKU are skipped, as before)."""
+    items = []
+    for row in data_rows:
+        built = build_product_payload(row)
+        if built: items.append(make_item(built[0], built[1], row.get('_real_row')))
+    return items
 
-    # Send Batch API
-    res = woo.post_product_batch_v12(domain, secret, payload_list)
-    
+def parse_batch_result(res, payload_list, sku_map, pub_col_letter, status_col='A'):
     updates = []
     if res and res.status_code == 200:
-        data = res.json().get('results', [])
+        try:
+            data = res.json().get('results', [])
+        except ValueError:
+            return [{'range': f'{status_col}{r}', 'values': [["Error: invalid response"]]}
+                    for r in (sku_map.get(p['sku']) for p in payload_list) if r]
         for item in data:
             sku = item.get('sku')
             status = item.get('status')
@@ -47,81 +208,560 @@ def worker_import_batch_v12(rows_chunk, domain, secret, pub_col_letter):
             if row_idx:
                 if status == 'success':
                     # [RULE 2] SUCCESS -> Done | 1
-                    updates.append({'range': f'A{row_idx}', 'values': [['Done']]})
+                    updates.append({'range': f'{status_col}{row_idx}', 'values': [['Done']]})
                     if pub_col_letter:
                         updates.append({'range': f'{pub_col_letter}{row_idx}', 'values': [[1]]})
                 else:
-                    updates.append({'range': f'A{row_idx}', 'values': [[f"Error: {item.get('message')}"]]})
+                    updates.append({'range': f'{status_col}{row_idx}', 'values': [[f"Error: {item.get('message')}"]]})
     else:
         err = f"Error {res.status_code}" if res else "Conn Error"
         for p in payload_list:
             r = sku_map.get(p['sku'])
-            if r: updates.append({'range': f'A{r}', 'values': [[err]]})
+            if r: updates.append({'range': f'{status_col}{r}', 'values': [[err]]})
     return updates
 
+def _batch_ok(res):
+    return res is not None and res.status_code not in RETRY_STATUSES
+
+def _media_claim_ok(res):
+    """Only no answer (timeouts), 429 and 5xx mean the site is overloaded; a 401 or an HTML page is not congestion."""
+    return res is not None and res.get('http_status') not in RETRY_STATUSES
+
+def _has_success(updates):
+    """True if a parsed batch result marked at least one row Done (its images are queued)."""
+    return any(u['values'] == [['Done']] for u in updates or [])
+
+def worker_import_batch_v12(rows_chunk, domain, secret, pub_col_letter, policy=None, controller=None, status_col='A'):
+    """(sheet updates, {sku: result}) for one fixed-size chunk."""
+    payload_list, sku_map = build_batch_payload(rows_chunk)
+    if not payload_list: return [], {}
+
+    # Send Batch API (inside an adaptive concurrency slot)
+    res = run_in_slot(controller, woo.post_product_batch_v12, domain, secret, payload_list,
+                      policy=policy, is_ok=_batch_ok)
+    return parse_batch_result(res, payload_list, sku_map, pub_col_letter, status_col), batch_results(res, payload_list)
+
+def timed_post_batch(domain, secret, payload_list, policy=None, attempts=None):
+    """(response, seconds) for one import-product-batch call, retries included."""
+    started = time.monotonic()
+    res = woo.post_product_batch_v12(domain, secret, payload_list, policy=policy, attempts=attempts)
+    return res, time.monotonic() - started
+
+def iter_import_fixed(data_rows, domain, secret, pub_col_letter, policy=None, controller=None, status_col='A'):
+    """Phase 1 in fixed Config.CHUNK_SIZE chunks. Yields (sheet updates, rows in batch, {sku: result}) as batches finish."""
+    chunk_size = Config.CHUNK_SIZE
+    chunks = [data_rows[i:i + chunk_size] for i in range(0, len(data_rows), chunk_size)]
+    workers = controller.max_limit if controller else Config.PHASE1_WORKERS
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {executor.submit(worker_import_batch_v12, c, domain, secret, pub_col_letter, policy, controller,
+                                   status_col): len(c)
+                   for c in chunks}
+        for future in concurrent.futures.as_completed(futures):
+            updates, results = future.result()
+            yield updates, futures[future], results
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)  # closed early: drop chunks not started yet
+
+def iter_import_adaptive(batcher, domain, secret, pub_col_letter, policy=None, controller=None, status_col='A'):
+    """
+    Phase 1 with batches cut by AdaptiveBatcher (payload bytes + observed
+    seconds per product). Only about as many batches as the controller
+    allows are cut ahead (one until the first success), so sizes follow
+    the feedback quickly. A failed
+    batch is split and re-queued (with few retries of its own); a single
+    product that still fails gets its error written back.
+    Yields (sheet updates, products in batch, {sku: result}) as batches finish.
+    """
+    breaker = get_breaker(domain)
+    workers = controller.max_limit if controller else Config.PHASE1_WORKERS
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    pending = {}  # future -> batch
+
+    def submit():
+        batch = batcher.next_batch()
+        if not batch: return False
+        attempts = None if len(batch) == 1 else Config.BATCH_SPLIT_ATTEMPTS
+        fut = executor.submit(run_in_slot, controller, timed_post_batch, domain, secret, [i.payload for i in batch],
+                              policy=policy, attempts=attempts, is_ok=lambda r: _batch_ok(r[0]))
+        pending[fut] = batch
+        return True
+
+    def window():
+        # One probe batch until a batch has succeeded, so a too-big start size
+        # costs one timeout instead of a burst that trips the circuit breaker
+        if batcher.sec_per_item is None:
+            return 1
+        return (controller.limit if controller else workers) + 1
+
+    try:
+        while True:
+            while len(pending) < window() and submit():
+                pass
+            if not pending: return
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for fut in done:
+                batch = pending.pop(fut)
+                res, seconds = fut.result()
+                ok = res is not None and res.status_code == 200
+                batcher.record(len(batch), seconds, ok, sum(i.size for i in batch))
+                # Too slow / too big for the server: retry as smaller batches (not on 4xx like a bad key)
+                too_heavy = res is None or res.status_code in RETRY_STATUSES + (413,)
+                if too_heavy and not breaker.is_open and batcher.split(batch):
+                    continue
+                payload_list = [i.payload for i in batch]
+                sku_map = {i.key: i.row for i in batch}
+                yield (parse_batch_result(res, payload_list, sku_map, pub_col_letter, status_col), len(batch),
+                       batch_results(res, payload_list))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
 # --- PHASE 2: WORKER TRIGGER ---
-def worker_trigger_loop(domain, secret):
+def _upload_finished(upload_done):
+    return upload_done is None or upload_done.is_set()
+
+def worker_trigger_loop(domain, secret, policy=None, controller=None, upload_done=None, sizer=None, tracker=None,
+                        stop=None):
+    """
+    Drain the media queue, claiming `sizer.size` products per call (sized
+    from the server time per product, shared by the job's drainers).
+    Snippets V12.6+ report the queue depth (`remaining`): once Phase 1 has
+    finished uploading (always, without `upload_done`) the drainer stops as
+    soon as nothing is left to claim. Older snippets stop after 3 empty polls. An empty
+    queue is polled with exponential backoff; a pipelined drainer wakes up
+    as soon as the upload finishes. `tracker` (ThroughputTracker) gets the
+    processed counts and the reported queue depth. Setting `stop` ends the
+    drainer after its current call (the rest stays queued on WordPress).
+    """
+    sizer = sizer or ClaimSizer()
     processed_count = 0
     consecutive_empty = 0
-    while True:
-        res = woo.trigger_process_media(domain, secret, limit=1)
+    idle = Config.MEDIA_IDLE_BACKOFF_MIN
+    breaker = get_breaker(domain)
+    while stop is None or not stop.is_set():
+        limit = sizer.size
+        started = time.monotonic()
+        res = run_in_slot(controller, woo.trigger_process_media, domain, secret, limit=limit, policy=policy,
+                          is_ok=_media_claim_ok)
         if res and res.get('status') == 'processing':
-            processed_count += res.get('processed_count', 0)
+            done = res.get('processed_count', 0)
+            sizer.record(done or limit, time.monotonic() - started)
+            processed_count += done
+            if tracker: tracker.add(done, res.get('remaining'))
             consecutive_empty = 0
-            time.sleep(Config.PHASE_DELAY)
+            idle = Config.MEDIA_IDLE_BACKOFF_MIN
+            if res.get('remaining') == 0 and _upload_finished(upload_done): break
         elif res and res.get('status') == 'done':
-            consecutive_empty += 1
-            if consecutive_empty > 2: break 
-            time.sleep(Config.WORKER_COMPLETION_DELAY)
+            if _upload_finished(upload_done):
+                consecutive_empty += 1
+                if 'remaining' in res or consecutive_empty > 2: break
+            # More batches are still being queued (or a legacy snippet): wait, doubling the pause
+            if upload_done is not None and not upload_done.is_set():
+                upload_done.wait(idle)
+            else:
+                time.sleep(idle)
+            idle = min(idle * 2, Config.MEDIA_IDLE_BACKOFF_MAX)
         else:
+            # Site is down: stop this worker instead of hammering it
+            sizer.record(limit, time.monotonic() - started, ok=False)
+            if breaker.is_open: break
             consecutive_empty += 1
             if consecutive_empty > 5: break
             time.sleep(5)
     return processed_count
 
 # --- MAIN CONTROLLER ---
-def process_import(data_rows, domain, secret, mode, sheet_id, tab_name, max_workers=15, progress_callback=None):
+_last_rows = (None, None)  # (sheet values, parsed rows) of the last snapshot loaded
+
+def load_sheet_rows(sheet_id, tab_name):
+    """
+    Every data row of a tab as {header: value}, plus '_real_row' (sheet row
+    number), from the db.get_sheet_values snapshot cache. An unchanged
+    snapshot returns the same (shared, read-only) row list, so its
+    row_index is reused too. Empty list for a header-only tab; raises if
+    Sheets is unreachable.
+    """
+    global _last_rows
+    vals = db.get_sheet_values(sheet_id, tab_name)
+    cached_vals, cached_rows = _last_rows
+    if cached_vals is vals: return cached_rows
+    if len(vals) < 2: return []
+    header = [str(x).strip() for x in vals[0]]
+    rows = []
+    for i, values in enumerate(vals[1:]):
+        row = dict(zip(header, list(values) + [''] * (len(header) - len(values))))
+        row['_real_row'] = i + 2
+        rows.append(row)
+    _last_rows = (vals, rows)
+    return rows
+
+def find_id_key(header):
+    """First ID / Product ID / SKU column name, or None."""
+    return next((k for k in header if str(k).lower() in ['id', 'product id', 'sku']), None)
+
+_last_index = (None, None)  # (rows, PrefixIndex): reused while the same snapshot is filtered again
+
+def row_index(rows):
+    """PrefixIndex over the ID / Product ID / SKU column (values = row positions), or None without one."""
+    global _last_index
+    cached_rows, index = _last_index
+    if cached_rows is rows: return index
+    id_key = find_id_key(rows[0].keys()) if rows else None
+    index = PrefixIndex.from_keys(r.get(id_key, '') for r in rows) if id_key else None
+    _last_index = (rows, index)
+    return index
+
+def filter_rows(rows, filter_ids):
+    """Rows whose ID / Product ID / SKU column starts with any of filter_ids (all rows without filters), in sheet order."""
+    if not filter_ids or not rows: return rows
+    index = row_index(rows)
+    if index is None: return rows
+    return [rows[i] for i in sorted(index.match(filter_ids))]
+
+def find_pub_col_letter(data_rows):
+    if not data_rows: return None
+    headers = list(data_rows[0].keys())
+    for i, h in enumerate(headers):
+        if h.lower().strip() in ['published', 'active', 'is_published']:
+            return col_idx_to_letter(i)
+    return None
+
+def process_import(data_rows, domain, secret, mode, sheet_id, tab_name, max_workers=15, progress_callback=None, pipelined=None,
+                   adaptive=None, force_all=False, resume_job=None, status_col='A', mark_published=True):
+    """
+    Phase 1 uploads text batches, Phase 2 drains the WordPress media queue.
+    Pipelined (Config.IMPORT_PIPELINED): the drainers start as soon as the
+    first batch succeeds and run alongside the upload; each phase keeps its
+    own AIMD controller ('import' / 'media').
+    Adaptive (Config.ADAPTIVE_BATCHING): batch sizes follow payload bytes and
+    server time per product instead of a fixed CHUNK_SIZE.
+    Delta (Config.IMPORT_SKIP_UNCHANGED): rows whose payload hash matches the
+    last successful import of that SKU are not sent; force_all sends them.
+    Pre-flight (Config.IMPORT_PREFLIGHT): invalid rows and earlier rows of a
+    repeated SKU get their status written to the sheet without being sent.
+    Every batch is checkpointed in the job journal; pass resume_job (a
+    journal job id) to continue an interrupted run.
+    Row statuses go to `status_col`; mark_published=False leaves the
+    Published column alone (see process_import_multi).
+    """
     logs = []
-    batch_updates = []
+    policy = RetryPolicy(job="import")  # one retry budget for the whole job
+    started = metrics.snapshot()
+    pipelined = Config.IMPORT_PIPELINED if pipelined is None else pipelined
+    adaptive = Config.ADAPTIVE_BATCHING if adaptive is None else adaptive
     
     if mode == 'data':
-        # Find Published Column
-        pub_col_letter = None
-        if data_rows:
-            headers = list(data_rows[0].keys())
-            for i, h in enumerate(headers):
-                if h.lower().strip() in ['published', 'active', 'is_published']:
-                    pub_col_letter = col_idx_to_letter(i)
-                    break
+        pub_col_letter = find_pub_col_letter(data_rows) if mark_published else None
+        hashes = row_hashes(data_rows)
+        job_id, data_rows = open_import_job(data_rows, domain, sheet_id, tab_name, resume_job, logs)
+        writer = writeback.SheetWriteBack(job_id, sheet_id, tab_name)
+        data_rows = apply_preflight(job_id, data_rows, writer, logs, status_col)
+        if Config.IMPORT_SKIP_UNCHANGED and not force_all and data_rows:
+            data_rows, skipped = select_changed_rows(data_rows, domain, secret, hashes, policy)
+            if skipped:
+                logs.append(f"Delta import: {skipped} unchanged rows skipped, {len(data_rows)} to send")
+        if not data_rows:
+            close_import_job(job_id, writer, logs)
+            logs.append("Nothing to import: every row is invalid, unchanged or already done.")
+            return logs
         
         logs.append(f"=== PHASE 1: DATA IMPORT (Pub Col: {pub_col_letter}) ===")
         
-        chunk_size = Config.CHUNK_SIZE
-        chunks = [data_rows[i:i + chunk_size] for i in range(0, len(data_rows), chunk_size)]
+        # Pipelined: both phases share the site's connection pool at the same time
+        woo.configure_pool(domain, Config.PHASE1_MAX_WORKERS + max_workers if pipelined else max(5, max_workers))
         
+        # Pool runs at the ceiling; the per-site AIMD controller decides how many batches are in flight
+        ctrl_import = get_controller(domain, 'import', Config.PHASE1_WORKERS, Config.PHASE1_MAX_WORKERS)
+        batcher = None
+        if adaptive:
+            batcher = AdaptiveBatcher(build_batch_items(data_rows))
+            batches = iter_import_adaptive(batcher, domain, secret, pub_col_letter, policy, ctrl_import, status_col)
+        else:
+            batches = iter_import_fixed(data_rows, domain, secret, pub_col_letter, policy, ctrl_import, status_col)
+        ctrl_media = get_controller(domain, 'media', max(1, max_workers // 2), max_workers)
+        upload_done = threading.Event()
+        stop_media = threading.Event()  # set when the job is aborted (e.g. cancelled from its progress callback)
+        drainers = []
+        import_progress = ThroughputTracker(len(data_rows))
+        media_progress = ThroughputTracker(count_media_rows(data_rows))
+
+        def report(phase):
+            if progress_callback:
+                tracker = import_progress if phase == 'import' else media_progress
+                progress_callback(tracker.event(phase, overall_fraction(import_progress, media_progress)))
+
+        def launch_drainers(media_executor):
+            logs.append("=== PHASE 2: BACKGROUND IMAGE DOWNLOADING ===")
+            logs.append(f"Launching {max_workers} Workers (adaptive, starting at {ctrl_media.limit} concurrent)...")
+            sizer = ClaimSizer()
+            return [media_executor.submit(worker_trigger_loop, domain, secret, policy, ctrl_media, upload_done, sizer,
+                                          media_progress, stop_media)
+                    for _ in range(max_workers)]
+
         completed_batches = 0
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            futures = [executor.submit(worker_import_batch_v12, c, domain, secret, pub_col_letter) for c in chunks]
-            for future in concurrent.futures.as_completed(futures):
-                res = future.result()
-                if res: batch_updates.extend(res)
-                completed_batches += 1
-                if progress_callback: progress_callback(completed_batches / len(chunks) * 0.1, completed_batches, len(chunks))
-
-        if batch_updates:
-            db.update_sheet_batch(sheet_id, tab_name, batch_updates)
-            logs.append("Phase 1 Done. Data uploaded. Sheet updated (Done | 1).")
-
-        # PHASE 2
-        logs.append("=== PHASE 2: BACKGROUND IMAGE DOWNLOADING ===")
-        logs.append(f"Launching {max_workers} Workers...")
-        
         total_processed_imgs = 0
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [executor.submit(worker_trigger_loop, domain, secret) for _ in range(max_workers)]
-            for future in concurrent.futures.as_completed(futures):
-                total_processed_imgs += future.result()
-                if progress_callback: progress_callback(1.0, total_processed_imgs, len(data_rows))
+        media_executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            writer.start()
+            try:
+                for res, n_rows, results in batches:
+                    checkpoint_batch(job_id, writer, domain, hashes, n_rows, results, res or [])
+                    completed_batches += 1
+                    import_progress.add(n_rows)
+                    report('import')
+                    if drainers: report('media')
+                    if pipelined and not drainers and _has_success(res):
+                        logs.append(f"Pipelined: media processing started after batch {completed_batches}")
+                        drainers = launch_drainers(media_executor)
+            finally:
+                batches.close()  # an aborted Phase 1 stops submitting batches
+                upload_done.set()  # lets running drainers finish even if Phase 1 failed
+                writer.close()  # final flush; a failed job stays resumable
+            if batcher is not None:
+                logs.extend(batcher.decisions)
+                logs.append(f"Phase 1: {completed_batches} batches, final batch size {batcher.size}")
+
+            close_import_job(job_id, writer, logs)
 
+            # PHASE 2 (not started yet if pipelining is off or no batch succeeded)
+            import_progress.finish()
+            report('import')
+            if not drainers:
+                drainers = launch_drainers(media_executor)
+            running = set(drainers)
+            while running:
+                finished, running = concurrent.futures.wait(running, timeout=Config.PROGRESS_INTERVAL)
+                for future in finished:
+                    total_processed_imgs += future.result()
+                report('media')
+            media_progress.finish()
+            report('media')
+            logs.append(f"Phase 2: {total_processed_imgs} products got their images "
+                        f"({media_progress.rate:.2f}/s over the last {int(media_progress.window)}s)")
+        except BaseException:
+            stop_media.set()
+            raise
+        finally:
+            media_executor.shutdown(wait=True)
+
+        logs.append(f"Final concurrency: import={ctrl_import.limit}, media={ctrl_media.limit}")
+        logs.extend(metrics.job_report(domain, policy.job, started))
+        if get_breaker(domain).is_open:
+            logs.append("Site stopped responding (circuit open). Remaining images stay queued on WordPress.")
         logs.append("=== ALL PHASES COMPLETED ===")
-    return logs
\ No newline at end of file
+    return logs
+
+# --- MULTI-SITE FAN-OUT ---
+def status_header(site):
+    return Config.FANOUT_STATUS_HEADER.format(site=site['site_name'])
+
+class ImportStopped(Exception):
+    """Raised inside the site imports of a fan-out once the caller's progress callback raised."""
+
+
+def process_import_multi(data_rows, sites, sheet_id, tab_name, max_workers=15, progress_callback=None, force_all=False,
+                         resume=False):
+    """
+    Import one sheet snapshot into several sites at once. Every site runs
+    its own process_import in its own thread, so it keeps its own AIMD
+    controllers, circuit breaker, retry budget and journal job, and wall
+    time follows the slowest site. Each site writes its row statuses to its
+    own column (Config.FANOUT_STATUS_HEADER, added to the sheet if missing);
+    the Published column is left alone. progress_callback(site_name, event)
+    is called from the caller's thread; if it raises (e.g. a cancelled job),
+    every site import stops at its next progress event and the exception
+    is re-raised. Returns {site_name: logs} ({} for no sites).
+    """
+    if not sites: return {}
+    columns = db.ensure_columns(sheet_id, tab_name, [status_header(s) for s in sites])
+    if columns is None: raise RuntimeError("Google Sheets connection failed")
+    events = queue.Queue()
+    stop = threading.Event()
+
+    def run(site):
+        resume_job = None
+        if resume:
+            unfinished = journal.find_resumable('import', site['domain_url'], sheet_id, tab_name)
+            resume_job = unfinished['id'] if unfinished else None
+
+        def on_event(ev):
+            if stop.is_set(): raise ImportStopped()
+            events.put((site['site_name'], ev))
+
+        return process_import(data_rows, site['domain_url'], site['secret_key'], 'data', sheet_id, tab_name, max_workers,
+                              on_event, force_all=force_all, resume_job=resume_job,
+                              status_col=columns[status_header(site)], mark_published=False)
+
+    def forward_events():
+        while True:
+            try:
+                name, ev = events.get_nowait()
+            except queue.Empty:
+                return
+            if progress_callback: progress_callback(name, ev)
+
+    results = {}
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(sites), thread_name_prefix="fanout")
+    try:
+        futures = {executor.submit(run, site): site['site_name'] for site in sites}
+        running = set(futures)
+        while running:
+            finished, running = concurrent.futures.wait(running, timeout=Config.PROGRESS_INTERVAL)
+            forward_events()
+            for future in finished:
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    logger.error(f"Fan-out import to {name} failed: {e}", exc_info=True)
+                    results[name] = [f"Import failed: {e}"]
+        forward_events()
+    except BaseException:
+        stop.set()  # site imports raise ImportStopped at their next event
+        raise
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    return results
+
+# --- ASYNC PIPELINE (single event loop, bounded by semaphores) ---
+async def worker_import_batch_async(rows_chunk, domain, secret, pub_col_letter, policy=None):
+    payload_list, sku_map = build_batch_payload(rows_chunk)
+    if not payload_list: return [], {}
+    res = await woo_async.post_product_batch_v12(domain, secret, payload_list, policy=policy)
+    return parse_batch_result(res, payload_list, sku_map, pub_col_letter), batch_results(res, payload_list)
+
+async def worker_trigger_loop_async(domain, secret, policy=None, upload_done=None, sizer=None, tracker=None):
+    """Coroutine version of worker_trigger_loop (same claim sizing and stop rules)."""
+    sizer = sizer or ClaimSizer()
+    processed_count = 0
+    consecutive_empty = 0
+    idle = Config.MEDIA_IDLE_BACKOFF_MIN
+    breaker = get_breaker(domain)
+    while True:
+        limit = sizer.size
+        started = time.monotonic()
+        res = await woo_async.trigger_process_media(domain, secret, limit=limit, policy=policy)
+        if res and res.get('status') == 'processing':
+            done = res.get('processed_count', 0)
+            sizer.record(done or limit, time.monotonic() - started)
+            processed_count += done
+            if tracker: tracker.add(done, res.get('remaining'))
+            consecutive_empty = 0
+            idle = Config.MEDIA_IDLE_BACKOFF_MIN
+            if res.get('remaining') == 0 and _upload_finished(upload_done): break
+        elif res and res.get('status') == 'done':
+            if _upload_finished(upload_done):
+                consecutive_empty += 1
+                if 'remaining' in res or consecutive_empty > 2: break
+            if upload_done is not None and not upload_done.is_set():
+                try:
+                    await asyncio.wait_for(upload_done.wait(), idle)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(idle)
+            idle = min(idle * 2, Config.MEDIA_IDLE_BACKOFF_MAX)
+        else:
+            sizer.record(limit, time.monotonic() - started, ok=False)
+            if breaker.is_open: break
+            consecutive_empty += 1
+            if consecutive_empty > 5: break
+            await asyncio.sleep(5)
+    return processed_count
+
+async def process_import_async(data_rows, domain, secret, mode, sheet_id, tab_name, max_workers=15, progress_callback=None, phase1_workers=5, pipelined=None,
+                               force_all=False, resume_job=None):
+    """
+    Coroutine version of process_import. Phase 1 batches and Phase 2 drainers
+    are coroutines on one event loop, so max_workers can go far beyond what a
+    thread pool would allow. Run with asyncio.run() from the UI thread.
+    """
+    logs = []
+    policy = RetryPolicy(job="import")
+    started = metrics.snapshot()
+    pipelined = Config.IMPORT_PIPELINED if pipelined is None else pipelined
+    if mode != 'data': return logs
+
+    pub_col_letter = find_pub_col_letter(data_rows)
+    hashes = await asyncio.to_thread(row_hashes, data_rows)
+    job_id, data_rows = await asyncio.to_thread(open_import_job, data_rows, domain, sheet_id, tab_name, resume_job, logs)
+    writer = writeback.SheetWriteBack(job_id, sheet_id, tab_name)
+    data_rows = await asyncio.to_thread(apply_preflight, job_id, data_rows, writer, logs)
+    if Config.IMPORT_SKIP_UNCHANGED and not force_all and data_rows:
+        data_rows, skipped = await asyncio.to_thread(select_changed_rows, data_rows, domain, secret, hashes, policy)
+        if skipped:
+            logs.append(f"Delta import: {skipped} unchanged rows skipped, {len(data_rows)} to send")
+    if not data_rows:
+        await asyncio.to_thread(close_import_job, job_id, writer, logs)
+        logs.append("Nothing to import: every row is invalid, unchanged or already done.")
+        return logs
+    logs.append(f"=== PHASE 1: DATA IMPORT (Pub Col: {pub_col_letter}) ===")
+    woo_async.open_site(domain, concurrency=max(max_workers, phase1_workers))
+
+    chunk_size = Config.CHUNK_SIZE
+    chunks = [data_rows[i:i + chunk_size] for i in range(0, len(data_rows), chunk_size)]
+    sem = asyncio.Semaphore(phase1_workers)
+
+    async def run_chunk(c):
+        async with sem:
+            updates, results = await worker_import_batch_async(c, domain, secret, pub_col_letter, policy)
+            return updates, results, len(c)
+
+    upload_done = asyncio.Event()
+    drainers = []
+    import_progress = ThroughputTracker(len(data_rows))
+    media_progress = ThroughputTracker(count_media_rows(data_rows))
+
+    def report(phase):
+        if progress_callback:
+            tracker = import_progress if phase == 'import' else media_progress
+            progress_callback(tracker.event(phase, overall_fraction(import_progress, media_progress)))
+
+    def launch_drainers():
+        logs.append("=== PHASE 2: BACKGROUND IMAGE DOWNLOADING ===")
+        logs.append(f"Launching {max_workers} async drainers...")
+        sizer = ClaimSizer()
+        return [asyncio.create_task(worker_trigger_loop_async(domain, secret, policy, upload_done, sizer, media_progress))
+                for _ in range(max_workers)]
+
+    writer.start()
+    try:
+        completed_batches = 0
+        for coro in asyncio.as_completed([run_chunk(c) for c in chunks]):
+            res, results, n_rows = await coro
+            # sqlite journal + hash store: off the event loop
+            await asyncio.to_thread(checkpoint_batch, job_id, writer, domain, hashes, n_rows, results, res or [])
+            completed_batches += 1
+            import_progress.add(n_rows)
+            report('import')
+            if drainers: report('media')
+            if pipelined and not drainers and _has_success(res):
+                logs.append(f"Pipelined: media processing started after batch {completed_batches}/{len(chunks)}")
+                drainers = launch_drainers()
+        upload_done.set()
+
+        await asyncio.to_thread(close_import_job, job_id, writer, logs)
+
+        # PHASE 2 (not started yet if pipelining is off or no batch succeeded)
+        import_progress.finish()
+        report('import')
+        if not drainers:
+            drainers = launch_drainers()
+        total_processed_imgs = 0
+        running = set(drainers)
+        while running:
+            finished, running = await asyncio.wait(running, timeout=Config.PROGRESS_INTERVAL)
+            for task in finished:
+                total_processed_imgs += task.result()
+            report('media')
+        media_progress.finish()
+        report('media')
+    finally:
+        for task in drainers:
+            task.cancel()
+        await asyncio.to_thread(writer.close)  # no-op after close_import_job; keeps a failed job resumable
+        await woo_async.aclose_site(domain)
+
+    logs.extend(metrics.job_report(domain, policy.job, started))
+    logs.append("=== ALL PHASES COMPLETED ===")
+    return logs
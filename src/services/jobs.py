@@ -0,0 +1,219 @@
+"""
+Headless job runners.
+
+The same service calls the dashboard makes (import, sheet sync, product
+delete, media wipe, media sync), driven by plain parameters so they can
+run from scripts/run_job.py or a background worker without a Streamlit
+session. Every runner returns {'ok': bool, 'summary': str, 'logs': [str]}
+and reports progress as plain dicts through `progress` (see _progress).
+
+run_queued executes one job claimed from the Supabase job_queue (see
+scripts/job_worker.py): a heartbeat thread publishes the latest progress
+and picks up cancel requests, which stop the job at its next progress call.
+"""
+
+import inspect
+import threading
+from config import Config
+from src.repositories import db, journal
+from src.services import importer, checker, deleter, media_updater
+from src.utils.logger import logger
+
+
+class JobError(Exception):
+    """Bad parameters or site configuration; nothing was started."""
+
+
+class JobCancelled(Exception):
+    """Raised from the progress callback once a cancel was requested."""
+
+
+def find_site(key, sites=None):
+    """Site row from Supabase woo_sites by id, site_name (case-insensitive) or domain."""
+    sites = db.get_all_sites() if sites is None else sites
+    want = str(key).strip().lower().rstrip('/')
+    for site in sites:
+        candidates = (str(site.get('id', '')), str(site.get('site_name', '')).lower(),
+                      str(site.get('domain_url', '')).lower().rstrip('/'))
+        if want in candidates:
+            return site
+    raise JobError(f"Site not found: {key}")
+
+
+def _progress(progress, phase, fraction, done=None, total=None, **extra):
+    if progress:
+        progress(dict(phase=phase, fraction=round(float(fraction), 4), done=done, total=total, **extra))
+
+
+def _require(site, *fields):
+    missing = [f for f in fields if not site.get(f)]
+    if missing:
+        raise JobError(f"Site '{site.get('site_name')}' has no {', '.join(missing)}")
+
+
+# --- RUNNERS ---
+def run_import(site, tab, threads=15, filter_ids=None, force_all=False, resume=False, progress=None):
+    _require(site, 'domain_url', 'secret_key', 'google_sheet_id')
+    rows = importer.filter_rows(importer.load_sheet_rows(site['google_sheet_id'], tab), filter_ids)
+    if not rows:
+        return {'ok': False, 'summary': "No rows to import (empty sheet or no filter match).", 'logs': []}
+    resume_job = None
+    if resume:
+        unfinished = journal.find_resumable('import', site['domain_url'], site['google_sheet_id'], tab)
+        resume_job = unfinished['id'] if unfinished else None
+
+    def on_event(ev):
+        if progress:
+            progress(ev._asdict())
+
+    logs = importer.process_import(rows, site['domain_url'], site['secret_key'], 'data', site['google_sheet_id'], tab,
+                                   threads, on_event, force_all=force_all, resume_job=resume_job)
+    ok = not any(line.startswith("Sheet update failed") for line in logs)
+    return {'ok': ok, 'summary': f"Processed {len(rows)} rows.", 'logs': logs}
+
+
+def run_import_multi(site, tab, site_ids, threads=15, filter_ids=None, force_all=False, resume=False, progress=None):
+    """Import `site`'s sheet tab into every site in site_ids at once (importer.process_import_multi)."""
+    _require(site, 'google_sheet_id')
+    all_sites = db.get_all_sites()
+    targets = [find_site(i, all_sites) for i in site_ids]
+    if not targets:
+        raise JobError("No target sites")
+    for target in targets:
+        _require(target, 'domain_url', 'secret_key')
+    rows = importer.filter_rows(importer.load_sheet_rows(site['google_sheet_id'], tab), filter_ids)
+    if not rows:
+        return {'ok': False, 'summary': "No rows to import (empty sheet or no filter match).", 'logs': []}
+
+    def on_event(name, ev):
+        if progress:
+            progress(dict(site=name, **ev._asdict()))
+
+    per_site = importer.process_import_multi(rows, targets, site['google_sheet_id'], tab, threads, on_event,
+                                             force_all=force_all, resume=resume)
+    logs = [f"[{name}] {line}" for name, lines in per_site.items() for line in lines]
+    ok = not any(line.startswith(("Sheet update failed", "Import failed")) for lines in per_site.values() for line in lines)
+    return {'ok': ok, 'summary': f"Processed {len(rows)} rows into {len(targets)} sites.", 'logs': logs}
+
+
+def run_sync(site, tab, threads=20, progress=None):
+    _require(site, 'domain_url', 'secret_key', 'google_sheet_id')
+    logs = checker.run_sync_sheet_with_website(site, tab, threads, lambda p: _progress(progress, 'sync', p))
+    ok = bool(logs) and not logs[0].startswith(("Sync Error", "Connection Error"))
+    return {'ok': ok, 'summary': logs[0] if logs else "", 'logs': logs}
+
+
+def run_delete(site, ids=None, wipe=False, tab=None, threads=10, progress=None):
+    """Delete `ids` (or every published product with wipe=True), then mark the rows Holding in `tab`."""
+    _require(site, 'domain_url', 'secret_key')
+    if bool(ids) == bool(wipe):
+        raise JobError("Pass either ids or wipe=True")
+    on_progress = lambda p, done, total: _progress(progress, 'delete', p, done, total)
+    if wipe:
+        _require(site, 'consumer_key', 'consumer_secret')
+        logs, skus = deleter.delete_all_products_scan_mode(site['domain_url'], site['consumer_key'],
+                                                           site['consumer_secret'], site['secret_key'],
+                                                           threads, on_progress)
+    else:
+        logs, skus = deleter.delete_product_list(site['domain_url'], site['secret_key'], [str(i) for i in ids],
+                                                 threads, on_progress)
+    if tab and skus and site.get('google_sheet_id'):
+        logs = logs + deleter.sync_deleted_rows(site['google_sheet_id'], tab, skus)
+    ok = bool(logs) and logs[0] != "Connect Fail"
+    return {'ok': ok, 'summary': logs[0] if logs else "", 'logs': logs, 'deleted': len(skus)}
+
+
+def run_delete_media(site, threads=10, progress=None):
+    _require(site, 'domain_url', 'secret_key')
+    ok, msg = deleter.delete_all_media(site['domain_url'], site['secret_key'], threads,
+                                       lambda p, done, total: _progress(progress, 'delete-media', done / total if total else 1,
+                                                                        done, total))
+    return {'ok': ok, 'summary': msg, 'logs': [msg]}
+
+
+def run_media_sync(site, tab, limit=5000, progress=None):
+    """Image tab sync: WordPress media -> sheet, then push queued title/slug changes back to WordPress."""
+    _require(site, 'domain_url', 'secret_key', 'google_sheet_id')
+    _progress(progress, 'media-sync', 0.0)
+    media_data = media_updater.iter_all_media(site['domain_url'], site['secret_key'], limit)
+    result = media_updater.sync_media_to_sheet(site['google_sheet_id'], tab, media_data)
+    if "error" in result:
+        return {'ok': False, 'summary': f"Sync Failed: {result['error']}", 'logs': [result['error']]}
+    _progress(progress, 'media-sync', 0.3, result['total'])
+    summary = f"Updated Sheet: {result['updated']} | Created: {result['created']} | Total Scanned: {result['total']}"
+    logs = [summary]
+    queued = result.get('wp_updates_queued') or []
+    if queued:
+        _progress(progress, 'media-sync', 0.6, 0, len(queued))
+        res_exe = media_updater.execute_wp_updates(site['domain_url'], site['secret_key'], queued)
+        logs += res_exe['logs']
+        summary += f" | WP Titles Updated: {res_exe['updated_count']}"
+    _progress(progress, 'media-sync', 1.0)
+    return {'ok': True, 'summary': summary, 'logs': logs}
+
+
+# Keep in sync with the job_queue.kind CHECK in migrations/002_add_job_queue.sql
+RUNNERS = {
+    'import': run_import,
+    'import-multi': run_import_multi,
+    'sync': run_sync,
+    'delete': run_delete,
+    'delete-media': run_delete_media,
+    'media-sync': run_media_sync,
+}
+
+
+def run_job(kind, site, params=None, progress=None):
+    """Run one job by name. Raises JobError for unknown kinds or bad parameters."""
+    runner = RUNNERS.get(kind)
+    if runner is None:
+        raise JobError(f"Unknown job kind: {kind}")
+    params = dict(params or {})
+    try:
+        inspect.signature(runner).bind(site, progress=progress, **params)
+    except TypeError as e:
+        raise JobError(f"Bad parameters for {kind}: {e}") from e
+    result = runner(site, progress=progress, **params)
+    logger.info(f"Job {kind} on {site.get('site_name')}: {'ok' if result['ok'] else 'failed'} - {result['summary']}")
+    return result
+
+
+# --- QUEUED JOBS ---
+def run_queued(job, sites=None):
+    """Run one claimed job_queue row and store its outcome. Returns the final state."""
+    cancel = threading.Event()
+    stop = threading.Event()
+    latest = {}
+
+    def beat():
+        while not stop.wait(Config.JOB_HEARTBEAT_SECONDS):
+            if db.heartbeat_job(job['id'], latest.get('progress')):
+                cancel.set()
+
+    def progress(data):
+        latest['progress'] = data
+        if cancel.is_set():
+            raise JobCancelled()
+
+    heartbeat = threading.Thread(target=beat, name=f"job-{job['id']}-heartbeat", daemon=True)
+    heartbeat.start()
+    outcome = {}
+    try:
+        site = find_site(job['site_id'], sites)
+        result = run_job(job['kind'], site, job.get('params'), progress)
+        state = db.JOB_DONE if result['ok'] else db.JOB_FAILED
+        outcome = dict(logs=result['logs'], result={k: v for k, v in result.items() if k != 'logs'},
+                       error=None if result['ok'] else result['summary'])
+    except JobCancelled:
+        state, outcome = db.JOB_CANCELLED, dict(error="Cancelled by user")
+    except JobError as e:
+        state, outcome = db.JOB_FAILED, dict(error=str(e))
+    except Exception as e:
+        logger.error(f"Job #{job['id']} ({job['kind']}) crashed: {e}", exc_info=True)
+        state, outcome = db.JOB_FAILED, dict(error=f"{type(e).__name__}: {e}")
+    finally:
+        stop.set()
+        heartbeat.join()
+    db.complete_job(job['id'], state, progress=latest.get('progress'), **outcome)
+    logger.info(f"Job #{job['id']} ({job['kind']}) finished: {state}")
+    return state
@@ -1,8 +1,10 @@
 import re
-from typing import List, Dict, Optional, Set
-from src.repositories import woo, db
+import asyncio
+from typing import List, Dict, Iterable, Iterator, Optional, Set
+from src.repositories import woo, woo_async, db
 from src.utils.common import col_idx_to_letter
 from src.utils.logger import logger
+from src.utils.retry import RetryPolicy
 
 # Last Updated: Force Cache Flush
 
@@ -22,17 +24,9 @@ def extract_slug_from_url(url: str) -> Optional[str]:
     match = re.search(r'/([^/]+)\.(jpg|jpeg|png|gif|webp)$', url, re.IGNORECASE)
     return match.group(1) if match else None
 
-def fetch_all_media(domain: str, secret: str, limit: int = 200) -> List[Dict]:
-    """
-    Fetch all media from WordPress and extract IDs + slugs
-    Returns: [{"media_id": "163052", "slug": "image-name", "url": "...", "title": "..."}, ...]
-    """
-    media_list = woo.fetch_media_preview_custom(domain, secret, limit, None)
-    if not media_list:
-        return []
-    
-    result = []
-    for media in media_list:
+def _media_records(source: Iterable[Dict]) -> Iterator[Dict]:
+    """{"media_id", "slug", "url", "title", "permalink"} for each raw get-media-list item that has an ID."""
+    for media in source:
         media_id = str(media.get('id', ''))
         if not media_id or media_id == '0':
             media_id = extract_attachment_id(media.get('permalink', ''))
@@ -40,19 +34,49 @@ def fetch_all_media(domain: str, secret: str, limit: int = 200) -> List[Dict]:
         slug = extract_slug_from_url(media.get('url', ''))
         
         if media_id:
-            result.append({
+            yield {
                 'media_id': media_id,
                 'slug': slug or '',
                 'url': media.get('url', ''),
                 'title': media.get('title', ''),
                 'permalink': media.get('permalink', '')
-            })
-    
-    return result
+            }
+
+def fetch_all_media(domain: str, secret: str, limit: int = 200) -> List[Dict]:
+    """
+    Newest `limit` media from the legacy single LIMIT request, as a list
+    (see iter_all_media for the records). [] if the request fails.
+    """
+    try:
+        return list(_media_records(woo.iter_media_preview(domain, secret, limit, None)))
+    except woo.WooStreamError as e:
+        logger.error(f"fetch_all_media failed: {e}")
+        return []
+
+def iter_all_media(domain: str, secret: str, limit: int = 200) -> Iterator[Dict]:
+    """
+    Newest `limit` media from WordPress with IDs + slugs, yielded while the
+    keyset scan is still paging (nothing is held in memory):
+    {"media_id": "163052", "slug": "image-name", "url": "...", "title": "...", "permalink": "..."}
+    If the server lacks keyset support or a page keeps failing, the rest
+    comes from the legacy single request (fetch_all_media), skipping the
+    records already yielded.
+    """
+    seen: Set[str] = set()
+    try:
+        for record in _media_records(woo.iter_media_keyset(domain, secret, limit)):
+            seen.add(record['media_id'])
+            yield record
+        return
+    except woo.WooStreamError as e:
+        logger.warning(f"Keyset media scan unavailable ({e}), falling back to single request")
+    for record in fetch_all_media(domain, secret, limit):
+        if record['media_id'] not in seen:
+            yield record
 
-def sync_media_to_sheet(sheet_id: str, tab_name: str, media_data: List[Dict]) -> Dict:
+def sync_media_to_sheet(sheet_id: str, tab_name: str, media_data: Iterable[Dict]) -> Dict:
     """
-    Sync media data to Google Sheet
+    Sync media data (a list or the iter_all_media stream) to Google Sheet
     
     Logic:
     - Match by ID or old_slug
@@ -69,9 +93,7 @@ def sync_media_to_sheet(sheet_id: str, tab_name: str, media_data: List[Dict]) ->
         return {"error": "Failed to connect to Google Sheets"}
     
     try:
-        sh = gc.open_by_key(sheet_id)
-        ws = sh.worksheet(tab_name)
-        vals = ws.get_all_values()
+        vals = db.get_sheet_values(sheet_id, tab_name)
         
         if len(vals) < 1:
             return {"error": "Sheet is empty"}
@@ -134,7 +156,9 @@ def sync_media_to_sheet(sheet_id: str, tab_name: str, media_data: List[Dict]) ->
         }
 
         # Process each media item
+        total = 0
         for media in media_data:
+            total += 1
             media_id = media['media_id']
             slug = media['slug']
             
@@ -266,13 +290,14 @@ def sync_media_to_sheet(sheet_id: str, tab_name: str, media_data: List[Dict]) ->
             db.update_sheet_batch(sheet_id, tab_name, batch_updates)
             
         if new_rows_data:
-            ws.append_rows(new_rows_data)
+            db.open_worksheet(sheet_id, tab_name).append_rows(new_rows_data)
+            db.invalidate_sheet(sheet_id, tab_name)
             
         return {
             "success": True,
             "updated": updated_count,
             "created": created_count,
-            "total": len(media_data),
+            "total": total,
             "wp_updates_queued": wp_updates,
             "debug_info": {
                 "columns_found_raw": list(col_map.keys()),
@@ -295,12 +320,14 @@ def execute_wp_updates(domain: str, secret: str, updates: List[Dict], chunk_size
     if not updates:
         return {"updated_count": 0, "logs": []}
 
+    policy = RetryPolicy(job="media-update")
+
     for i in range(0, len(updates), chunk_size):
         chunk = updates[i:i + chunk_size]
         # Clean payload
         clean_chunk = [{'id': x['id'], 'title': x['title'], 'slug': x.get('slug')} for x in chunk]
         
-        res = woo.update_media_batch_custom(domain, secret, clean_chunk)
+        res = woo.update_media_batch_custom(domain, secret, clean_chunk, policy=policy)
         
         if res.get('status') == 'success':
             cnt = res.get('updated_count', 0)
@@ -312,3 +339,41 @@ def execute_wp_updates(domain: str, secret: str, updates: List[Dict], chunk_size
             logs.append(f"Batch {i//chunk_size + 1}: Failed - {res}")
             
     return {"updated_count": total_updated, "logs": logs}
+
+async def execute_wp_updates_async(domain: str, secret: str, updates: List[Dict], chunk_size: int = 50, max_workers: int = 5) -> Dict:
+    """
+    Async version of execute_wp_updates: chunks are sent concurrently
+    (bounded by max_workers) on one event loop.
+    Result format: {"updated_count": 0, "logs": []}
+    """
+    if not updates:
+        return {"updated_count": 0, "logs": []}
+
+    chunks = [updates[i:i + chunk_size] for i in range(0, len(updates), chunk_size)]
+    woo_async.open_site(domain, concurrency=max_workers)
+    sem = asyncio.Semaphore(max_workers)
+    policy = RetryPolicy(job="media-update")
+
+    async def run_chunk(chunk):
+        clean_chunk = [{'id': x['id'], 'title': x['title'], 'slug': x.get('slug')} for x in chunk]
+        async with sem:
+            return await woo_async.update_media_batch_custom(domain, secret, clean_chunk, policy=policy)
+
+    try:
+        results = await asyncio.gather(*[run_chunk(c) for c in chunks])
+    finally:
+        await woo_async.aclose_site(domain)
+
+    total_updated = 0
+    logs = []
+    for n, res in enumerate(results, start=1):
+        if res.get('status') == 'success':
+            cnt = res.get('updated_count', 0)
+            total_updated += cnt
+            if res.get('details'):
+                first = res['details'][0]
+                logs.append(f"Batch {n}: Success ({cnt} items). Sample: {first.get('msg')}")
+        else:
+            logs.append(f"Batch {n}: Failed - {res}")
+
+    return {"updated_count": total_updated, "logs": logs}
@@ -0,0 +1,124 @@
+"""
+Streaming sheet write-back for import jobs.
+
+Batch results are checkpointed in the job journal first; SheetWriteBack
+drains the journal's pending writes to the sheet from a background thread
+every Config.SHEET_FLUSH_ROWS updates or Config.SHEET_FLUSH_SECONDS,
+so the sheet fills in while the import runs. Each flush is split into
+requests under the Sheets size limits; db.update_sheet_batch retries a
+request on quota and server errors, and writes that still fail stay
+pending in the journal for the next flush (or a resume).
+"""
+
+import json
+import threading
+import time
+from config import Config
+from src.repositories import db, journal
+from src.utils.logger import logger
+
+
+def _pages(pending):
+    """Split [(seq, update)] into requests of at most SHEET_MAX_UPDATES_PER_REQUEST / SHEET_MAX_REQUEST_BYTES."""
+    page, size = [], 0
+    for seq, update in pending:
+        n = len(json.dumps(update['values'])) + len(update['range']) + 32
+        if page and (len(page) >= Config.SHEET_MAX_UPDATES_PER_REQUEST or size + n > Config.SHEET_MAX_REQUEST_BYTES):
+            yield page
+            page, size = [], 0
+        page.append((seq, update))
+        size += n
+    if page:
+        yield page
+
+
+def flush_pending(job_id, sheet_id, tab_name):
+    """
+    Write every pending update of a job, one bounded request at a time.
+    Returns (written, still pending). A failed request (already retried in
+    db.update_sheet_batch) ends this flush; its updates stay pending.
+    """
+    pending = journal.pending_writes(job_id)
+    written = 0
+    for page in _pages(pending):
+        if not db.update_sheet_batch(sheet_id, tab_name, [u for _, u in page]):
+            logger.warning(f"Sheet write-back failed for {len(page)} updates (job {job_id[:8]}); kept in journal")
+            break
+        journal.mark_written([seq for seq, _ in page])
+        written += len(page)
+    return written, len(pending) - written
+
+
+class SheetWriteBack:
+    """
+    Background flusher for one job. Call added(n) after each journal
+    checkpoint and close() once Phase 1 is over (it does a final flush).
+    """
+
+    def __init__(self, job_id, sheet_id, tab_name, every_rows=None, every_seconds=None):
+        self.job_id = job_id
+        self.sheet_id = sheet_id
+        self.tab_name = tab_name
+        self.every_rows = every_rows or Config.SHEET_FLUSH_ROWS
+        self.every_seconds = every_seconds or Config.SHEET_FLUSH_SECONDS
+        self.written = 0
+        self.flushes = 0
+        self._unflushed = 0
+        self._closing = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f"writeback-{job_id[:8]}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def added(self, n):
+        """n new updates were checkpointed in the journal."""
+        with self._cond:
+            self._unflushed += n
+            if self._unflushed >= self.every_rows:
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.every_seconds
+                while not self._closing and self._unflushed < self.every_rows:
+                    left = deadline - time.monotonic()
+                    if left <= 0: break
+                    self._cond.wait(left)
+                closing = self._closing
+                has_work = self._unflushed > 0
+                self._unflushed = 0
+            if has_work:
+                self._flush()
+            if closing:
+                return
+
+    def _flush(self):
+        try:
+            written, pending = flush_pending(self.job_id, self.sheet_id, self.tab_name)
+        except Exception as e:  # journal or sheet client errors must not kill the flusher
+            logger.warning(f"Sheet write-back error (job {self.job_id[:8]}): {e}")
+            return
+        self.written += written
+        self.flushes += bool(written)
+        if pending:
+            with self._cond:
+                self._unflushed += pending  # retried on the next round
+
+    def close(self):
+        """Stop the thread after a final flush; later calls only report. Returns (written, still pending)."""
+        with self._cond:
+            first = not self._closed
+            if first:
+                self._closed = self._closing = True
+                self._unflushed += 1  # force the final flush
+                self._cond.notify()
+        if first:
+            if self._thread.is_alive():
+                self._thread.join()
+            else:
+                self._flush()
+        return self.written, journal.get_job(self.job_id)['pending_writes']
@@ -1,10 +1,14 @@
 import streamlit as st
 import pandas as pd
-from src.repositories import db, woo
+from config import Config
+from src.repositories import db, woo, journal
 from src.services import importer, deleter, checker, media_updater
 from src.utils.common import render_lock_screen, remove_lock_screen
+from src.utils.concurrency import current_limits
+from src.utils import metrics
 from src.utils.email_service import email_service
 from src.utils.locales import get_text
+from src.utils.progress import ProgressEvent
 from src.ui import updater_ui
 
 
@@ -77,6 +81,10 @@ def render_dashboard():
         # GLOBAL SETTINGS (MOVED TO SIDEBAR)
         with st.expander(get_text("settings_label", lang), expanded=False):
             auto_threads = st.slider(get_text("threads_label", lang), 1, 30, 20)
+            use_gzip = st.checkbox(get_text("gzip_label", lang), value=Config.GZIP_REQUESTS,
+                                   help=get_text("gzip_help", lang))
+            bg_jobs = st.checkbox(get_text("bg_jobs_label", lang), value=Config.BACKGROUND_JOBS,
+                                  help=get_text("bg_jobs_help", lang))
 
     st.title("POD Automation Environment")
     
@@ -108,6 +116,9 @@ def render_dashboard():
 
 
     selected_site = site_map[selected_option]
+    woo.set_compression(selected_site['domain_url'], use_gzip)
+    with st.sidebar:
+        render_diagnostics(selected_site, lang)
 
     # Placeholder for Sync Status (Instant Load)
     sync_status_placeholder = st.empty()
@@ -119,6 +130,9 @@ def render_dashboard():
         updater_ui.render_updater_ui(selected_site)
         return
 
+    if bg_jobs:
+        render_job_panel(selected_site, lang)
+
     # FETCH TABS ONCE
     sheet_tabs = db.get_worksheet_titles(selected_site['google_sheet_id'])
     if not sheet_tabs:
@@ -175,18 +189,47 @@ def render_dashboard():
             render_data_preview(selected_site, default_tab_data, filter_ids)
         
         st.write("")
-        if st.button(get_text("run_import_btn", lang), type="primary"):
+        force_all = st.checkbox(get_text("force_all_chk", lang), value=False, help=get_text("force_all_help", lang))
+        resume_job = None
+        unfinished = journal.find_resumable('import', selected_site['domain_url'], selected_site.get('google_sheet_id'),
+                                            default_tab_data)
+        if unfinished:
+            st.warning(get_text("resume_found", lang).format(done=unfinished['rows_done'], total=unfinished['total'],
+                                                             writes=unfinished['pending_writes']))
+            if st.checkbox(get_text("resume_chk", lang), value=True, key="resume_import"):
+                resume_job = unfinished['id']
+        target_names = st.multiselect(get_text("fanout_sites_label", lang), list(site_map.keys()),
+                                      default=[selected_option], help=get_text("fanout_sites_help", lang))
+        targets = [site_map[n] for n in target_names]
+        fan_out = len(targets) > 1 or bool(targets and targets[0] is not selected_site)
+        run_clicked = st.button(get_text("run_import_btn", lang), type="primary", disabled=not targets)
+        if run_clicked and bg_jobs and fan_out:
+            queue_job(selected_site, 'import-multi', dict(tab=default_tab_data, site_ids=[t['id'] for t in targets],
+                                                          threads=auto_threads, filter_ids=filter_ids,
+                                                          force_all=force_all, resume=bool(resume_job)), lang)
+        elif run_clicked and bg_jobs:
+            queue_job(selected_site, 'import', dict(tab=default_tab_data, threads=auto_threads, filter_ids=filter_ids,
+                                                    force_all=force_all, resume=bool(resume_job)), lang)
+        elif run_clicked and fan_out:
+            lock = st.empty()
+            with lock: render_lock_screen()
+            try:
+                run_import_multi(selected_site, targets, default_tab_data, auto_threads, filter_ids, force_all,
+                                 bool(resume_job))
+            finally:
+                with lock: remove_lock_screen()
+        elif run_clicked:
             # [LOCK UI] Khoa man hinh
             lock = st.empty()
             with lock: render_lock_screen()
             try:
-                run_import_v12(selected_site, default_tab_data, auto_threads, filter_ids)
+                run_import_v12(selected_site, default_tab_data, auto_threads, filter_ids, force_all, resume_job)
             finally:
                 with lock: remove_lock_screen()
 
     # === TAB 2: DELETE TOOL ===
     with tab2:
-        render_delete_tool(sites, list(site_map.keys()), selected_option, default_tab_data, auto_threads, lang)
+        render_delete_tool(sites, list(site_map.keys()), selected_option, default_tab_data, auto_threads, lang, bg_jobs)
 
 
     # === TAB 3: IMAGES ===
@@ -214,16 +257,16 @@ def render_dashboard():
             render_data_preview(selected_site, sheet_tab_name)
         
         st.write("")
-        if st.button(get_text("run_sync_btn", lang), type="primary"):
+        sync_clicked = st.button(get_text("run_sync_btn", lang), type="primary")
+        if sync_clicked and bg_jobs:
+            queue_job(selected_site, 'media-sync', dict(tab=sheet_tab_name, limit=limit_media), lang)
+        elif sync_clicked:
             lock = st.empty()
             with lock: render_lock_screen()
             try:
                 with st.status("Syncing Media...", expanded=True) as status:
-                    st.write("1. Fetching media from WordPress...")
-                    media_data = media_updater.fetch_all_media(selected_site['domain_url'], selected_site['secret_key'], limit_media)
-                    st.write(f"Found {len(media_data)} media items.")
-                    
-                    st.write("2. Syncing to Google Sheet...")
+                    st.write("1. Fetching media from WordPress and syncing to Google Sheet...")
+                    media_data = media_updater.iter_all_media(selected_site['domain_url'], selected_site['secret_key'], limit_media)
                     result = media_updater.sync_media_to_sheet(selected_site['google_sheet_id'], sheet_tab_name, media_data)
                     
                     if "error" in result:
@@ -275,6 +318,9 @@ def render_dashboard():
 
     # 4. RUN AUTO SYNC (CHAY NGAM)
     if selected_option != st.session_state['previous_site']:
+        # Release pooled HTTP connections of the site we are leaving
+        prev_site = site_map.get(st.session_state['previous_site'])
+        if prev_site: woo.release_session(prev_site['domain_url'])
         st.session_state['previous_site'] = selected_option
         
         # Clear Cache
@@ -306,24 +352,16 @@ def render_data_preview(site, tab_name, filter_ids=None):
     sheet_id = site.get('google_sheet_id')
     with st.spinner("Fetching data..."):
         try:
-            sh = gc.open_by_key(sheet_id)
-            ws = sh.worksheet(tab_name)
-            vals = ws.get_all_values()
-            if len(vals) < 2: return
-            header = [str(x).strip() for x in vals[0]]
-            data = vals[1:]
-            df = pd.DataFrame(data, columns=header)
-            if filter_ids:
-                id_keys = [col for col in df.columns if col.lower() in ['id', 'product id', 'sku']]
-                if id_keys:
-                    id_key = id_keys[0]
-                    mask = df[id_key].astype(str).str.strip().apply(lambda x: any(x.startswith(fid) for fid in filter_ids))
-                    df = df[mask]
+            # The rows (and the filter's cached PrefixIndex) the import itself would use
+            rows = importer.load_sheet_rows(sheet_id, tab_name)
+            if not rows: return
+            columns = [k for k in rows[0] if k != '_real_row']
+            df = pd.DataFrame(importer.filter_rows(rows, filter_ids), columns=columns)
             st.info(f"Total rows: {len(df)}")
             st.dataframe(df, use_container_width=True, hide_index=True, height=400)
         except Exception as e: st.error(f"Error: {e}")
 
-def run_import_v12(site, tab_name, threads, filter_ids=None):
+def run_import_v12(site, tab_name, threads, filter_ids=None, force_all=False, resume_job=None):
     gc = db.init_google_sheets()
     if not gc: return
     sheet_id = site.get('google_sheet_id')
@@ -333,41 +371,135 @@ def run_import_v12(site, tab_name, threads, filter_ids=None):
         st.warning("IMPORTING DATA... PLEASE DO NOT CLOSE THIS TAB")
         
         try:
-            sh = gc.open_by_key(sheet_id)
-            ws = sh.worksheet(tab_name)
-            vals = ws.get_all_values()
-            if len(vals) < 2: 
+            rows = importer.load_sheet_rows(sheet_id, tab_name)
+            if not rows:
                 status.update(label="Sheet is empty!", state="error")
                 return
-            header = [str(x).strip() for x in vals[0]]
-            data = vals[1:]
-            df = pd.DataFrame(data, columns=header)
-            rows = df.to_dict('records')
-            for i, row in enumerate(rows): row['_real_row'] = i + 2
             
             if filter_ids:
                 status.write("Applying Filters...")
-                id_keys = [k for k in rows[0].keys() if k.lower() in ['id', 'product id', 'sku']]
-                if id_keys:
-                    id_key = id_keys[0]
-                    filtered_rows = [r for r in rows if any(str(r.get(id_key, '')).strip().startswith(fid) for fid in filter_ids)]
-                    rows = filtered_rows
-                
+                rows = importer.filter_rows(rows, filter_ids)
                 if not rows:
                     status.update(label="No items match your filter!", state="error")
                     return
 
-            pb = st.progress(0)
+            pb_import = st.progress(0)
+            pb_media = st.progress(0)
             status.update(label=f"Uploading {len(rows)} items...", state="running")
             
-            logs = importer.process_import(rows, site['domain_url'], site['secret_key'], 'data', sheet_id, tab_name, threads, lambda p,c,t: pb.progress(p))
+            def on_progress(ev):
+                # ev: src.utils.progress.ProgressEvent (one per batch / drain tick)
+                workers = current_limits(site['domain_url']).get(ev.phase)
+                text = ev.label() + (f" | {workers} workers" if workers else "")
+                (pb_import if ev.phase == 'import' else pb_media).progress(ev.phase_fraction, text=text)
+                status.update(label=f"Import {ev.fraction:.0%} done", state="running")
+
+            logs = importer.process_import(rows, site['domain_url'], site['secret_key'], 'data', sheet_id, tab_name, threads, on_progress,
+                                           force_all=force_all, resume_job=resume_job)
             
             st.write(logs)
             status.update(label="Completed!", state="complete")
             st.success(f"Processed {len(rows)} items.")
         except Exception as e: st.error(str(e))
 
-def render_delete_tool(sites, site_names, selected_name, default_tab_data, auto_threads, lang):
+def run_import_multi(site, targets, tab_name, threads, filter_ids=None, force_all=False, resume=False):
+    """Fan-out import of one sheet snapshot into several sites (importer.process_import_multi)."""
+    sheet_id = site.get('google_sheet_id')
+    with st.status(f"Importing into {len(targets)} sites...", expanded=True) as status:
+        st.warning("IMPORTING DATA... PLEASE DO NOT CLOSE THIS TAB")
+        try:
+            rows = importer.filter_rows(importer.load_sheet_rows(sheet_id, tab_name), filter_ids)
+            if not rows:
+                status.update(label="No rows to import!", state="error")
+                return
+            bars = {t['site_name']: (st.progress(0, text=f"{t['site_name']}: products"),
+                                     st.progress(0, text=f"{t['site_name']}: images")) for t in targets}
+            done = {}
+
+            def on_progress(name, ev):
+                pb_import, pb_media = bars[name]
+                (pb_import if ev.phase == 'import' else pb_media).progress(ev.phase_fraction, text=f"{name}: {ev.label()}")
+                done[name] = ev.fraction
+                status.update(label=f"Import {min(done.values()):.0%} done (slowest site)", state="running")
+
+            results = importer.process_import_multi(rows, targets, sheet_id, tab_name, threads, on_progress,
+                                                    force_all=force_all, resume=resume)
+            for name, logs in results.items():
+                with st.expander(name):
+                    st.write(logs)
+            status.update(label="Completed!", state="complete")
+            st.success(f"Processed {len(rows)} items into {len(targets)} sites.")
+        except Exception as e: st.error(str(e))
+
+def queue_job(site, kind, params, lang):
+    """Submit a job to the Supabase job_queue for scripts/job_worker.py."""
+    job_id = db.submit_job(kind, site['id'], params, st.session_state.get('username'))
+    if job_id is None:
+        st.error(get_text("job_queue_failed", lang))
+    else:
+        st.success(get_text("job_queued", lang).format(job_id))
+
+def _job_progress_text(job):
+    p = job.get('progress') or {}
+    if job['state'] == db.JOB_QUEUED:
+        return "", 0.0
+    if p.get('phase') in ('import', 'media') and 'rate' in p:
+        return ProgressEvent(**p).label(), p.get('fraction') or 0.0
+    if p.get('total'):
+        return f"{p.get('phase', job['kind'])} {p.get('done') or 0}/{p['total']}", p.get('fraction') or 0.0
+    return p.get('phase', ""), p.get('fraction') or 0.0
+
+@st.fragment(run_every=Config.JOB_UI_REFRESH_SECONDS)
+def render_job_panel(site, lang):
+    """Jobs of this site from job_queue, polled while the page is open (survives reloads)."""
+    jobs = db.list_jobs(site['id'], limit=10)
+    active = [j for j in jobs if j['state'] in db.JOB_ACTIVE_STATES]
+    with st.expander(f"{get_text('jobs_header', lang)} ({len(active)})", expanded=bool(active)):
+        if not jobs:
+            st.caption(get_text("jobs_empty", lang))
+        for job in jobs:
+            c_info, c_action = st.columns([5, 1])
+            with c_info:
+                st.markdown(f"**#{job['id']} {job['kind']}** · {job['state']} · {job.get('created_by') or ''}")
+                text, fraction = _job_progress_text(job)
+                if job['state'] == db.JOB_QUEUED:
+                    st.caption(get_text("job_waiting", lang))
+                elif job['state'] == db.JOB_RUNNING:
+                    st.progress(min(1.0, float(fraction)), text=text)
+                else:
+                    summary = (job.get('result') or {}).get('summary') or job.get('error') or text
+                    st.caption(summary)
+                    if job.get('logs'):
+                        with st.popover("Logs"):
+                            st.write(job['logs'])
+            with c_action:
+                if job['state'] in db.JOB_ACTIVE_STATES and not job.get('cancel_requested'):
+                    if st.button(get_text("job_cancel_btn", lang), key=f"cancel_job_{job['id']}"):
+                        db.cancel_job(job['id'])
+                        st.rerun(scope="fragment")
+
+def render_diagnostics(site, lang):
+    """Per-endpoint latency / status / retry / byte counters of this process (src/utils/metrics.py)."""
+    with st.expander(get_text("diag_title", lang), expanded=False):
+        rows = metrics.summary(site['domain_url'])
+        if not rows:
+            st.caption(get_text("diag_empty", lang))
+            return
+        df = pd.DataFrame(rows).drop(columns=["site"])
+        st.dataframe(df, use_container_width=True, hide_index=True)
+        limits = current_limits(site['domain_url'])
+        if limits:
+            st.caption(", ".join(f"{pool}: {n}" for pool, n in sorted(limits.items())))
+        c1, c2 = st.columns(2)
+        with c1:
+            st.download_button(get_text("diag_download", lang), metrics.render_prometheus(),
+                               file_name="woo_metrics.prom", mime="text/plain")
+        with c2:
+            if st.button(get_text("diag_reset", lang)):
+                metrics.reset(site['domain_url'])
+                st.rerun()
+
+def render_delete_tool(sites, site_names, selected_name, default_tab_data, auto_threads, lang, bg_jobs=False):
     del_site = next((s for s in sites if s['site_name'] == selected_name), None)
     if not del_site: return
     
@@ -393,7 +525,11 @@ def render_delete_tool(sites, site_names, selected_name, default_tab_data, auto_
             if 'prod_preview' in st.session_state and not st.session_state['prod_preview'].empty:
                 edited = st.data_editor(st.session_state['prod_preview'], key="pe", use_container_width=True)
                 sel = edited[edited["Select"]==True]
-                if st.button(get_text("delete_sel_btn", lang).format(len(sel))):
+                delete_clicked = st.button(get_text("delete_sel_btn", lang).format(len(sel)))
+                if delete_clicked and bg_jobs:
+                    queue_job(del_site, 'delete', dict(ids=sel['ID'].astype(str).tolist(), tab=default_tab_data,
+                                                       threads=auto_threads), lang)
+                elif delete_clicked:
                     # [LOCK UI]
                     lock = st.empty()
                     with lock: render_lock_screen()
@@ -409,7 +545,10 @@ def render_delete_tool(sites, site_names, selected_name, default_tab_data, auto_
                         with lock: remove_lock_screen()
         else:
              st.warning(get_text("danger_warn", lang))
-             if st.button(get_text("confirm_wipe_btn", lang), type="primary"):
+             wipe_clicked = st.button(get_text("confirm_wipe_btn", lang), type="primary")
+             if wipe_clicked and bg_jobs:
+                 queue_job(del_site, 'delete', dict(wipe=True, tab=default_tab_data, threads=auto_threads), lang)
+             elif wipe_clicked:
                  # [LOCK UI]
                  lock = st.empty()
                  with lock: render_lock_screen()
@@ -445,7 +584,10 @@ def render_delete_tool(sites, site_names, selected_name, default_tab_data, auto_
                     finally:
                         with lock: remove_lock_screen()
         else:
-            if st.button("CONFIRM WIPE ALL MEDIA", type="primary"):
+            wipe_media_clicked = st.button("CONFIRM WIPE ALL MEDIA", type="primary")
+            if wipe_media_clicked and bg_jobs:
+                queue_job(del_site, 'delete-media', dict(threads=auto_threads), lang)
+            elif wipe_media_clicked:
                 lock = st.empty()
                 with lock: render_lock_screen()
                 try:
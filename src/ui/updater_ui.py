@@ -129,10 +129,7 @@ def render_updater_ui(selected_site):
             if st.button("Fetch/Refresh Sheet Headers", use_container_width=True):
                 try:
                     with st.spinner("Fetching headers from Google Sheet..."):
-                        gc = db.init_google_sheets()
-                        sh = gc.open_by_key(selected_site['google_sheet_id'])
-                        ws = sh.worksheet(tab_name)
-                        headers = ws.row_values(1)
+                        headers = db.open_worksheet(selected_site['google_sheet_id'], tab_name).row_values(1)
                         if headers:
                             st.session_state['sheet_headers_cache'][cache_key] = headers
                             st.success(f"Found {len(headers)} columns.")
@@ -228,10 +225,7 @@ def render_updater_ui(selected_site):
         with st.spinner("Fetching Sheet Data & Comparing..."):
             try:
                 # Fetch Sheet Data
-                gc = db.init_google_sheets()
-                sh = gc.open_by_key(selected_site['google_sheet_id'])
-                ws = sh.worksheet(tab_name)
-                vals = ws.get_all_values()
+                vals = db.get_sheet_values(selected_site['google_sheet_id'], tab_name)
                 
                 if len(vals) < 2:
                     st.error("Sheet is empty!")
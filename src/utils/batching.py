@@ -0,0 +1,130 @@
+"""
+Adaptive batch sizing for product import.
+
+Batches are cut by payload bytes (Config.BATCH_TARGET_BYTES) and by a
+product count derived from the observed server seconds per product, so a
+batch aims to finish in Config.BATCH_TARGET_SECONDS whatever the row
+weight. A failed batch is split in half and re-queued instead of being
+retried whole. ClaimSizer does the same for the number of products a
+Phase 2 drainer claims per process-pending-media call.
+"""
+
+import json
+import threading
+from collections import deque
+from typing import Any, List, NamedTuple, Optional
+from config import Config
+
+
+class BatchItem(NamedTuple):
+    key: str          # SKU sent to the server
+    payload: dict     # one product in the import-product-batch body
+    size: int         # serialized bytes
+    row: Any = None   # sheet row number for write-back
+
+
+def make_item(key: str, payload: dict, row: Any = None) -> BatchItem:
+    return BatchItem(key, payload, len(json.dumps(payload, ensure_ascii=False).encode('utf-8')), row)
+
+
+class AdaptiveBatcher:
+    """
+    Single-consumer queue of BatchItems (used from the job's main thread).
+
+    size   -- current max products per batch (latency-driven)
+    record -- feed back each batch outcome; decisions are kept in .decisions
+    """
+
+    def __init__(self, items: List[BatchItem],
+                 initial: Optional[int] = None,
+                 target_bytes: Optional[int] = None,
+                 target_seconds: Optional[float] = None,
+                 min_size: Optional[int] = None,
+                 max_size: Optional[int] = None,
+                 smoothing: float = 0.3):
+        self._queue = deque(items)
+        self.min_size = min_size or Config.BATCH_MIN_SIZE
+        self.max_size = max_size or Config.BATCH_MAX_SIZE
+        self.size = max(self.min_size, min(initial or Config.CHUNK_SIZE, self.max_size))
+        self.target_bytes = target_bytes or Config.BATCH_TARGET_BYTES
+        self.target_seconds = target_seconds or Config.BATCH_TARGET_SECONDS
+        self.smoothing = smoothing
+        self.sec_per_item: Optional[float] = None  # EWMA of server seconds per product
+        self.decisions: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def next_batch(self) -> List[BatchItem]:
+        """Up to `size` items, stopping before the payload passes target_bytes (always at least one)."""
+        batch: List[BatchItem] = []
+        total = 0
+        while self._queue and len(batch) < self.size:
+            item = self._queue[0]
+            if batch and total + item.size > self.target_bytes:
+                break
+            batch.append(self._queue.popleft())
+            total += item.size
+        return batch
+
+    def requeue(self, items: List[BatchItem]) -> None:
+        """Put items back at the front, keeping their order."""
+        self._queue.extendleft(reversed(items))
+
+    def split(self, items: List[BatchItem]) -> bool:
+        """Re-queue a failed batch as two halves. False if it cannot be split further."""
+        if len(items) < 2:
+            return False
+        mid = len(items) // 2
+        self.requeue(items[:mid])
+        self.requeue(items[mid:])  # second half first; order does not matter to the server
+        return True
+
+    def record(self, count: int, seconds: float, ok: bool, payload_bytes: int = 0) -> None:
+        """Adjust `size` from one finished batch of `count` products."""
+        old = self.size
+        if not ok:
+            self.size = max(self.min_size, min(self.size, count) // 2)
+            reason = f"failed after {seconds:.1f}s"
+        else:
+            per_item = seconds / max(1, count)
+            self.sec_per_item = per_item if self.sec_per_item is None else \
+                self.smoothing * per_item + (1 - self.smoothing) * self.sec_per_item
+            wanted = int(self.target_seconds / max(self.sec_per_item, 1e-3))
+            # Grow at most 2x per step; shrink straight to the target; ignore <10% jitter
+            wanted = max(self.min_size, min(self.max_size, wanted, self.size * 2))
+            if abs(wanted - self.size) >= max(2, self.size * 0.1):
+                self.size = wanted
+            reason = f"{self.sec_per_item:.2f}s/product"
+        if self.size != old:
+            kb = f", {payload_bytes // 1024} KB" if payload_bytes else ""
+            self.decisions.append(f"Batch size {old} -> {self.size} ({reason}{kb})")
+
+
+class ClaimSizer:
+    """
+    Products per process-pending-media call, shared by a job's drainers
+    (thread-safe). Aims for Config.MEDIA_CLAIM_TARGET_SECONDS per call from
+    the observed seconds per product; starts at one.
+    """
+
+    def __init__(self, target_seconds: Optional[float] = None, max_size: Optional[int] = None, smoothing: float = 0.3):
+        self.target_seconds = target_seconds or Config.MEDIA_CLAIM_TARGET_SECONDS
+        self.max_size = max_size or Config.MEDIA_CLAIM_MAX
+        self.smoothing = smoothing
+        self.size = 1
+        self.sec_per_item: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, count: int, seconds: float, ok: bool = True) -> None:
+        with self._lock:
+            if not ok:
+                self.size = max(1, self.size // 2)
+                return
+            if count <= 0:
+                return
+            per_item = seconds / count
+            self.sec_per_item = per_item if self.sec_per_item is None else \
+                self.smoothing * per_item + (1 - self.smoothing) * self.sec_per_item
+            wanted = int(self.target_seconds / max(self.sec_per_item, 1e-3))
+            self.size = max(1, min(self.max_size, wanted, self.size * 2))
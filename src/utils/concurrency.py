@@ -0,0 +1,201 @@
+"""
+AIMD adaptive concurrency for worker pools (and a token bucket for
+request-rate quotas).
+
+Pools are started at their ceiling (the slider value / max_workers), but
+each request must hold a slot from the site's controller. The controller
+grows the number of slots by one while p95 latency and error rate stay
+healthy, and halves it on overload signals (429/5xx/timeouts).
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Optional, Tuple
+from config import Config
+from src.utils.logger import logger
+
+
+class AIMDController:
+    """Additive-increase / multiplicative-decrease limit for one (site, pool)."""
+
+    def __init__(self, name: str, initial: int, max_limit: int, min_limit: int = 1,
+                 window: Optional[int] = None, latency_tolerance: Optional[float] = None,
+                 max_error_rate: Optional[float] = None):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self._limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.window = window or Config.AIMD_WINDOW
+        self.latency_tolerance = latency_tolerance or Config.AIMD_LATENCY_TOLERANCE
+        self.max_error_rate = max_error_rate if max_error_rate is not None else Config.AIMD_MAX_ERROR_RATE
+        self.baseline: Optional[float] = None  # learned "healthy" median latency (seconds)
+        self.in_flight = 0
+        self._samples: Deque[Tuple[float, bool]] = deque(maxlen=self.window)
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def set_ceiling(self, max_limit: int) -> None:
+        with self._cond:
+            self.max_limit = max(self.min_limit, max_limit)
+            self._limit = min(self._limit, self.max_limit)
+            self._cond.notify_all()
+
+    # --- Slots ---
+    def acquire(self) -> None:
+        with self._cond:
+            while self.in_flight >= int(self._limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        """Hold one slot; the caller reports the outcome with slot.report(ok)."""
+        self.acquire()
+        s = _Slot(self)
+        try:
+            yield s
+        finally:
+            self.release()
+            s.finish()
+
+    # --- Feedback ---
+    def record(self, latency: float, ok: bool) -> None:
+        with self._cond:
+            if not ok:
+                self._on_overload(latency)
+                return
+            self._samples.append((latency, True))
+            if len(self._samples) >= self.window:
+                self._evaluate()
+
+    def _on_overload(self, latency: float) -> None:
+        now = time.monotonic()
+        self._samples.append((latency, False))
+        # At most one decrease per latency period, so one burst of failures
+        # from in-flight requests does not collapse the limit to 1.
+        guard = max(1.0, self.baseline or 0.0)
+        if now - self._last_decrease < guard:
+            return
+        old = self.limit
+        self._limit = max(float(self.min_limit), self._limit * Config.AIMD_DECREASE_FACTOR)
+        self._last_decrease = now
+        self._samples.clear()
+        if self.limit != old:
+            logger.warning(f"AIMD {self.name}: overload, concurrency {old} -> {self.limit}")
+
+    def _evaluate(self) -> None:
+        lat = sorted(s[0] for s in self._samples)
+        errors = sum(1 for s in self._samples if not s[1])
+        p50 = lat[len(lat) // 2]
+        p95 = lat[min(len(lat) - 1, int(len(lat) * 0.95))]
+        # Baseline tracks the best median seen, drifting up slowly if the site gets slower overall
+        self.baseline = p50 if self.baseline is None else min(p50, self.baseline * 1.05)
+        healthy = p95 <= self.baseline * self.latency_tolerance and errors / len(lat) <= self.max_error_rate
+        if healthy and self._limit < self.max_limit:
+            self._limit = min(float(self.max_limit), self._limit + 1)
+            self._cond.notify_all()
+        self._samples.clear()
+
+    def snapshot(self) -> Dict:
+        with self._cond:
+            return {"limit": self.limit, "in_flight": self.in_flight,
+                    "max": self.max_limit, "baseline_s": round(self.baseline or 0.0, 3)}
+
+
+class _Slot:
+    def __init__(self, controller: AIMDController):
+        self.controller = controller
+        self.started = time.monotonic()
+        self.ok: Optional[bool] = None
+
+    def report(self, ok: bool) -> None:
+        self.ok = ok
+
+    def finish(self) -> None:
+        if self.ok is not None:
+            self.controller.record(time.monotonic() - self.started, self.ok)
+
+
+class TokenBucket:
+    """
+    Request-rate limiter shared by threads: `rate` requests per second with
+    up to `capacity` banked for bursts. acquire() reserves the next token and
+    sleeps until it is due (callers are served in arrival order); hold()
+    stops every caller for a while, e.g. after the server answered 429.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def acquire(self) -> float:
+        """Take one token, waiting as long as needed. Returns the seconds waited."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = max(-self._tokens / self.rate, 0.0)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def hold(self, seconds: float) -> None:
+        """No new token is handed out for at least `seconds` (a debt of seconds * rate tokens)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+def run_in_slot(controller: Optional[AIMDController], fn, *args, is_ok=lambda r: r is not None, **kwargs):
+    """Call fn inside one controller slot and feed its outcome back (no-op gate if controller is None)."""
+    if controller is None:
+        return fn(*args, **kwargs)
+    with controller.slot() as slot:
+        res = fn(*args, **kwargs)
+        slot.report(is_ok(res))
+        return res
+
+
+_controllers: Dict[tuple, AIMDController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_controller(domain: str, pool: str, initial: int, max_limit: int) -> AIMDController:
+    """
+    Per-site, per-pool controller. The learned limit survives across jobs
+    in this process; the ceiling follows the latest caller.
+    """
+    key = (domain.rstrip('/').lower(), pool)
+    with _controllers_lock:
+        ctrl = _controllers.get(key)
+        if ctrl is None:
+            ctrl = AIMDController(f"{key[0]}:{pool}", initial, max_limit)
+            _controllers[key] = ctrl
+            return ctrl
+    ctrl.set_ceiling(max_limit)
+    return ctrl
+
+
+def current_limits(domain: str) -> Dict[str, int]:
+    """{pool: current limit} for a site, for progress displays."""
+    site = domain.rstrip('/').lower()
+    with _controllers_lock:
+        return {pool: c.limit for (d, pool), c in _controllers.items() if d == site}
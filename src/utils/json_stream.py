@@ -0,0 +1,83 @@
+"""
+Incremental JSON array decoding.
+
+Yields the elements of a (possibly huge) JSON array as the response body
+arrives, so list endpoints never hold the raw body and the fully parsed
+list in memory at the same time.
+"""
+
+import codecs
+import json
+import re
+from typing import Any, Iterable, Iterator, Optional, Union
+
+_WS = ' \t\r\n'
+_decoder = json.JSONDecoder()
+
+
+class JSONStreamError(ValueError):
+    """Body ended or was malformed before the array was complete."""
+
+
+def iter_json_array(chunks: Iterable[Union[bytes, str]], key: Optional[str] = None,
+                    compact_every: int = 1 << 20) -> Iterator[Any]:
+    """
+    Yield items of a JSON array from an iterable of body chunks.
+
+    key=None streams a top-level array (`[...]`); key='skus' streams the
+    array stored under that key of a top-level object (`{"skus": [...]}`).
+    """
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    start_re = re.compile(r'\[') if key is None else re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    buf = ''
+    pos = 0
+    in_array = False
+    eof = False
+    chunks = iter(chunks)
+
+    def more() -> bool:
+        nonlocal buf, eof
+        for chunk in chunks:
+            text = utf8.decode(chunk) if isinstance(chunk, bytes) else chunk
+            if text:
+                buf += text
+                return True
+        buf += utf8.decode(b'', final=True)
+        eof = True
+        return False
+
+    while True:
+        if not in_array:
+            m = start_re.search(buf)
+            if m:
+                pos = m.end()
+                in_array = True
+                continue
+            if not more():
+                raise JSONStreamError(f"array {key or '<root>'} not found in body")
+            continue
+
+        # Skip separators between items
+        while pos < len(buf) and (buf[pos] in _WS or buf[pos] == ','):
+            pos += 1
+        if pos >= len(buf):
+            if not more():
+                raise JSONStreamError("body ended inside array")
+            continue
+        if buf[pos] == ']':
+            return
+
+        try:
+            item, end = _decoder.raw_decode(buf, pos)
+        except ValueError:
+            if not more():
+                raise JSONStreamError(f"malformed JSON at offset {pos}")
+            continue
+        # A scalar touching the end of the buffer may be truncated (e.g. 12|345)
+        if end == len(buf) and not eof and more():
+            continue
+        yield item
+        pos = end
+        if pos > compact_every:
+            buf = buf[pos:]
+            pos = 0
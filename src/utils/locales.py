@@ -41,6 +41,62 @@ TRANS = {
         "en": "Worker Threads:",
         "vi": "Luồng xử lý (Threads):"
     },
+    "gzip_label": {
+        "en": "Compress requests (gzip)",
+        "vi": "Nén dữ liệu gửi (gzip)"
+    },
+    "diag_title": {
+        "en": "Diagnostics (API latency)",
+        "vi": "Chẩn đoán (độ trễ API)"
+    },
+    "diag_empty": {
+        "en": "No requests recorded yet for this site.",
+        "vi": "Chưa có request nào được ghi nhận cho website này."
+    },
+    "diag_download": {
+        "en": "Download metrics",
+        "vi": "Tải metrics"
+    },
+    "diag_reset": {
+        "en": "Reset",
+        "vi": "Đặt lại"
+    },
+    "gzip_help": {
+        "en": "Requires plugin V12.6+ on the site.",
+        "vi": "Yêu cầu plugin V12.6+ trên website."
+    },
+    "bg_jobs_label": {
+        "en": "Run jobs in background",
+        "vi": "Chạy tác vụ ở chế độ nền"
+    },
+    "bg_jobs_help": {
+        "en": "Jobs are queued and run by scripts/job_worker.py; you can reload or close the page.",
+        "vi": "Tác vụ được đưa vào hàng đợi và chạy bởi scripts/job_worker.py; có thể tải lại hoặc đóng trang."
+    },
+    "jobs_header": {
+        "en": "Background Jobs",
+        "vi": "Tác vụ Nền"
+    },
+    "jobs_empty": {
+        "en": "No jobs for this site yet.",
+        "vi": "Chưa có tác vụ nào cho website này."
+    },
+    "job_queued": {
+        "en": "Job #{} queued. Follow it under Background Jobs.",
+        "vi": "Đã đưa tác vụ #{} vào hàng đợi. Theo dõi ở mục Tác vụ Nền."
+    },
+    "job_queue_failed": {
+        "en": "Could not queue the job (is migrations/002_add_job_queue.sql applied?).",
+        "vi": "Không thể tạo tác vụ (đã chạy migrations/002_add_job_queue.sql chưa?)."
+    },
+    "job_waiting": {
+        "en": "Waiting for a worker (python scripts/job_worker.py)...",
+        "vi": "Đang chờ worker (python scripts/job_worker.py)..."
+    },
+    "job_cancel_btn": {
+        "en": "Cancel",
+        "vi": "Hủy"
+    },
     
     # --- SITE SELECTION ---
     "site_select_header": {
@@ -139,6 +195,30 @@ TRANS = {
         "en": "Refresh Data",
         "vi": "Làm mới Dữ liệu"
     },
+    "force_all_chk": {
+        "en": "Force re-import of unchanged rows",
+        "vi": "Import lại cả các dòng không thay đổi"
+    },
+    "force_all_help": {
+        "en": "By default rows identical to their last successful import are skipped.",
+        "vi": "Mặc định bỏ qua các dòng giống hệt lần import thành công trước."
+    },
+    "resume_found": {
+        "en": "Unfinished import on this tab: {done}/{total} rows done, {writes} sheet updates not written yet.",
+        "vi": "Có lần import chưa xong trên tab này: {done}/{total} dòng đã xong, {writes} cập nhật Sheet chưa ghi."
+    },
+    "resume_chk": {
+        "en": "Resume it (skip rows already imported)",
+        "vi": "Tiếp tục (bỏ qua các dòng đã import)"
+    },
+    "fanout_sites_label": {
+        "en": "Import to sites",
+        "vi": "Import vào các website"
+    },
+    "fanout_sites_help": {
+        "en": "Several sites: the sheet is read once and imported into all of them at the same time; each site writes its status to its own 'Status <site>' column.",
+        "vi": "Nhiều website: Sheet chỉ đọc một lần và import vào tất cả cùng lúc; mỗi website ghi trạng thái vào cột 'Status <site>' riêng."
+    },
     "run_import_btn": {
         "en": "RUN IMPORT PROCESS",
         "vi": "CHẠY QUY TRÌNH IMPORT"
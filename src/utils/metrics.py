@@ -0,0 +1,223 @@
+"""
+Per-endpoint request metrics for the WooCommerce clients.
+
+Every attempt made by woo.py / woo_async.py is recorded per (site,
+endpoint, job): a latency histogram, status-code counts, retries and
+request/response bytes on the wire. Exported as Prometheus text (file
+refreshed at most every METRICS_FLUSH_INTERVAL seconds) and summarized for
+the in-app diagnostics panel.
+"""
+
+import copy
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from config import Config
+from src.utils.logger import logger
+
+
+class EndpointStats:
+    """Counters for one (site, endpoint, job)."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)  # last = +Inf
+        self.count = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.statuses: Dict[str, int] = {}
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def observe(self, latency: float, status: str, sent: int, received: int) -> None:
+        self.count += 1
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        for i, bound in enumerate(self.buckets):
+            if latency <= bound:
+                self.bucket_counts[i] += 1
+                break
+        else:
+            self.bucket_counts[-1] += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.bytes_sent += sent
+        self.bytes_received += received
+
+    def quantile(self, q: float) -> float:
+        """Estimate from the histogram (linear inside the bucket, like histogram_quantile)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, n in enumerate(self.bucket_counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.latency_max
+            if n and seen + n >= rank:
+                return min(self.latency_max, lower + (upper - lower) * (rank - seen) / n)
+            seen += n
+            lower = upper
+        return self.latency_max
+
+    def minus(self, before: "EndpointStats") -> "EndpointStats":
+        """Counters accumulated since `before` (an earlier copy of this object)."""
+        d = copy.deepcopy(self)
+        d.bucket_counts = [a - b for a, b in zip(self.bucket_counts, before.bucket_counts)]
+        d.count -= before.count
+        d.latency_sum -= before.latency_sum
+        d.statuses = {k: v - before.statuses.get(k, 0) for k, v in self.statuses.items()
+                      if v - before.statuses.get(k, 0)}
+        d.retries -= before.retries
+        d.bytes_sent -= before.bytes_sent
+        d.bytes_received -= before.bytes_received
+        return d
+
+    @property
+    def errors(self) -> int:
+        return sum(n for s, n in self.statuses.items() if not s.isdigit() or int(s) >= 400)
+
+
+_stats: Dict[tuple, EndpointStats] = {}
+_lock = threading.Lock()
+_last_flush = 0.0
+
+
+def _site(domain: str) -> str:
+    return domain.rstrip('/').lower()
+
+
+def _get(domain, endpoint, job) -> EndpointStats:
+    key = (_site(domain), endpoint, job or 'adhoc')
+    stats = _stats.get(key)
+    if stats is None:
+        stats = _stats[key] = EndpointStats(Config.METRICS_LATENCY_BUCKETS)
+    return stats
+
+
+def observe_request(domain: str, endpoint: str, status, latency: float,
+                    sent: int = 0, received: int = 0, job: Optional[str] = None, retry: bool = False) -> None:
+    """
+    Record one attempt. status is the HTTP code, or an error class name
+    (e.g. 'ReadTimeout') when no response came back; retry marks attempts
+    after the first one of a call.
+    """
+    with _lock:
+        stats = _get(domain, endpoint, job)
+        stats.observe(latency, str(status), sent, received)
+        if retry:
+            stats.retries += 1
+    _maybe_flush()
+
+
+def add_bytes(domain: str, endpoint: str, received: int, job: Optional[str] = None) -> None:
+    """Body bytes read after the attempt was recorded (streamed responses)."""
+    with _lock:
+        _get(domain, endpoint, job).bytes_received += received
+
+
+def reset(domain: Optional[str] = None) -> None:
+    with _lock:
+        for key in [k for k in _stats if domain is None or k[0] == _site(domain)]:
+            del _stats[key]
+
+
+def snapshot() -> Dict[tuple, EndpointStats]:
+    """Copy of every counter; pass to summary(since=...) to report one job run."""
+    with _lock:
+        return copy.deepcopy(_stats)
+
+
+def summary(domain: Optional[str] = None, since: Optional[Dict[tuple, EndpointStats]] = None) -> List[Dict]:
+    """One row per (site, endpoint, job) for display, slowest p95 first."""
+    rows = []
+    with _lock:
+        for key, s in _stats.items():
+            site, endpoint, job = key
+            if domain is not None and site != _site(domain):
+                continue
+            if since is not None and key in since:
+                s = s.minus(since[key])
+            if not s.count:
+                continue
+            rows.append({
+                "site": site, "endpoint": endpoint, "job": job,
+                "requests": s.count, "errors": s.errors, "retries": s.retries,
+                "p50_s": round(s.quantile(0.5), 3), "p95_s": round(s.quantile(0.95), 3),
+                "max_s": round(s.latency_max, 3),
+                "avg_s": round(s.latency_sum / s.count, 3) if s.count else 0.0,
+                "statuses": ", ".join(f"{k}:{v}" for k, v in sorted(s.statuses.items())),
+                "kb_sent": round(s.bytes_sent / 1024, 1), "kb_received": round(s.bytes_received / 1024, 1),
+            })
+    return sorted(rows, key=lambda r: r["p95_s"], reverse=True)
+
+
+def job_report(domain: str, job: str, since: Optional[Dict[tuple, EndpointStats]] = None) -> List[str]:
+    """One log line per endpoint a job used (since its start snapshot); also rewrites the metrics file."""
+    if Config.METRICS_FILE:
+        write_prometheus()
+    return [f"{r['endpoint']}: {r['requests']} req, p50 {r['p50_s']}s, p95 {r['p95_s']}s, "
+            f"{r['retries']} retries, {r['errors']} errors, {r['kb_sent']} KB sent"
+            for r in summary(domain, since) if r['job'] == job]
+
+
+# --- PROMETHEUS EXPORT ---
+def _labels(**kv) -> str:
+    esc = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in kv.items()) + "}"
+
+
+def render_prometheus() -> str:
+    """Prometheus text exposition format (0.0.4) of every counter."""
+    out = [
+        "# HELP woo_request_duration_seconds Latency of WooCommerce API attempts.",
+        "# TYPE woo_request_duration_seconds histogram",
+    ]
+    with _lock:
+        items = sorted(_stats.items())
+        for (site, endpoint, job), s in items:
+            base = dict(site=site, endpoint=endpoint, job=job)
+            cumulative = 0
+            for bound, n in zip(list(s.buckets) + ["+Inf"], s.bucket_counts):
+                cumulative += n
+                out.append(f"woo_request_duration_seconds_bucket{_labels(**base, le=bound)} {cumulative}")
+            out.append(f"woo_request_duration_seconds_sum{_labels(**base)} {s.latency_sum:.6f}")
+            out.append(f"woo_request_duration_seconds_count{_labels(**base)} {s.count}")
+        out += ["# HELP woo_requests_total Attempts by HTTP status (or error class).",
+                "# TYPE woo_requests_total counter"]
+        for (site, endpoint, job), s in items:
+            for status, n in sorted(s.statuses.items()):
+                out.append(f"woo_requests_total{_labels(site=site, endpoint=endpoint, job=job, status=status)} {n}")
+        for name, attr, help_text in (
+            ("woo_retries_total", "retries", "Retried attempts."),
+            ("woo_request_bytes_total", "bytes_sent", "Request body bytes on the wire."),
+            ("woo_response_bytes_total", "bytes_received", "Response body bytes on the wire."),
+        ):
+            out += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for (site, endpoint, job), s in items:
+                out.append(f"{name}{_labels(site=site, endpoint=endpoint, job=job)} {getattr(s, attr)}")
+    return "\n".join(out) + "\n"
+
+
+def write_prometheus(path: Optional[str] = None) -> bool:
+    """Atomically write the text file (for node_exporter's textfile collector)."""
+    path = path or Config.METRICS_FILE
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(render_prometheus())
+        os.replace(tmp, path)
+        return True
+    except OSError as e:
+        logger.warning(f"Could not write metrics file {path}: {e}")
+        return False
+
+
+def _maybe_flush() -> None:
+    global _last_flush
+    now = time.monotonic()
+    if not Config.METRICS_FILE or now - _last_flush < Config.METRICS_FLUSH_INTERVAL:
+        return
+    _last_flush = now
+    write_prometheus()
@@ -0,0 +1,55 @@
+"""
+Prefix lookups over a fixed set of keys (sheet IDs/SKUs, catalog IDs/SKUs).
+
+Keys are sorted once; a query with F prefixes costs F binary searches plus
+the matches, instead of testing every key against every prefix. Prefixes
+that extend another prefix of the same query are dropped first, so the
+scanned ranges never overlap.
+"""
+
+from bisect import bisect_left
+from typing import Hashable, Iterable, List, Tuple
+
+
+class PrefixIndex:
+    """
+    Sorted (key, value) pairs. match(prefixes) returns the values whose key
+    starts with any prefix. Keys are stripped (and casefolded with
+    fold_case=True); empty keys are not indexed.
+    """
+
+    def __init__(self, items: Iterable[Tuple[str, Hashable]], fold_case: bool = False):
+        self.fold_case = fold_case
+        pairs = sorted((k, v) for k, v in ((self.normalize(k), v) for k, v in items) if k)
+        self._keys = [k for k, _ in pairs]
+        self._values = [v for _, v in pairs]
+
+    @classmethod
+    def from_keys(cls, keys: Iterable[str], fold_case: bool = False) -> "PrefixIndex":
+        """Index whose values are the positions of `keys` (e.g. row numbers of a list of rows)."""
+        return cls(((k, i) for i, k in enumerate(keys)), fold_case)
+
+    def normalize(self, key) -> str:
+        key = str(key if key is not None else '').strip()
+        return key.casefold() if self.fold_case else key
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def match(self, prefixes: Iterable[str]) -> List[Hashable]:
+        """Values whose key starts with any of `prefixes`, each value once, in key order."""
+        wanted = sorted({p for p in (self.normalize(p) for p in prefixes) if p})
+        out, seen = [], set()
+        last = None
+        for prefix in wanted:
+            if last is not None and prefix.startswith(last):
+                continue  # its matches are inside the range of `last`
+            last = prefix
+            i = bisect_left(self._keys, prefix)
+            while i < len(self._keys) and self._keys[i].startswith(prefix):
+                value = self._values[i]
+                if value not in seen:
+                    seen.add(value)
+                    out.append(value)
+                i += 1
+        return out
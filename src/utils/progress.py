@@ -0,0 +1,110 @@
+"""
+Structured progress for long import jobs.
+
+ThroughputTracker counts finished items per phase and derives a moving
+average rate (over Config.PROGRESS_RATE_WINDOW seconds) and an ETA.
+ProgressEvent is what process_import hands to its progress_callback.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import NamedTuple, Optional
+from config import Config
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "?"
+    seconds = int(round(seconds))
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    if h:
+        return f"{h}h{m:02d}m"
+    return f"{m}m{s:02d}s" if m else f"{s}s"
+
+
+class ProgressEvent(NamedTuple):
+    phase: str                          # 'import' (text batches) or 'media' (image queue)
+    done: int
+    total: int
+    rate: float                         # items/s, moving average
+    eta_seconds: Optional[float]        # None until a rate is known
+    queue_depth: Optional[int] = None   # media: products still waiting on the server
+    fraction: float = 0.0               # whole job (both phases), 0..1
+
+    @property
+    def phase_fraction(self) -> float:
+        return min(1.0, self.done / self.total) if self.total else 1.0
+
+    def label(self) -> str:
+        name = "Products" if self.phase == 'import' else "Images"
+        parts = [f"{name} {self.done}/{self.total}", f"{self.rate:.1f}/s", f"ETA {format_duration(self.eta_seconds)}"]
+        if self.queue_depth is not None:
+            parts.append(f"queue {self.queue_depth}")
+        return " | ".join(parts)
+
+
+class ThroughputTracker:
+    """
+    Thread-safe counter for one phase. add() from workers; snapshot via
+    rate / eta / event(). queue_depth is the last server-reported backlog.
+    """
+
+    def __init__(self, total: int, window: Optional[float] = None, clock=time.monotonic):
+        self.total = total
+        self.done = 0
+        self.queue_depth: Optional[int] = None
+        self.window = window or Config.PROGRESS_RATE_WINDOW
+        self._clock = clock
+        self._started = clock()
+        self._samples = deque([(self._started, 0)])  # (time, done)
+        self._lock = threading.Lock()
+
+    def add(self, n: int, queue_depth: Optional[int] = None) -> None:
+        with self._lock:
+            self.done += n
+            if queue_depth is not None:
+                self.queue_depth = queue_depth
+                self.total = max(self.total, self.done + queue_depth)
+            self._samples.append((self._clock(), self.done))
+
+    @property
+    def rate(self) -> float:
+        """Items per second over the last `window` seconds (since start if younger)."""
+        with self._lock:
+            now = self._clock()
+            start = now - self.window
+            # Keep one sample at or before the window start as the baseline
+            while len(self._samples) > 1 and self._samples[1][0] <= start:
+                self._samples.popleft()
+            t0, d0 = self._samples[0]
+            if t0 < start:
+                if len(self._samples) > 1:
+                    t1, d1 = self._samples[1]
+                    d0 = d0 + (d1 - d0) * (start - t0) / (t1 - t0)
+                t0 = start
+            elapsed = now - t0
+            return (self.done - d0) / elapsed if elapsed > 0 else 0.0
+
+    def finish(self) -> None:
+        """Phase over: whatever was not done is not coming (e.g. products that failed to import)."""
+        with self._lock:
+            self.total = self.done
+            self.queue_depth = 0 if self.queue_depth is not None else None
+
+    def eta(self) -> Optional[float]:
+        left = self.queue_depth if self.queue_depth is not None else self.total - self.done
+        if left <= 0:
+            return 0.0
+        rate = self.rate
+        return left / rate if rate > 0 else None
+
+    def event(self, phase: str, fraction: float = 0.0) -> ProgressEvent:
+        return ProgressEvent(phase, self.done, self.total, round(self.rate, 2), self.eta(), self.queue_depth, fraction)
+
+
+def overall_fraction(*trackers: ThroughputTracker) -> float:
+    """Finished items over all items of every phase."""
+    total = sum(t.total for t in trackers)
+    return min(1.0, sum(t.done for t in trackers) / total) if total else 1.0
@@ -0,0 +1,238 @@
+"""
+Unified retry engine for the WooCommerce clients.
+
+One RetryPolicy drives every woo.py / woo_async.py endpoint:
+- decorrelated-jitter backoff (workers never retry in lockstep),
+- Retry-After honored on 429/503,
+- a retry budget shared by all calls of one job,
+- a per-site circuit breaker that fails fast once a site is clearly down.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+from config import Config
+from src.utils.logger import logger
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class RetryBudget:
+    """Thread-safe pool of retries shared by every call of one job."""
+
+    def __init__(self, total: Optional[int]):
+        self.total = total
+        self.spent = 0
+        self._lock = threading.Lock()
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.total is not None and self.spent >= self.total:
+                return False
+            self.spent += 1
+            return True
+
+    @property
+    def exhausted(self) -> bool:
+        return self.total is not None and self.spent >= self.total
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker for one site.
+
+    closed -> open after `threshold` consecutive failures; open rejects every
+    call for `cooldown` seconds; then half-open lets a single probe through
+    and its result closes or re-opens the circuit.
+    """
+
+    def __init__(self, name: str, threshold: Optional[int] = None, cooldown: Optional[float] = None):
+        self.name = name
+        self.threshold = threshold or Config.CIRCUIT_FAILURE_THRESHOLD
+        self.cooldown = cooldown or Config.CIRCUIT_COOLDOWN
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def abandon_probe(self) -> None:
+        """The call let through by allow() ended without a verdict on the site (e.g. a local error)."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            was_probing = self._probing
+            self._probing = False
+            if was_probing or (self.opened_at is None and self.failures >= self.threshold):
+                self.opened_at = time.monotonic()
+                logger.error(f"Circuit OPEN for {self.name} after {self.failures} failures "
+                             f"(cooldown {self.cooldown}s)")
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(domain: str) -> CircuitBreaker:
+    key = domain.rstrip('/').lower()
+    with _breakers_lock:
+        if key not in _breakers:
+            _breakers[key] = CircuitBreaker(key)
+        return _breakers[key]
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After is either delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryPolicy:
+    """
+    Retry settings + budget for one job. Create one per job and pass it as
+    `policy=` to woo calls; calls without a policy use DEFAULT_POLICY
+    (no shared budget). `job` labels the job's requests in src/utils/metrics.py.
+    """
+
+    def __init__(self, max_attempts: Optional[int] = None, base_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None, budget: Optional[int] = -1, job: Optional[str] = None):
+        self.job = job or 'adhoc'
+        self.max_attempts = max_attempts or Config.MAX_RETRIES
+        self.base_delay = base_delay if base_delay is not None else Config.RETRY_DELAY
+        self.max_delay = max_delay or Config.RETRY_MAX_DELAY
+        self.budget = RetryBudget(Config.RETRY_BUDGET if budget == -1 else budget)
+
+    def backoff(self, prev_delay: float) -> float:
+        """Decorrelated jitter: sleep = min(cap, uniform(base, prev * 3))."""
+        upper = max(self.base_delay, prev_delay * 3)
+        return min(self.max_delay, random.uniform(self.base_delay, upper))
+
+    def delay_for(self, status: Optional[int], headers, prev_delay: float) -> float:
+        delay = self.backoff(prev_delay)
+        if status in (429, 503) and headers is not None:
+            hinted = parse_retry_after(headers.get('Retry-After'))
+            if hinted is not None:
+                delay = min(max(delay, hinted), Config.RETRY_AFTER_MAX)
+        return delay
+
+    def _plan(self, domain, name, attempt, attempts, res, error, prev_delay):
+        """Shared bookkeeping for sync/async loops. Returns delay or None to stop."""
+        breaker = get_breaker(domain)
+        status = res.status_code if res is not None else None
+        if error is None and status not in RETRY_STATUSES:
+            breaker.record_success()
+            return None
+        breaker.record_failure()
+        if attempt >= attempts or breaker.is_open:
+            return None
+        if not self.budget.try_spend():
+            logger.warning(f"{name}: job retry budget exhausted ({self.budget.total})")
+            return None
+        reason = f"Status: {status}" if error is None else str(error)
+        logger.warning(f"{name} retry {attempt}/{attempts} - {reason}")
+        return self.delay_for(status, res.headers if res is not None else None, prev_delay)
+
+    def call(self, domain: str, name: str, send: Callable, transient: tuple, attempts: Optional[int] = None):
+        """
+        Run `send()` (returns a response or raises) under this policy.
+        Returns the last response, or None if the site never answered.
+        """
+        attempts = attempts or self.max_attempts
+        breaker = get_breaker(domain)
+        res = None
+        prev = self.base_delay
+        for attempt in range(1, attempts + 1):
+            if not breaker.allow():
+                logger.warning(f"{name}: circuit open for {domain}, skipping call")
+                return res
+            error = None
+            try:
+                res = send()
+            except transient as e:
+                error, res = e, None
+            except BaseException:
+                breaker.abandon_probe()  # otherwise a half-open breaker would wait for this probe forever
+                raise
+            delay = self._plan(domain, name, attempt, attempts, res, error, prev)
+            if delay is None:
+                return res
+            prev = delay
+            time.sleep(delay)
+        return res
+
+    async def call_async(self, domain: str, name: str, send: Callable, transient: tuple,
+                         attempts: Optional[int] = None):
+        """Coroutine twin of call(); `send()` returns an awaitable."""
+        attempts = attempts or self.max_attempts
+        breaker = get_breaker(domain)
+        res = None
+        prev = self.base_delay
+        for attempt in range(1, attempts + 1):
+            if not breaker.allow():
+                logger.warning(f"{name}: circuit open for {domain}, skipping call")
+                return res
+            error = None
+            try:
+                res = await send()
+            except transient as e:
+                error, res = e, None
+            except BaseException:
+                breaker.abandon_probe()  # otherwise a half-open breaker would wait for this probe forever
+                raise
+            delay = self._plan(domain, name, attempt, attempts, res, error, prev)
+            if delay is None:
+                return res
+            prev = delay
+            await asyncio.sleep(delay)
+        return res
+
+
+DEFAULT_POLICY = RetryPolicy(budget=None)
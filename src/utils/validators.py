@@ -7,6 +7,7 @@ Provides Pydantic models and validation functions for data integrity.
 from typing import List, Optional
 from pydantic import BaseModel, Field, validator, ValidationError, EmailStr
 from config import Config
+import pandas as pd  # type: ignore[import-untyped]
 import re
 
 
@@ -171,3 +172,67 @@ def validate_product_data(product_dict: dict) -> tuple[bool, Optional[str], Opti
     except ValidationError as e:
         error_msg = '; '.join([f"{err['loc'][0]}: {err['msg']}" for err in e.errors()])
         return False, error_msg, None
+
+
+def preflight_products(payloads: List[dict], row_numbers: Optional[List[int]] = None) -> List[Optional[str]]:
+    """
+    Check every import payload at once (the ProductImport rules, vectorized
+    with pandas) before anything is sent to WordPress.
+    
+    A SKU repeated in the list is only sent from its last valid row, as
+    the server would keep the last one anyway; earlier valid rows are
+    reported as duplicates of it (rows failing a rule keep their error).
+    
+    Args:
+        payloads: Product payloads (sku, title, price, description, images)
+        row_numbers: Sheet row of each payload, used in duplicate messages
+        
+    Returns:
+        One error message per payload, None for payloads to send
+    """
+    if not payloads:
+        return []
+    
+    df = pd.DataFrame({
+        'sku': [str(p.get('sku') or '').strip() for p in payloads],
+        'title': [str(p.get('title') or '').strip() for p in payloads],
+        'price': [str(p.get('price') if p.get('price') is not None else '').strip() for p in payloads],
+        'description': [str(p.get('description') or '') for p in payloads],
+        'row': row_numbers if row_numbers is not None else range(1, len(payloads) + 1),
+    })
+    errors = pd.Series(None, index=df.index, dtype=object)
+    
+    def flag(mask, message):
+        # Only the first problem of a row is reported
+        mask = mask & errors.isna()
+        errors[mask] = message[mask] if isinstance(message, pd.Series) else message
+    
+    sku_len = df['sku'].str.len()
+    flag(sku_len == 0, "sku: cannot be empty")
+    flag(sku_len > Config.MAX_SKU_LENGTH, f"sku: longer than {Config.MAX_SKU_LENGTH} characters")
+    flag(df['sku'].str.contains(r'[<>"\']', regex=True), "sku: contains invalid characters")
+    
+    title_len = df['title'].str.len()
+    flag(title_len == 0, "title: cannot be empty")
+    flag(title_len > Config.MAX_TITLE_LENGTH, f"title: longer than {Config.MAX_TITLE_LENGTH} characters")
+    
+    price = pd.to_numeric(df['price'], errors='coerce')
+    has_price = df['price'] != ''
+    flag(has_price & price.isna(), "price: not a number")
+    flag(has_price & ((price < Config.MIN_PRICE) | (price > Config.MAX_PRICE)),
+         f"price: must be between {Config.MIN_PRICE:.2f} and {Config.MAX_PRICE:.2f}")
+    
+    flag(df['description'].str.len() > Config.MAX_DESCRIPTION_LENGTH,
+         f"description: longer than {Config.MAX_DESCRIPTION_LENGTH} characters")
+    
+    images = pd.Series([p.get('images') or [] for p in payloads], index=df.index).explode().dropna().astype(str)
+    bad_image = ~images.str.strip().str.match(r'https?://', case=False)
+    flag(df.index.isin(images[bad_image].index), "images: only http(s) URLs are allowed")
+    
+    valid = df[errors.isna()]  # an invalid row never wins: its SKU is sent from the last valid one
+    last_row = valid.groupby('sku')['row'].transform('last')
+    duplicate = valid['sku'].duplicated(keep='last') & (valid['sku'] != '')
+    flag(df.index.isin(valid.index[duplicate]),
+         ("Skipped: duplicate SKU, row " + last_row.astype(str) + " is used").reindex(df.index))
+    
+    return [e if isinstance(e, str) else None for e in errors]
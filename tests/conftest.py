@@ -0,0 +1,50 @@
+"""
+Shared fixtures: a local stand-in for the WordPress API.
+
+A test module subclasses StandInWP with its routes (do_GET / do_POST) and
+provides a `handler` fixture returning that class with its class-level
+state reset; the `server` fixture serves it on a free local port.
+"""
+
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+from config import Config
+from src.repositories import woo
+
+
+class StandInWP(BaseHTTPRequestHandler):
+    """Silent request handler with JSON / raw reply helpers."""
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, code, body):
+        self.send_raw(code, json.dumps(body).encode(), "application/json")
+
+    def send_raw(self, code, data, content_type):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def woo_tmp(monkeypatch, tmp_path):
+    """Cache files and the metrics export under tmp_path; pooled keep-alive sessions closed afterwards."""
+    monkeypatch.setattr(Config, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(Config, 'METRICS_FILE', str(tmp_path / "woo.prom"))
+    yield tmp_path
+    woo.release_all_sessions()
+
+
+@pytest.fixture
+def server(handler, woo_tmp):
+    """Base URL of the module's `handler` served on 127.0.0.1."""
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
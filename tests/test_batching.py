@@ -0,0 +1,41 @@
+"""
+Adaptive batch sizing for product import.
+"""
+
+from src.utils.batching import AdaptiveBatcher, make_item
+
+
+def items(n, desc_len=100):
+    return [make_item(f"S{i}", {"sku": f"S{i}", "description": "x" * desc_len}, i + 2) for i in range(n)]
+
+
+def test_cut_by_count_and_bytes():
+    light = AdaptiveBatcher(items(100), initial=30, target_bytes=10 ** 6)
+    assert len(light.next_batch()) == 30
+    heavy = AdaptiveBatcher(items(100, desc_len=10_000), initial=30, target_bytes=50_000)
+    assert len(heavy.next_batch()) == 4  # ~10 KB each
+
+
+def test_oversized_item_still_sent_alone():
+    b = AdaptiveBatcher(items(2, desc_len=100_000), target_bytes=1000)
+    assert len(b.next_batch()) == 1
+
+
+def test_grows_at_most_double_and_shrinks_to_target():
+    b = AdaptiveBatcher(items(1000), initial=10, target_seconds=10, max_size=200)
+    b.record(10, 1.0, True)        # 0.1 s/product -> wants 100, capped at 2x
+    assert b.size == 20
+    b.record(20, 60.0, True)       # much slower rows arrive -> EWMA rises, size drops
+    assert b.size < 20
+    assert b.decisions[0].startswith("Batch size 10 -> 20")
+
+
+def test_failure_halves_and_split_requeues_front():
+    b = AdaptiveBatcher(items(10), initial=8)
+    batch = b.next_batch()
+    b.record(len(batch), 30.0, False)
+    assert b.size == 4
+    assert b.split(batch)
+    assert len(b) == 10
+    assert [i.key for i in b.next_batch()] == ["S4", "S5", "S6", "S7"]
+    assert not b.split(batch[:1])
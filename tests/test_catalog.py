@@ -0,0 +1,112 @@
+"""
+Local SQLite product catalog: full build, incremental refresh and lookups.
+"""
+
+import pytest
+from config import Config
+from src.repositories import catalog, woo
+
+SITE = "https://shop.test"
+DATE = "Sun, 18 Oct 2026 10:00:00 GMT"
+
+
+def product(pid, sku, status="publish", modified="2026-10-01 00:00:00", name=None):
+    return {"id": str(pid), "sku": sku, "status": status, "name": name or f"P{pid}",
+            "image": "", "modified": modified, "image_count": 1}
+
+
+class FakeSite:
+    def __init__(self):
+        self.products = {p["id"]: p for p in [product(1, "A-1"), product(2, "B-2"), product(3, "C-3", "draft")]}
+        self.token = "5"
+        self.removed = []
+        self.scans = []
+
+    def head(self, domain, secret, policy=None):
+        return {"newest_id": 3, "token": self.token, "date": DATE}
+
+    def scan(self, domain, secret, policy=None, modified_after=None, **kw):
+        self.scans.append(modified_after)
+        return iter([p for p in self.products.values()
+                     if modified_after is None or p["modified"] >= modified_after])
+
+    def delta(self, domain, secret, token, policy=None):
+        return {"token": self.token, "added": [], "removed": self.removed}
+
+
+@pytest.fixture
+def site(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(catalog, '_indexes', {})
+    fake = FakeSite()
+    monkeypatch.setattr(woo, "fetch_product_list_head", fake.head)
+    monkeypatch.setattr(woo, "iter_products_keyset", fake.scan)
+    monkeypatch.setattr(woo, "fetch_sku_delta", fake.delta)
+    return fake
+
+
+def test_full_build_and_lookups(site):
+    assert catalog.exists(SITE, "A-1") is None  # no catalog yet
+    catalog.refresh(SITE, "k")
+    assert catalog.count(SITE) == 3
+    assert catalog.exists(SITE, "A-1") and catalog.exists(SITE, "2")
+    assert not catalog.exists(SITE, "Z-9")
+    assert [p["id"] for p in catalog.search(SITE)] == [3, 2, 1]
+    assert [p["sku"] for p in catalog.search(SITE, ["b-"])] == ["B-2"]
+
+
+def test_incremental_refresh_upserts_and_removes(site):
+    catalog.refresh(SITE, "k")
+    site.products["4"] = product(4, "D-4", modified="2026-10-18 09:59:30")
+    site.products["1"] = product(1, "A-1x", modified="2026-10-18 09:59:40")
+    del site.products["2"]
+    site.token = "8"
+    site.removed = [["2", "B-2"]]
+    catalog.refresh(SITE, "k")
+    assert site.scans == [None, "2026-10-18 09:58:00"]  # server Date minus skew
+    assert sorted(p["sku"] for p in catalog.search(SITE)) == ["A-1x", "C-3", "D-4"]
+
+
+def test_search_escapes_like_wildcards(site):
+    site.products["5"] = product(5, "X_1")
+    site.products["6"] = product(6, "XY1")
+    catalog.refresh(SITE, "k")
+    assert [p["sku"] for p in catalog.search(SITE, ["X_"])] == ["X_1"]
+
+
+def test_remove_ids_after_local_delete(site):
+    catalog.refresh(SITE, "k")
+    catalog.remove_ids(SITE, ["1", 2])
+    assert [p["id"] for p in catalog.search(SITE)] == [3]
+
+
+def test_prefix_index_is_reused_until_the_catalog_changes(site, monkeypatch):
+    catalog.refresh(SITE, "k")
+    builds = []
+    real = catalog.PrefixIndex
+    monkeypatch.setattr(catalog, "PrefixIndex", lambda *a, **k: builds.append(1) or real(*a, **k))
+    assert [p["id"] for p in catalog.search(SITE, ["a", "b"])] == [2, 1]
+    assert [p["id"] for p in catalog.search(SITE, ["c"])] == [3]
+    assert len(builds) == 1
+    catalog.remove_ids(SITE, ["2"])
+    assert [p["id"] for p in catalog.search(SITE, ["a", "b"])] == [1]
+    site.products["7"] = product(7, "A-7", modified="2026-10-18 09:59:50")
+    catalog.refresh(SITE, "k")
+    assert [p["id"] for p in catalog.search(SITE, ["a"])] == [7, 1]
+    assert len(builds) == 3
+
+
+def test_product_exists_falls_back_to_rest(site, monkeypatch):
+    def down(*a, **k):
+        raise woo.WooStreamError("down")
+    monkeypatch.setattr(woo, "fetch_product_list_head", down)
+    monkeypatch.setattr(woo, "check_product_exists", lambda d, s, sku, policy=None: sku == "A-1")
+    assert catalog.product_exists(SITE, "k", "A-1") is True
+    assert catalog.product_exists(SITE, "k", "nope") is False
+
+
+def test_schema_is_set_up_once_and_again_after_clear(site):
+    catalog.refresh(SITE, "k")
+    assert catalog.db_path(SITE) in catalog._ready_paths
+    catalog.clear(SITE)
+    assert catalog.count(SITE) == 0  # tables recreated for the fresh file
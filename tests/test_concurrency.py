@@ -0,0 +1,46 @@
+"""
+Unit tests for the AIMD concurrency controller.
+"""
+
+from src.utils.concurrency import AIMDController, run_in_slot
+
+
+def test_additive_increase_when_healthy():
+    ctrl = AIMDController("t", initial=2, max_limit=5, window=5)
+    for _ in range(5):
+        ctrl.record(0.1, True)
+    assert ctrl.limit == 3
+
+
+def test_no_increase_past_ceiling():
+    ctrl = AIMDController("t", initial=2, max_limit=2, window=2)
+    for _ in range(10):
+        ctrl.record(0.1, True)
+    assert ctrl.limit == 2
+
+
+def test_multiplicative_decrease_on_overload():
+    ctrl = AIMDController("t", initial=8, max_limit=10, window=5)
+    ctrl.record(1.0, False)
+    assert ctrl.limit == 4
+    # A burst of failures right after does not collapse the limit further
+    ctrl.record(1.0, False)
+    assert ctrl.limit == 4
+
+
+def test_slow_p95_blocks_increase():
+    ctrl = AIMDController("t", initial=2, max_limit=10, window=10, latency_tolerance=2.0)
+    for _ in range(10):
+        ctrl.record(0.1, True)
+    assert ctrl.limit == 3
+    for lat in [0.1] * 8 + [5.0, 5.0]:
+        ctrl.record(lat, True)
+    assert ctrl.limit == 3
+
+
+def test_run_in_slot_reports_outcome():
+    ctrl = AIMDController("t", initial=4, max_limit=10, window=5)
+    assert run_in_slot(ctrl, lambda: None) is None
+    assert ctrl.limit == 2
+    assert ctrl.in_flight == 0
+    assert run_in_slot(None, lambda x: x * 2, 21) == 42
@@ -0,0 +1,171 @@
+"""
+Import pipeline tests (no network: woo calls are replaced by fakes).
+"""
+
+import threading
+import pytest
+from src.services import importer
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(importer.time, 'sleep', lambda s: None)
+    monkeypatch.setattr(importer, 'get_breaker', lambda d: type('B', (), {'is_open': False})())
+    monkeypatch.setattr(importer.Config, 'MEDIA_IDLE_BACKOFF_MIN', 0.001)
+    monkeypatch.setattr(importer.Config, 'MEDIA_IDLE_BACKOFF_MAX', 0.001)
+
+
+def test_has_success():
+    assert importer._has_success([{'range': 'A2', 'values': [['Done']]}])
+    assert not importer._has_success([{'range': 'A2', 'values': [['Error: bad']]}])
+    assert not importer._has_success([])
+
+
+def test_drainer_waits_for_upload_before_exiting(monkeypatch):
+    """An empty queue does not stop a pipelined drainer while Phase 1 is still uploading."""
+    upload_done = threading.Event()
+    calls = []
+
+    def fake_trigger(domain, secret, limit=1, policy=None):
+        calls.append(1)
+        if len(calls) == 10:
+            upload_done.set()  # last batch lands, its image gets queued
+            return {'status': 'processing', 'processed_count': 1}
+        return {'status': 'done'}
+
+    monkeypatch.setattr(importer.woo, 'trigger_process_media', fake_trigger)
+    processed = importer.worker_trigger_loop("https://a.test", "k", upload_done=upload_done)
+    assert processed == 1
+    assert len(calls) == 13  # 9 waiting polls, 1 item, then 3 empty polls
+
+
+def test_drainer_claims_more_and_stops_on_reported_empty_queue(monkeypatch):
+    """V12.6 snippets report `remaining`: no extra empty polls, claim size follows server time."""
+    queue = [40]
+    limits = []
+
+    def fake_trigger(domain, secret, limit=1, policy=None):
+        limits.append(limit)
+        if not queue[0]:
+            return {'status': 'done', 'remaining': 0}
+        n = min(limit, queue[0])
+        queue[0] -= n
+        return {'status': 'processing', 'processed_count': n, 'remaining': queue[0]}
+
+    monkeypatch.setattr(importer.woo, 'trigger_process_media', fake_trigger)
+    sizer = importer.ClaimSizer(target_seconds=10, max_size=8)
+    assert importer.worker_trigger_loop("https://a.test", "k", sizer=sizer) == 40
+    assert limits[:4] == [1, 2, 4, 8]  # fast calls: doubles up to the cap
+    assert len(limits) == 8  # 1+2+4+8*4 = 39, then the last one; remaining=0 ends it without an empty poll
+
+
+def test_drainer_without_pipeline_stops_on_empty_queue(monkeypatch):
+    calls = []
+    monkeypatch.setattr(importer.woo, 'trigger_process_media',
+                        lambda *a, **k: calls.append(1) or {'status': 'done'})
+    assert importer.worker_trigger_loop("https://a.test", "k") == 0
+    assert len(calls) == 3
+
+
+def test_only_overload_answers_shrink_the_drainer_limit():
+    assert importer._media_claim_ok({'status': 'done', 'remaining': 0})
+    assert importer._media_claim_ok({'status': 'error', 'http_status': 401, 'message': 'HTTP 401'})  # bad secret
+    assert importer._media_claim_ok({'status': 'error', 'http_status': 200, 'message': 'Invalid JSON'})
+    assert not importer._media_claim_ok({'status': 'error', 'http_status': 429, 'message': 'HTTP 429'})
+    assert not importer._media_claim_ok({'status': 'error', 'http_status': 503, 'message': 'HTTP 503'})
+    assert not importer._media_claim_ok(None)  # timed out / never answered
+
+
+def test_payload_hash_ignores_key_order():
+    a = {'sku': 'A', 'title': 'T', 'images': ['x']}
+    b = {'images': ['x'], 'title': 'T', 'sku': 'A'}
+    assert importer.payload_hash(a) == importer.payload_hash(b)
+    assert importer.payload_hash(a) != importer.payload_hash(dict(a, title='T2'))
+
+
+def test_unchanged_rows_are_skipped(monkeypatch, tmp_path):
+    monkeypatch.setattr(importer.Config, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(importer.sku_cache, 'sync_sku_set', lambda *a, **k: {'A', 'B'})
+    rows = [{'SKU': 'A', 'Name': 'one'}, {'SKU': 'B', 'Name': 'two'}, {'SKU': 'C', 'Name': 'three'}]
+    old = importer.row_hashes(rows)
+    importer.remember_hashes("https://a.test", old, {'A': 'success', 'B': 'success', 'C': 'success'})
+
+    rows[1]['Name'] = 'two (edited)'
+    todo, skipped = importer.select_changed_rows(rows, "https://a.test", "k", importer.row_hashes(rows))
+    # A unchanged -> skipped; B edited; C unchanged but gone from the site
+    assert skipped == 1
+    assert [r['SKU'] for r in todo] == ['B', 'C']
+
+
+def test_resume_skips_succeeded_rows_and_replays_writes(monkeypatch, tmp_path):
+    monkeypatch.setattr(importer.Config, 'CACHE_DIR', str(tmp_path))
+    written = []
+    monkeypatch.setattr(importer.db, 'update_sheet_batch', lambda s, t, u: written.extend(u) or True)
+    job = importer.journal.start_job('import', "https://a.test", 'sheet', 'Tab', 3)
+    importer.journal.record_chunk(job, 2, {'A': 'success', 'B': 'Error 500'},
+                                  [{'range': 'A2', 'values': [['Done']]}])
+
+    logs = []
+    rows = [{'SKU': 'A', '_real_row': 2}, {'SKU': 'B', '_real_row': 3}, {'SKU': 'C', '_real_row': 4}]
+    job_id, todo = importer.open_import_job(rows, "https://a.test", 'sheet', 'Tab', job, logs)
+    assert job_id == job
+    assert [r['SKU'] for r in todo] == ['B', 'C']
+    assert written == [{'range': 'A2', 'values': [['Done']]}]
+    assert importer.journal.get_job(job)['pending_writes'] == 0
+
+
+def test_preflight_rejects_rows_before_sending():
+    rows = [{'SKU': 'A', 'Name': 'old', '_real_row': 2}, {'SKU': 'B', 'Name': '', '_real_row': 3},
+            {'SKU': 'A', 'Name': 'new', '_real_row': 4}, {'Name': 'no sku', '_real_row': 5}]
+    todo, updates, results, duplicates = importer.preflight_rows(rows)
+    assert [r['_real_row'] for r in todo] == [4, 5]
+    assert updates == [{'range': 'A2', 'values': [['Skipped: duplicate SKU, row 4 is used']]},
+                       {'range': 'A3', 'values': [['Error: title: cannot be empty']]}]
+    assert results == {'B': 'Error: title: cannot be empty'} and duplicates == 1
+
+
+def test_fan_out_gives_each_site_its_status_column(monkeypatch):
+    import threading
+    calls, seen = {}, []
+    monkeypatch.setattr(importer.db, 'ensure_columns', lambda s, t, headers: {h: 'QR'[i] for i, h in enumerate(headers)})
+
+    def fake_import(rows, domain, secret, mode, sheet_id, tab, workers, callback, **kw):
+        if domain == "https://down.test": raise ConnectionError("refused")
+        calls[domain] = (kw['status_col'], kw['mark_published'])
+        callback(importer.ThroughputTracker(len(rows)).event('import', 1.0))
+        return [f"{len(rows)} rows"]
+
+    monkeypatch.setattr(importer, 'process_import', fake_import)
+    sites = [{'site_name': 'One', 'domain_url': "https://one.test", 'secret_key': 's'},
+             {'site_name': 'Two', 'domain_url': "https://down.test", 'secret_key': 's'}]
+    results = importer.process_import_multi([{'SKU': 'A', '_real_row': 2}], sites, 'sheet', 'Tab', 2,
+                                            lambda name, ev: seen.append((name, threading.current_thread())))
+    assert calls == {"https://one.test": ('Q', False)}
+    assert results == {'One': ["1 rows"], 'Two': ["Import failed: refused"]}
+    assert seen == [('One', threading.current_thread())]
+
+
+def test_fan_out_stops_every_site_when_the_caller_cancels(monkeypatch):
+    import time
+    monkeypatch.setattr(importer.db, 'ensure_columns', lambda s, t, headers: {h: 'QR'[i] for i, h in enumerate(headers)})
+    monkeypatch.setattr(importer.Config, 'PROGRESS_INTERVAL', 0.01)
+    stopped = []
+
+    def endless_import(rows, domain, secret, mode, sheet_id, tab, workers, callback, **kw):
+        try:
+            while True:
+                callback(importer.ThroughputTracker(len(rows)).event('import', 0.5))
+                time.sleep(0.01)
+        except importer.ImportStopped:
+            stopped.append(domain)
+            raise
+
+    def cancel(name, ev):
+        raise KeyboardInterrupt()
+
+    monkeypatch.setattr(importer, 'process_import', endless_import)
+    sites = [{'site_name': n, 'domain_url': f"https://{n}.test", 'secret_key': 's'} for n in ('one', 'two')]
+    with pytest.raises(KeyboardInterrupt):
+        importer.process_import_multi([{'SKU': 'A', '_real_row': 2}], sites, 'sheet', 'Tab', 2, cancel)
+    assert sorted(stopped) == ["https://one.test", "https://two.test"]  # both threads ended before the raise
+    assert importer.process_import_multi([{'SKU': 'A', '_real_row': 2}], [], 'sheet', 'Tab') == {}
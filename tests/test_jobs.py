@@ -0,0 +1,167 @@
+"""
+Headless job runners and the scripts/run_job.py command line.
+"""
+
+import importlib.util
+import json
+import os
+import re
+import pytest
+from src.services import jobs, importer
+
+SITES = [
+    {'id': 7, 'site_name': 'My Shop', 'domain_url': 'https://shop.test/', 'secret_key': 's', 'google_sheet_id': 'g'},
+    {'id': 8, 'site_name': 'Other', 'domain_url': 'https://other.test', 'secret_key': 's'},
+]
+
+
+def load_cli():
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts', 'run_job.py')
+    spec = importlib.util.spec_from_file_location('run_job', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_find_site_by_id_name_or_domain():
+    assert jobs.find_site('7', SITES)['id'] == 7
+    assert jobs.find_site('my shop', SITES)['id'] == 7
+    assert jobs.find_site('https://shop.test', SITES)['id'] == 7
+    with pytest.raises(jobs.JobError):
+        jobs.find_site('nope', SITES)
+
+
+def test_run_job_rejects_bad_kind_params_and_site():
+    with pytest.raises(jobs.JobError):
+        jobs.run_job('explode', SITES[0], {})
+    with pytest.raises(jobs.JobError):
+        jobs.run_job('sync', SITES[0], {'tab': 'Action', 'colour': 'red'})
+    with pytest.raises(jobs.JobError):
+        jobs.run_job('delete', SITES[0], {'ids': ['1'], 'wipe': True})
+    with pytest.raises(jobs.JobError):
+        jobs.run_job('sync', SITES[1], {'tab': 'Action'})  # no google_sheet_id
+
+
+def test_load_and_filter_rows(monkeypatch):
+    class Sheet:
+        def get_all_values(self): return [['ID', 'Name '], ['551', 'a'], ['560'], ['661', 'c']]
+
+    monkeypatch.setattr(importer.db, 'init_google_sheets', lambda: Sheet())
+    monkeypatch.setattr(importer.db, 'open_worksheet', lambda sheet_id, tab: Sheet())
+    rows = importer.load_sheet_rows('g', 'Action')
+    assert rows[1] == {'ID': '560', 'Name': '', '_real_row': 3}
+    assert [r['ID'] for r in importer.filter_rows(rows, ['55', '66'])] == ['551', '661']
+    assert importer.filter_rows(rows, []) is rows
+
+
+def test_cli_json_lines_and_exit_codes(monkeypatch, capsys):
+    cli = load_cli()
+    monkeypatch.setattr(jobs.db, 'get_all_sites', lambda: SITES)
+    assert cli.main(['delete', '--site', 'My Shop', '--wipe']) == cli.EXIT_USAGE
+
+    def fake_sync(site, tab, threads=20, progress=None):
+        print("stray debug line")
+        progress({'phase': 'sync', 'fraction': 1.0})
+        return {'ok': False, 'summary': 'Sync Error: boom', 'logs': ['Sync Error: boom']}
+
+    monkeypatch.setitem(jobs.RUNNERS, 'sync', fake_sync)
+    capsys.readouterr()
+    assert cli.main(['sync', '--site', '7', '--tab', 'Action']) == cli.EXIT_FAILED
+    out, err = capsys.readouterr()
+    events = [json.loads(line) for line in out.splitlines()]
+    assert [e['event'] for e in events] == ['start', 'progress', 'log', 'result']
+    assert events[-1]['ok'] is False
+    assert "stray debug line" in err
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    """Stand-in for the Supabase job_queue: records heartbeats and the final row."""
+    from config import Config
+    state = {'cancel': False, 'beats': 0, 'final': None}
+    monkeypatch.setattr(Config, 'JOB_HEARTBEAT_SECONDS', 0.01)
+
+    def heartbeat(job_id, progress=None):
+        state['beats'] += 1
+        return state['cancel']
+
+    monkeypatch.setattr(jobs.db, 'heartbeat_job', heartbeat)
+    monkeypatch.setattr(jobs.db, 'complete_job', lambda job_id, s, **kw: state.update(final=(s, kw)))
+    return state
+
+
+def test_run_queued_stores_outcome(monkeypatch, queue):
+    monkeypatch.setitem(jobs.RUNNERS, 'sync', lambda site, tab, progress=None: (
+        progress({'phase': 'sync', 'fraction': 1.0}) or {'ok': True, 'summary': 'Synced', 'logs': ['Synced']}))
+    assert jobs.run_queued({'id': 1, 'kind': 'sync', 'site_id': 7, 'params': {'tab': 'Action'}}, SITES) == 'done'
+    state, outcome = queue['final']
+    assert outcome['result'] == {'ok': True, 'summary': 'Synced'} and outcome['logs'] == ['Synced']
+    assert outcome['progress'] == {'phase': 'sync', 'fraction': 1.0}
+
+    assert jobs.run_queued({'id': 2, 'kind': 'sync', 'site_id': 99, 'params': {'tab': 'Action'}}, SITES) == 'failed'
+    assert "Site not found" in queue['final'][1]['error']
+
+
+def test_run_queued_cancel_stops_at_next_progress(monkeypatch, queue):
+    import time
+    calls = []
+
+    def slow_delete(site, ids=None, wipe=False, tab=None, threads=10, progress=None):
+        for i in range(500):
+            calls.append(i)
+            progress({'phase': 'delete', 'fraction': i / 500})
+            time.sleep(0.005)
+        return {'ok': True, 'summary': 'all gone', 'logs': []}
+
+    monkeypatch.setitem(jobs.RUNNERS, 'delete', slow_delete)
+    queue['cancel'] = True  # cancel requested right after the job was claimed
+    job = {'id': 3, 'kind': 'delete', 'site_id': 7, 'params': {'ids': ['1']}}
+    assert jobs.run_queued(job, SITES) == 'cancelled'
+    assert queue['beats'] >= 1 and len(calls) < 500
+
+
+def test_cancelled_delete_drops_unstarted_chunks(monkeypatch, tmp_path):
+    import time
+    from config import Config
+    from src.services import deleter
+    monkeypatch.setattr(Config, 'CACHE_DIR', str(tmp_path))
+    sent = []
+
+    def delete_batch(domain, secret, ids, policy=None):
+        sent.append(ids)
+        time.sleep(0.01)
+        return True, len(ids), [f"SKU{i}" for i in ids]
+
+    monkeypatch.setattr(deleter.woo, 'delete_products_batch_custom', delete_batch)
+    monkeypatch.setattr(deleter.woo, 'configure_pool', lambda *a: None)
+
+    def cancel(*args):
+        raise jobs.JobCancelled()
+
+    with pytest.raises(jobs.JobCancelled):
+        deleter.delete_product_list("https://shop.test", "s", [str(i) for i in range(50 * 40)], 2, cancel)
+    assert len(sent) < 40
+
+
+def test_job_timestamps_are_utc(monkeypatch):
+    from datetime import datetime, timezone
+    writes = []
+
+    class Table:
+        def update(self, data): writes.append(data); return self
+        def eq(self, *args): return self
+        def execute(self): return type('Res', (), {'data': [{'cancel_requested': False}]})()
+
+    monkeypatch.setattr(jobs.db, 'init_supabase', lambda: type('Supa', (), {'table': lambda self, name: Table()})())
+    jobs.db.heartbeat_job(1, {'phase': 'import'})
+    jobs.db.complete_job(1, jobs.db.JOB_DONE)
+    stamps = [datetime.fromisoformat(writes[0]['heartbeat_at']), datetime.fromisoformat(writes[1]['finished_at'])]
+    assert all(t.utcoffset() == timezone.utc.utcoffset(None) for t in stamps)
+
+
+def test_job_queue_accepts_every_runner_kind():
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'migrations', '002_add_job_queue.sql')
+    with open(path, encoding='utf-8') as f:
+        sql = f.read()
+    check = re.search(r"CHECK \(kind IN \(([^)]*)\)\)", sql).group(1)
+    assert set(re.findall(r"'([^']+)'", check)) == set(jobs.RUNNERS)
@@ -0,0 +1,55 @@
+"""
+Job journal: checkpoints, resume lookups and pending sheet writes.
+"""
+
+import pytest
+from config import Config
+from src.repositories import journal
+
+SITE = "https://shop.test"
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, 'CACHE_DIR', str(tmp_path))
+
+
+def test_checkpoint_and_resume_lookup(monkeypatch):
+    job = journal.start_job('import', SITE, 'sheet', 'Tab', 4)
+    journal.record_chunk(job, 2, {'A': 'success', 'B': 'Error: bad'},
+                         [{'range': 'A2', 'values': [['Done']]}, {'range': 'A3', 'values': [['Error: bad']]}])
+
+    assert journal.find_resumable('import', SITE, 'sheet', 'Tab') is None  # still running somewhere
+    monkeypatch.setattr(Config, 'JOURNAL_STALE_SECONDS', -1)  # no checkpoint for too long: cut off
+    found = journal.find_resumable('import', SITE + '/', 'sheet', 'Tab')
+    assert found['id'] == job
+    assert (found['rows_done'], found['succeeded'], found['pending_writes']) == (2, 1, 2)
+    assert journal.succeeded_skus(job) == {'A'}
+    assert journal.find_resumable('import', SITE, 'sheet', 'Other') is None
+
+
+def test_finish_depends_on_pending_writes():
+    job = journal.start_job('import', SITE, 'sheet', 'Tab', 1)
+    journal.record_chunk(job, 1, {'A': 'success'}, [{'range': 'A2', 'values': [['Done']]}])
+    assert journal.finish_job(job) == journal.INCOMPLETE
+    assert journal.find_resumable('import', SITE, 'sheet', 'Tab')['id'] == job
+
+    pending = journal.pending_writes(job)
+    assert pending[0][1] == {'range': 'A2', 'values': [['Done']]}
+    journal.mark_written([seq for seq, _ in pending])
+    assert journal.finish_job(job) == journal.DONE
+    assert journal.find_resumable('import', SITE, 'sheet', 'Tab') is None
+
+
+def test_old_jobs_are_pruned(monkeypatch):
+    old = journal.start_job('import', SITE, 'sheet', 'Tab', 1)
+    monkeypatch.setattr(Config, 'JOURNAL_KEEP_DAYS', -1)  # everything counts as old
+    journal.start_job('import', SITE, 'sheet', 'Tab', 1)
+    assert journal.get_job(old) is None
+
+
+def test_schema_is_set_up_once_per_path(tmp_path):
+    journal.start_job('import', SITE, 'sheet', 'Tab', 1)
+    assert journal.journal_path() in journal._ready_paths
+    (tmp_path / "jobs.sqlite").unlink()  # file removed behind our back: recreated with its tables
+    assert journal.start_job('import', SITE, 'sheet', 'Tab', 1)
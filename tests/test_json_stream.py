@@ -0,0 +1,49 @@
+"""
+Unit tests for incremental JSON array decoding.
+"""
+
+import json
+import pytest
+from src.utils.json_stream import iter_json_array, JSONStreamError
+
+
+def chunked(text, size):
+    data = text.encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 64, 10000])
+def test_top_level_array_any_chunking(size):
+    items = [{"id": i, "url": f"https://x.test/ảnh-{i}.jpg", "title": "Tên \"q\""} for i in range(50)]
+    assert list(iter_json_array(chunked(json.dumps(items), size))) == items
+
+
+@pytest.mark.parametrize("size", [1, 5, 4096])
+def test_keyed_array(size):
+    body = json.dumps({"skus": ["A1", "12345", "B-2"], "count": 3})
+    assert list(iter_json_array(chunked(body, size), key="skus")) == ["A1", "12345", "B-2"]
+
+
+def test_numbers_split_across_chunks():
+    assert list(iter_json_array(["[12", "345, 6", "7]"])) == [12345, 67]
+
+
+def test_empty_array():
+    assert list(iter_json_array([b'{"skus": [ ]}'], key="skus")) == []
+
+
+def test_truncated_body_raises():
+    with pytest.raises(JSONStreamError):
+        list(iter_json_array([b'["a", "b"']))
+
+
+def test_missing_key_raises():
+    with pytest.raises(JSONStreamError):
+        list(iter_json_array([b'{"ids": [1]}'], key="skus"))
+
+
+def test_is_lazy():
+    def body():
+        yield b'["first", '
+        raise AssertionError("read too far")
+    assert next(iter_json_array(body())) == "first"
@@ -0,0 +1,58 @@
+"""
+Request metrics: histogram quantiles, per-job reports and Prometheus export.
+"""
+
+import pytest
+from config import Config
+from src.utils import metrics
+
+SITE = "https://shop.test"
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry(monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, '_stats', {})
+    monkeypatch.setattr(Config, 'METRICS_FILE', str(tmp_path / "woo.prom"))
+    monkeypatch.setattr(Config, 'METRICS_FLUSH_INTERVAL', 10 ** 6)
+
+
+def test_quantiles_from_histogram():
+    for latency in [0.2] * 90 + [8.0] * 10:
+        metrics.observe_request(SITE, "import-product-batch", 200, latency, job="import")
+    row = metrics.summary(SITE)[0]
+    assert row["requests"] == 100
+    assert 0.1 < row["p50_s"] <= 0.25
+    assert 5 < row["p95_s"] <= 8.0
+    assert row["max_s"] == 8.0
+
+
+def test_statuses_errors_and_retries():
+    metrics.observe_request(SITE, "delete-product-batch", 503, 1.0, job="delete")
+    metrics.observe_request(SITE, "delete-product-batch", "ReadTimeout", 30.0, job="delete", retry=True)
+    metrics.observe_request(SITE, "delete-product-batch", 200, 0.5, sent=2048, received=100, job="delete", retry=True)
+    row = metrics.summary(SITE)[0]
+    assert row["errors"] == 2 and row["retries"] == 2
+    assert row["statuses"] == "200:1, 503:1, ReadTimeout:1"
+    assert row["kb_sent"] == 2.0
+
+
+def test_job_report_only_counts_since_snapshot():
+    metrics.observe_request(SITE, "import-product-batch", 200, 0.3, job="import")
+    started = metrics.snapshot()
+    metrics.observe_request(SITE, "import-product-batch", 200, 0.3, job="import")
+    metrics.observe_request(SITE, "process-pending-media", 200, 0.3, job="import")
+    lines = metrics.job_report(SITE, "import", started)
+    assert len(lines) == 2
+    assert all(" 1 req," in line for line in lines)
+
+
+def test_prometheus_text_export(tmp_path):
+    metrics.observe_request(SITE, "get-all-skus", 200, 0.4, received=5000, job="adhoc")
+    text = metrics.render_prometheus()
+    labels = 'site="https://shop.test",endpoint="get-all-skus",job="adhoc"'
+    assert f'woo_request_duration_seconds_bucket{{{labels},le="0.5"}} 1' in text
+    assert f'woo_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1' in text
+    assert f'woo_requests_total{{{labels},status="200"}} 1' in text
+    assert f'woo_response_bytes_total{{{labels}}} 5000' in text
+    assert metrics.write_prometheus()
+    assert (tmp_path / "woo.prom").read_text() == text
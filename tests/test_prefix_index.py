@@ -0,0 +1,30 @@
+"""
+PrefixIndex lookups against a brute-force startswith scan.
+"""
+
+import random
+from src.utils.prefix_index import PrefixIndex
+from src.services import importer
+
+
+def test_matches_brute_force():
+    rng = random.Random(7)
+    keys = [str(rng.randrange(10_000, 20_000)) for _ in range(2_000)] + ['', '  ', 'SKU-9']
+    prefixes = [k[:rng.randrange(1, 6)] for k in rng.sample(keys[:2_000], 300)] + ['SKU', '']
+    index = PrefixIndex.from_keys(keys)
+    expected = [i for i, k in enumerate(keys) if k.strip() and any(k.startswith(p) for p in prefixes if p)]
+    assert sorted(index.match(prefixes)) == expected
+
+
+def test_overlapping_prefixes_and_case_folding():
+    index = PrefixIndex([('AB-1', 1), ('ab-2', 2), ('ABC', 3), ('B', 4), ('AB-1', 5)], fold_case=True)
+    assert index.match(['ab', 'ABC', 'ab-']) == [1, 5, 2, 3]
+    assert PrefixIndex([('AB-1', 1), ('ab-2', 2)]).match(['ab']) == [2]
+    assert index.match([]) == [] and len(index) == 5
+
+
+def test_filter_rows_keeps_sheet_order_and_reuses_index():
+    rows = [{'ID': '560', '_real_row': 2}, {'ID': '551', '_real_row': 3}, {'ID': '661', '_real_row': 4}]
+    assert [r['ID'] for r in importer.filter_rows(rows, ['66', '55', '5'])] == ['560', '551', '661']
+    assert importer.row_index(rows) is importer.row_index(rows)
+    assert importer.filter_rows([{'Name': 'x'}], ['1']) == [{'Name': 'x'}]
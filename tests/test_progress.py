@@ -0,0 +1,62 @@
+"""
+Throughput tracking, ETA and progress events.
+"""
+
+from src.utils.progress import ThroughputTracker, ProgressEvent, format_duration, overall_fraction
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_rate_and_eta():
+    clock = FakeClock()
+    t = ThroughputTracker(100, window=60, clock=clock)
+    assert t.eta() is None  # no rate yet
+    for _ in range(10):
+        clock.now += 1
+        t.add(2)
+    assert t.rate == 2.0
+    assert t.eta() == 40.0  # 80 left at 2/s
+
+
+def test_rate_is_a_moving_average():
+    clock = FakeClock()
+    t = ThroughputTracker(1000, window=10, clock=clock)
+    for _ in range(20):  # fast start: 10/s
+        clock.now += 1
+        t.add(10)
+    for _ in range(10):  # slows down to 1/s
+        clock.now += 1
+        t.add(1)
+    assert t.rate == 1.0  # only the last 10s count
+    clock.now += 5  # stalls
+    assert t.rate == 0.5
+
+
+def test_queue_depth_drives_eta_and_total():
+    clock = FakeClock()
+    t = ThroughputTracker(10, window=60, clock=clock)
+    clock.now += 10
+    t.add(5, queue_depth=20)  # server backlog is bigger than our estimate
+    assert t.total == 25
+    ev = t.event('media', fraction=0.5)
+    assert ev.queue_depth == 20 and ev.eta_seconds == 40.0
+    assert "queue 20" in ev.label()
+    t.finish()
+    assert t.event('media').phase_fraction == 1.0
+
+
+def test_overall_fraction_and_format():
+    a, b = ThroughputTracker(10), ThroughputTracker(30)
+    a.add(10)
+    assert overall_fraction(a, b) == 0.25
+    assert format_duration(None) == "?"
+    assert format_duration(42) == "42s"
+    assert format_duration(125) == "2m05s"
+    assert format_duration(3 * 3600 + 600) == "3h10m"
+    assert ProgressEvent('import', 0, 0, 0.0, None).phase_fraction == 1.0
@@ -0,0 +1,119 @@
+"""
+Unit tests for the unified retry engine.
+"""
+
+import pytest
+from src.utils import retry
+from src.utils.retry import RetryPolicy, CircuitBreaker, RetryBudget, parse_retry_after
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    """Record sleeps instead of waiting; isolate breakers per test."""
+    sleeps = []
+    monkeypatch.setattr(retry.time, 'sleep', lambda s: sleeps.append(s))
+    monkeypatch.setattr(retry, '_breakers', {})
+    return sleeps
+
+
+class TestBackoff:
+    def test_decorrelated_jitter_bounds(self):
+        policy = RetryPolicy(base_delay=1, max_delay=10)
+        prev = 1
+        for _ in range(50):
+            delay = policy.backoff(prev)
+            assert 1 <= delay <= min(10, prev * 3)
+            prev = delay
+
+    def test_retry_after_seconds(self):
+        assert parse_retry_after("7") == 7.0
+        assert parse_retry_after(None) is None
+        assert parse_retry_after("garbage") is None
+
+    def test_retry_after_honored_on_429(self):
+        policy = RetryPolicy(base_delay=0.1, max_delay=0.2)
+        delay = policy.delay_for(429, {'Retry-After': '5'}, 0.1)
+        assert delay == 5.0
+
+    def test_retry_after_ignored_on_500(self):
+        policy = RetryPolicy(base_delay=0.1, max_delay=0.2)
+        delay = policy.delay_for(500, {'Retry-After': '5'}, 0.1)
+        assert delay <= 0.2
+
+
+class TestRetryLoop:
+    def test_retries_until_success(self, no_sleep):
+        responses = iter([FakeResponse(503), FakeResponse(502), FakeResponse(200)])
+        policy = RetryPolicy(max_attempts=5, budget=None)
+        res = policy.call("https://a.test", "t", lambda: next(responses), (IOError,))
+        assert res.status_code == 200
+        assert len(no_sleep) == 2
+
+    def test_non_retryable_status_returns_immediately(self, no_sleep):
+        policy = RetryPolicy(max_attempts=5, budget=None)
+        res = policy.call("https://a.test", "t", lambda: FakeResponse(404), (IOError,))
+        assert res.status_code == 404
+        assert no_sleep == []
+
+    def test_transient_error_returns_none(self):
+        def boom():
+            raise IOError("down")
+        policy = RetryPolicy(max_attempts=3, budget=None)
+        assert policy.call("https://a.test", "t", boom, (IOError,)) is None
+
+    def test_budget_shared_across_calls(self, no_sleep):
+        policy = RetryPolicy(max_attempts=5, budget=3)
+        policy.call("https://a.test", "t", lambda: FakeResponse(500), (IOError,))
+        policy.call("https://b.test", "t", lambda: FakeResponse(500), (IOError,))
+        assert policy.budget.exhausted
+        assert len(no_sleep) == 3
+
+
+class TestCircuitBreaker:
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker("x", threshold=3, cooldown=60)
+        for _ in range(3):
+            assert breaker.allow()
+            breaker.record_failure()
+        assert breaker.state == "open"
+        assert not breaker.allow()
+
+    def test_half_open_single_probe(self, monkeypatch):
+        breaker = CircuitBreaker("x", threshold=1, cooldown=10)
+        breaker.record_failure()
+        monkeypatch.setattr(retry.time, 'monotonic', lambda: breaker.opened_at + 11)
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.state == "closed"
+
+    def test_probe_ending_in_a_local_error_does_not_block_the_site(self, monkeypatch):
+        breaker = retry.get_breaker("https://flaky.test")
+        breaker.record_failure()
+        breaker.opened_at = retry.time.monotonic() - breaker.cooldown - 1  # half-open
+        policy = RetryPolicy(budget=None)
+
+        def broken():
+            raise KeyError("bad payload")
+
+        with pytest.raises(KeyError):
+            policy.call("https://flaky.test", "t", broken, (IOError,))
+        assert breaker.allow()  # the next call may probe again
+
+    def test_open_circuit_short_circuits_calls(self):
+        calls = []
+        retry.get_breaker("https://down.test").opened_at = retry.time.monotonic()
+        policy = RetryPolicy(budget=None)
+        res = policy.call("https://down.test", "t", lambda: calls.append(1), (IOError,))
+        assert res is None
+        assert calls == []
+
+    def test_budget_unlimited(self):
+        budget = RetryBudget(None)
+        assert all(budget.try_spend() for _ in range(1000))
@@ -0,0 +1,157 @@
+"""
+Sheet snapshot cache (revision checks, own-write patching, fallbacks) and
+the worksheet handle pool with per-thread clients.
+"""
+
+import threading
+import gspread
+import pytest
+from google.auth.credentials import AnonymousCredentials
+from config import Config
+from src.repositories import db
+
+
+class FakeSheets:
+    """gspread client stand-in: one tab, a Drive modifiedTime and call counters."""
+
+    def __init__(self, values):
+        self.values = values
+        self.revision = "2026-10-18T10:00:00.000Z"
+        self.downloads = 0
+        self.revision_reads = 0
+
+    def get_file_drive_metadata(self, sheet_id):
+        self.revision_reads += 1
+        if self.revision is None: raise PermissionError("no Drive scope")
+        return {'modifiedTime': self.revision}
+
+    def get_all_values(self):
+        self.downloads += 1
+        return [list(r) for r in self.values]
+
+    def batch_update(self, updates):
+        self.revision = "2026-10-18T10:05:00.000Z"
+
+
+@pytest.fixture
+def sheets(monkeypatch):
+    fake = FakeSheets([['Check_update', 'ID'], ['', '101'], ['', '102']])
+    monkeypatch.setattr(db, 'init_google_sheets', lambda: fake)
+    monkeypatch.setattr(db, 'open_worksheet', lambda sheet_id, tab: fake)
+    monkeypatch.setattr(Config, 'SHEET_SNAPSHOT_CHECK_SECONDS', 0)
+    db._snapshots.clear()
+    yield fake
+    db._snapshots.clear()
+
+
+def test_download_only_when_revision_changes(sheets, monkeypatch):
+    first = db.get_sheet_values('s', 'Tab')
+    assert db.get_sheet_values('s', 'Tab') is first
+    assert sheets.downloads == 1 and sheets.revision_reads == 2
+
+    sheets.revision = "2026-10-18T11:00:00.000Z"
+    assert db.get_sheet_values('s', 'Tab') is not first and sheets.downloads == 2
+
+    monkeypatch.setattr(Config, 'SHEET_SNAPSHOT_CHECK_SECONDS', 60)
+    db.get_sheet_values('s', 'Tab')
+    assert sheets.revision_reads == 3  # inside the check window: no Drive call at all
+
+
+def test_own_writes_patch_the_snapshot(sheets):
+    before = db.get_sheet_values('s', 'Tab')
+    assert db.update_sheet_batch('s', 'Tab', [{'range': 'A2', 'values': [['Done']]},
+                                              {'range': 'C3', 'values': [[1]]}])
+    after = db.get_sheet_values('s', 'Tab')
+    assert sheets.downloads == 1
+    assert after == [['Check_update', 'ID', ''], ['Done', '101', ''], ['', '102', '1']]
+    assert before == [['Check_update', 'ID'], ['', '101'], ['', '102']]  # readers keep their copy
+
+    db.invalidate_sheet('s')
+    db.get_sheet_values('s', 'Tab')
+    assert sheets.downloads == 2
+
+
+def test_no_revision_means_no_cache(sheets):
+    sheets.revision = None
+    db.get_sheet_values('s', 'Tab')
+    db.get_sheet_values('s', 'Tab')
+    assert sheets.downloads == 2 and not db._snapshots
+
+
+class FakeSpreadsheet:
+    def __init__(self, tabs):
+        self.tabs = tabs
+
+    def fetch_sheet_metadata(self):
+        return {'sheets': [{'properties': {'sheetId': i, 'title': t}} for i, t in enumerate(self.tabs)]}
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    spreadsheet = FakeSpreadsheet(['Action', 'UpdateImage'])
+    opened = []
+    monkeypatch.setattr(db, '_google_credentials', lambda: AnonymousCredentials())
+    monkeypatch.setattr(db, '_sheet_clients', threading.local())
+    monkeypatch.setattr(gspread.Client, 'open_by_key', lambda gc, key: opened.append(key) or spreadsheet)
+    monkeypatch.setattr(Config, 'SHEET_HANDLE_TTL_SECONDS', 60)
+    db.invalidate_handles()
+    yield spreadsheet, opened
+    db.invalidate_handles()
+
+
+def test_clients_are_per_thread(pool):
+    gc = db.init_google_sheets()
+    assert db.init_google_sheets() is gc
+    other = []
+    t = threading.Thread(target=lambda: other.append(db.init_google_sheets()))
+    t.start(); t.join()
+    assert other[0] is not None and other[0] is not gc
+
+
+def test_handles_are_pooled_and_bound_to_the_calling_thread(pool):
+    spreadsheet, opened = pool
+    ws = db.open_worksheet('s', 'Action')
+    assert (ws.title, ws.id, ws.spreadsheet_id) == ('Action', 0, 's')
+    assert ws.client is db.init_google_sheets().http_client
+    assert db.get_worksheet_titles('s') == ['Action', 'UpdateImage']
+
+    clients = []
+    t = threading.Thread(target=lambda: clients.append(db.open_worksheet('s', 'UpdateImage').client))
+    t.start(); t.join()
+    assert clients[0] is not ws.client
+    assert opened == ['s']  # one open for both threads and the tab list
+
+    spreadsheet.tabs.append('New')  # unknown tab: reopen once, then give up
+    assert db.open_worksheet('s', 'New').title == 'New'
+    with pytest.raises(gspread.WorksheetNotFound):
+        db.open_worksheet('s', 'Missing')
+    assert opened == ['s'] * 3
+
+
+def test_handles_expire(pool, monkeypatch):
+    _, opened = pool
+    monkeypatch.setattr(Config, 'SHEET_HANDLE_TTL_SECONDS', 0)
+    db.open_worksheet('s', 'Action')
+    db.open_worksheet('s', 'Action')
+    assert opened == ['s', 's']
+
+
+def test_a_slow_open_does_not_block_other_spreadsheets(pool, monkeypatch):
+    spreadsheet, opened = pool
+    release = threading.Event()
+
+    def open_by_key(gc, key):
+        if key == 'slow': release.wait(5)
+        opened.append(key)
+        return spreadsheet
+
+    monkeypatch.setattr(gspread.Client, 'open_by_key', open_by_key)
+    t = threading.Thread(target=lambda: db.open_worksheet('slow', 'Action'))
+    t.start()
+    try:
+        assert db.open_worksheet('fast', 'Action').title == 'Action'
+        assert opened == ['fast']  # did not wait for the other spreadsheet's metadata fetch
+    finally:
+        release.set()
+        t.join()
+    assert opened == ['fast', 'slow']
@@ -0,0 +1,105 @@
+"""
+Sheets batch writer: range coalescing, request splitting, quota pacing and 429 retries.
+"""
+
+import time
+import gspread
+import pytest
+import requests
+from config import Config
+from src.repositories import db
+from src.utils.concurrency import TokenBucket
+
+
+def cell(a1, value):
+    return {'range': a1, 'values': [[value]]}
+
+
+def api_error(status, retry_after=None):
+    res = requests.Response()
+    res.status_code = status
+    res._content = b'{"error": {"code": %d, "message": "quota", "status": "RESOURCE_EXHAUSTED"}}' % status
+    if retry_after is not None:
+        res.headers['Retry-After'] = str(retry_after)
+    return gspread.exceptions.APIError(res)
+
+
+def test_single_cells_become_column_ranges():
+    updates = []
+    for r in range(2, 1002):
+        updates += [cell(f'A{r}', 'Done'), cell(f'F{r}', 1)]
+    updates += [cell('A7', 'Error: bad price'), cell('C9', None)]
+    merged = db.coalesce_updates(updates)
+    assert [u['range'] for u in merged] == ['A2:A1001', 'F2:F1001']
+    assert merged[0]['values'][5] == ['Error: bad price']  # later update of a cell wins
+    assert merged[1]['values'][0] == [1]
+
+
+def test_row_blocks_merge_across_adjacent_columns():
+    merged = db.coalesce_updates([cell('A2', 'a'), cell('B2', 'b'), cell('A3', 'c'), cell('B3', 'd'),
+                                  cell('C4', 'e'), {'range': 'D2:E2', 'values': [['x', 'y']]}])
+    assert merged == [{'range': 'A2:B3', 'values': [['a', 'b'], ['c', 'd']]},
+                      {'range': 'D2:E2', 'values': [['x', 'y']]},
+                      {'range': 'C4', 'values': [['e']]}]
+
+
+def test_unmergeable_ranges_pass_through():
+    updates = [cell('A2', 'a'), {'range': "'Action'!A3", 'values': [['b']]}]
+    assert db.coalesce_updates(updates) == updates
+
+
+def test_large_blocks_and_requests_are_split(monkeypatch):
+    updates = [cell(f'A{r}', 'x' * 50) for r in range(1, 201)]
+    merged = db.coalesce_updates(updates, max_bytes=2000)
+    assert len(merged) > 1 and sum(len(u['values']) for u in merged) == 200
+    assert merged[0]['range'].startswith('A1:') and merged[-1]['range'].endswith(':A200')
+
+    monkeypatch.setattr(Config, 'SHEET_MAX_UPDATES_PER_REQUEST', 3)
+    requests_ = list(db._write_requests([cell(f'A{r}', 1) for r in range(1, 8)]))
+    assert [len(r) for r in requests_] == [3, 3, 1]
+
+
+class FlakyWorksheet:
+    def __init__(self, failures):
+        self.failures = list(failures)
+        self.requests = []
+
+    def batch_update(self, updates):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.requests.append(updates)
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(db, 'init_google_sheets', lambda: object())
+    monkeypatch.setattr(db, '_write_quota', TokenBucket(1000, 1000))
+    monkeypatch.setattr(db.time, 'sleep', sleeps.append)
+    return sleeps
+
+
+def test_update_sheet_batch_retries_429_then_writes_merged_ranges(writer, monkeypatch):
+    ws = FlakyWorksheet([api_error(429, retry_after=3)])
+    monkeypatch.setattr(db, 'open_worksheet', lambda sheet_id, tab: ws)
+    assert db.update_sheet_batch('s', 'Tab', [cell(f'A{r}', 'Done') for r in range(2, 502)])
+    assert ws.requests == [[{'range': 'A2:A501', 'values': [['Done']] * 500}]]
+    assert writer and writer[0] >= 3  # Retry-After honored
+
+
+def test_update_sheet_batch_gives_up_on_client_errors(writer, monkeypatch):
+    ws = FlakyWorksheet([api_error(400)])
+    monkeypatch.setattr(db, 'open_worksheet', lambda sheet_id, tab: ws)
+    assert db.update_sheet_batch('s', 'Tab', [cell('A2', 'Done')]) is False
+    assert ws.requests == [] and writer == []
+
+
+def test_token_bucket_paces_after_the_burst():
+    bucket = TokenBucket(rate=50, capacity=2)
+    started = time.monotonic()
+    waits = [bucket.acquire() for _ in range(5)]
+    assert waits[:2] == [0.0, 0.0] and all(w > 0 for w in waits[2:])
+    assert time.monotonic() - started >= 3 / 50 * 0.9
+
+    bucket.hold(0.1)
+    assert bucket.acquire() >= 0.1
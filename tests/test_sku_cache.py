@@ -0,0 +1,93 @@
+"""
+Delta SKU sync: persisted map, token handling and fallbacks.
+"""
+
+import pytest
+from config import Config
+from src.repositories import sku_cache, woo
+
+SITE = "https://shop.test"
+
+
+class FakeServer:
+    """Stands in for get-all-skus: a product table plus a change counter."""
+
+    def __init__(self, products, versioned=True):
+        self.products = dict(products)  # id -> sku (published)
+        self.token = 10
+        self.versioned = versioned
+        self.changed = {}  # id -> token of last change
+        self.calls = []
+
+    def change(self, pid, sku=None):
+        self.token += 1
+        self.changed[pid] = self.token
+        if sku is None:
+            self.products.pop(pid, None)
+        else:
+            self.products[pid] = sku
+
+    def iter_sku_pairs(self, domain, secret, meta, policy=None):
+        self.calls.append("full")
+        if not self.versioned:
+            raise woo.WooStreamError("no versioned sync")
+        meta['token'] = str(self.token)
+        return iter([[pid, sku] for pid, sku in self.products.items()])
+
+    def iter_all_skus(self, domain, secret, policy=None):
+        self.calls.append("legacy")
+        return iter([x for pid, sku in self.products.items() for x in (pid, sku) if x])
+
+    def fetch_sku_delta(self, domain, secret, token, policy=None):
+        self.calls.append("delta")
+        since = int(token)
+        ids = [pid for pid, t in self.changed.items() if t > since]
+        return {"token": str(self.token),
+                "added": [[pid, self.products[pid]] for pid in ids if pid in self.products],
+                "removed": [[pid, ""] for pid in ids if pid not in self.products]}
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, 'CACHE_DIR', str(tmp_path))
+    srv = FakeServer({"1": "A-1", "2": "B-2", "3": ""})
+    for name in ("iter_sku_pairs", "iter_all_skus", "fetch_sku_delta"):
+        monkeypatch.setattr(woo, name, getattr(srv, name))
+    return srv
+
+
+def test_first_sync_downloads_everything(server):
+    assert sku_cache.sync_sku_set(SITE, "k") == {"1", "A-1", "2", "B-2", "3"}
+    assert server.calls == ["full"]
+    assert sku_cache.load_state(SITE)["token"] == "10"
+
+
+def test_second_sync_merges_delta(server):
+    sku_cache.sync_sku_set(SITE, "k")
+    server.change("2")              # unpublished
+    server.change("4", "D-4")       # new product
+    server.change("1", "A-1b")      # SKU renamed
+    result = sku_cache.sync_sku_set(SITE, "k")
+    assert result == {"1", "A-1b", "3", "4", "D-4"}
+    assert server.calls == ["full", "delta"]
+    assert sku_cache.load_state(SITE)["token"] == "13"
+
+
+def test_expired_token_falls_back_to_full(server, monkeypatch):
+    sku_cache.sync_sku_set(SITE, "k")
+    monkeypatch.setattr(woo, "fetch_sku_delta", lambda *a, **k: None)
+    server.change("5", "E-5")
+    assert "E-5" in sku_cache.sync_sku_set(SITE, "k")
+    assert server.calls == ["full", "full"]
+
+
+def test_old_snippet_uses_legacy_list_and_keeps_no_cache(server):
+    server.versioned = False
+    assert sku_cache.sync_sku_set(SITE, "k") == {"1", "A-1", "2", "B-2", "3"}
+    assert server.calls == ["full", "legacy"]
+    assert sku_cache.load_state(SITE) is None
+
+
+def test_cache_is_per_site(server):
+    sku_cache.sync_sku_set(SITE, "k")
+    assert sku_cache.load_state("https://other.test") is None
@@ -3,7 +3,7 @@ Unit tests for input validators.
 """
 
 import pytest
-from src.utils.validators import validate_product_data, validate_sheet_structure, ProductImport
+from src.utils.validators import validate_product_data, validate_sheet_structure, ProductImport, preflight_products
 from pydantic import ValidationError
 
 
@@ -122,5 +122,64 @@ class TestSheetStructureValidation:
         assert is_valid is True
 
 
+
+class TestPreflight:
+    """Test vectorized pre-flight validation of import payloads."""
+    
+    def test_valid_payloads_pass(self):
+        """Test that valid payloads get no error."""
+        payloads = [
+            {'sku': 'A1', 'title': 'Shirt', 'price': '19.99', 'images': ['https://example.com/a.jpg']},
+            {'sku': 'A2', 'title': 'Mug', 'price': '', 'description': 'x', 'images': []},
+        ]
+        
+        assert preflight_products(payloads) == [None, None]
+        assert preflight_products([]) == []
+    
+    def test_invalid_payloads_rejected(self):
+        """Test that each rule reports its first problem per row."""
+        payloads = [
+            {'sku': 'B<1', 'title': 'T', 'price': '1'},
+            {'sku': 'X' * 101, 'title': 'T', 'price': '1'},
+            {'sku': 'C1', 'title': '  ', 'price': 'abc'},
+            {'sku': 'D1', 'title': 'T', 'price': 'abc'},
+            {'sku': 'E1', 'title': 'T', 'price': '-1'},
+            {'sku': 'F1', 'title': 'T', 'images': ['https://ok', 'ftp://bad']},
+        ]
+        
+        errors = preflight_products(payloads)
+        
+        assert errors[0] == 'sku: contains invalid characters'
+        assert errors[1].startswith('sku: longer than')
+        assert errors[2] == 'title: cannot be empty'
+        assert errors[3] == 'price: not a number'
+        assert errors[4].startswith('price: must be between')
+        assert errors[5].startswith('images:')
+    
+    def test_duplicate_sku_last_row_wins(self):
+        """Test that only the last row of a repeated SKU is sent."""
+        payloads = [
+            {'sku': 'A', 'title': 'old'},
+            {'sku': 'B', 'title': 'b'},
+            {'sku': 'A', 'title': 'new'},
+        ]
+        
+        errors = preflight_products(payloads, row_numbers=[2, 3, 4])
+        
+        assert errors == ['Skipped: duplicate SKU, row 4 is used', None, None]
+    
+    def test_duplicate_sku_invalid_last_row_does_not_win(self):
+        """Test that an invalid last row does not suppress the valid rows of its SKU."""
+        payloads = [
+            {'sku': 'A', 'title': 'first'},
+            {'sku': 'A', 'title': 'second'},
+            {'sku': 'A', 'title': ''},
+        ]
+        
+        errors = preflight_products(payloads, row_numbers=[2, 3, 4])
+        
+        assert errors == ['Skipped: duplicate SKU, row 3 is used', None, 'title: cannot be empty']
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
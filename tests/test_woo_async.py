@@ -0,0 +1,95 @@
+"""
+Asyncio client and async service entry points against a local stand-in server.
+"""
+
+import asyncio
+import json
+from typing import Set
+from urllib.parse import urlparse
+
+import pytest
+from config import Config
+from src.repositories import woo_async
+from src.services import importer, deleter
+from tests.conftest import StandInWP
+
+
+class FakeWP(StandInWP):
+    html: Set[str] = set()  # endpoints answering 200 with an HTML error page (e.g. a caching plugin)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])) or b'{}')
+        path = urlparse(self.path).path.rsplit('/', 1)[-1]
+        if path in self.html:
+            return self.send_raw(200, b"<html>Fatal error</html>", "text/html")
+        if path == 'import-product-batch':
+            out = {'results': [{'sku': p['sku'], 'status': 'success'} for p in body['products']]}
+        elif path == 'delete-product-batch':
+            out = {'deleted_count': len(body['ids']), 'deleted_items': [f"SKU{i}" for i in body['ids']]}
+        elif path == 'update-media-batch':
+            out = {'status': 'success', 'updated_count': len(body['updates']), 'details': [{'msg': 'ok'}]}
+        else:  # process-pending-media
+            out = {'status': 'done', 'remaining': 0}
+        self.send_json(200, out)
+
+
+@pytest.fixture
+def handler():
+    FakeWP.html = set()
+    return FakeWP
+
+
+def test_non_json_answers_do_not_raise(server):
+    FakeWP.html = {'process-pending-media', 'delete-product-batch', 'update-media-batch'}
+
+    async def calls():
+        woo_async.open_site(server, 2)
+        try:
+            return (await woo_async.trigger_process_media(server, "s"),
+                    await woo_async.delete_products_batch_custom(server, "s", [1]),
+                    await woo_async.update_media_batch_custom(server, "s", [{'id': 1, 'title': 't'}]))
+        finally:
+            await woo_async.aclose_site(server)
+
+    media, deleted, updated = asyncio.run(calls())
+    assert media['status'] == 'error' and media['http_status'] == 200 and deleted == (False, 0, [])
+    assert updated['status'] == 'error' and 'Invalid JSON' in updated['message']
+    logs, skus = asyncio.run(deleter.delete_product_list_async(server, "s", [str(i) for i in range(120)], 3))
+    assert logs == ["Deleted 0 items."] and skus == []
+
+
+def test_requests_without_open_site_fail_fast(server):
+    with pytest.raises(RuntimeError):
+        asyncio.run(woo_async.delete_products_batch_custom(server, "s", [1]))
+    assert woo_async._clients == {}
+
+
+def test_shared_client_survives_until_the_last_job_and_grows_its_limit(server):
+    async def jobs():
+        woo_async.open_site(server, 2)
+        woo_async.open_site(server, 5)  # second job on the same site wants more
+        client, sem = woo_async.get_client(server)
+        limit = sem._value
+        await woo_async.aclose_site(server)
+        ok = await woo_async.delete_products_batch_custom(server, "s", [1, 2])  # other job still running
+        still_open = not client.is_closed
+        await woo_async.aclose_site(server)
+        return limit, ok, still_open, client.is_closed, len(woo_async._clients)
+
+    assert asyncio.run(jobs()) == (5, (True, 2, ['SKU1', 'SKU2']), True, True, 0)
+
+
+def test_process_import_async_end_to_end(server, monkeypatch):
+    written = []
+    monkeypatch.setattr(importer.db, 'update_sheet_batch', lambda s, t, u: written.extend(u) or True)
+    monkeypatch.setattr(Config, 'IMPORT_SKIP_UNCHANGED', False)
+    rows = [{'SKU': f"P{i}", 'Name': f"Product {i}", 'Regular price': '9.5', '_real_row': i + 2} for i in range(45)]
+    logs = asyncio.run(importer.process_import_async(rows, server, "s", 'data', 'sheet', 'Tab', 2))
+    assert logs[-1] == "=== ALL PHASES COMPLETED ==="
+    assert sorted(u['range'] for u in written) == sorted(f"A{i + 2}" for i in range(45))
+    assert all(u['values'] == [['Done']] for u in written)
+
+    FakeWP.html = {'import-product-batch'}  # a 200 HTML page marks the rows instead of killing the import
+    written.clear()
+    asyncio.run(importer.process_import_async(rows[:3], server, "s", 'data', 'sheet', 'Tab', 2))
+    assert {u['values'][0][0] for u in written} == {"Error: invalid response"}
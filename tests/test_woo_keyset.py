@@ -0,0 +1,113 @@
+"""
+Keyset pagination tests against a local stand-in for the WordPress API.
+"""
+
+from typing import Set
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+from config import Config
+from src.repositories import woo
+from src.services import media_updater
+from src.utils.retry import RetryPolicy
+from tests.conftest import StandInWP
+
+MEDIA_IDS = [i for i in range(1, 5001) if i % 3 != 0]  # sparse IDs like a real posts table
+
+
+class FakeWP(StandInWP):
+    keyset = True
+    fail_max: Set[int] = set()  # max_id values whose newest-first page always fails
+    max_failures = 0
+    html_probe = False  # newest-id probe (limit=1, no cursor) answers a 200 HTML page
+    fail_once: Set[int] = set()  # after_id values that fail on first request
+    seen_failures: Set[int] = set()
+
+    def do_GET(self):
+        q = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        limit = int(q.get('limit', 50))
+        if self.html_probe and limit == 1 and 'after_id' not in q and 'max_id' not in q:
+            return self.send_raw(200, b"<html><body>Fatal error</body></html>", "text/html")
+        if 'after_id' in q and self.keyset:
+            after, top = int(q['after_id']), int(q.get('max_id', 10 ** 9))
+            if after in self.fail_once and after not in self.seen_failures:
+                self.seen_failures.add(after)
+                return self.send_json(500, {"status": "error"})
+            ids = [i for i in MEDIA_IDS if after < i <= top][:limit]
+        elif 'max_id' in q and self.keyset:
+            if int(q['max_id']) in self.fail_max:
+                FakeWP.max_failures += 1
+                return self.send_json(404, {"status": "error"})
+            ids = sorted((i for i in MEDIA_IDS if i <= int(q['max_id'])), reverse=True)[:limit]
+        else:
+            ids = sorted(MEDIA_IDS, reverse=True)[:limit]
+        self.send_json(200, [{"id": str(i), "url": f"https://x.test/img-{i}.png", "title": "", "date": ""} for i in ids])
+
+
+@pytest.fixture
+def handler():
+    FakeWP.keyset = True
+    FakeWP.html_probe = False
+    FakeWP.fail_max = set()
+    FakeWP.max_failures = 0
+    FakeWP.fail_once = set()
+    FakeWP.seen_failures = set()
+    return FakeWP
+
+
+def fast_policy():
+    return RetryPolicy(max_attempts=1, base_delay=0.01, budget=None)
+
+
+def test_full_scan_returns_every_id_once(server):
+    items = list(woo.iter_media_keyset(server, "s", page_size=100, workers=4, policy=fast_policy()))
+    ids = [int(m['id']) for m in items]
+    assert len(ids) == len(MEDIA_IDS)
+    assert sorted(ids) == MEDIA_IDS
+
+
+def test_failed_page_is_retried_alone(server):
+    FakeWP.fail_once = {0, 2500}
+    items = list(woo.iter_media_keyset(server, "s", page_size=100, workers=4, policy=fast_policy()))
+    assert sorted(int(m['id']) for m in items) == MEDIA_IDS
+
+
+def test_limit_returns_the_newest_items(server):
+    items = list(woo.iter_media_keyset(server, "s", limit=250, page_size=100, workers=2, policy=fast_policy()))
+    assert [int(m['id']) for m in items] == sorted(MEDIA_IDS, reverse=True)[:250]
+
+    items = list(woo.iter_media_keyset(server, "s", limit=200, policy=fast_policy()))  # default page size
+    assert [int(m['id']) for m in items] == sorted(MEDIA_IDS, reverse=True)[:200]
+
+
+def test_limit_on_server_without_max_id_support(server):
+    FakeWP.keyset = False
+    with pytest.raises(woo.WooStreamError):
+        list(woo.iter_media_keyset(server, "s", limit=250, page_size=100, policy=fast_policy()))
+
+
+def test_server_without_keyset_support(server):
+    FakeWP.keyset = False
+    with pytest.raises(woo.WooStreamError):
+        list(woo.iter_media_keyset(server, "s", page_size=100, workers=2, policy=fast_policy()))
+
+
+def test_html_on_the_newest_id_probe_falls_back(server):
+    FakeWP.html_probe = True
+    with pytest.raises(woo.WooStreamError):
+        list(woo.iter_media_keyset(server, "s", page_size=100, policy=fast_policy()))
+    with pytest.raises(woo.WooStreamError):
+        list(woo.iter_media_keyset(server, "s", limit=50, policy=fast_policy()))
+    # the media sync falls back to the legacy single request instead of crashing
+    media = list(media_updater.iter_all_media(server, "s", limit=50))
+    assert [int(m['media_id']) for m in media] == sorted(MEDIA_IDS, reverse=True)[:50]
+
+
+def test_media_stream_falls_back_mid_scan_without_duplicates(server, monkeypatch):
+    monkeypatch.setattr(Config, 'KEYSET_PAGE_RETRIES', 1)
+    monkeypatch.setattr(Config, 'KEYSET_PAGE_SIZE', 100)
+    newest = sorted(MEDIA_IDS, reverse=True)
+    FakeWP.fail_max = {newest[99] - 1}  # the second page of 100
+    media = list(media_updater.iter_all_media(server, "s", limit=250))
+    assert FakeWP.max_failures == 1
+    assert [int(m['media_id']) for m in media] == newest[:250]
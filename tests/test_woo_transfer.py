@@ -0,0 +1,48 @@
+"""
+Request-body compression and bytes-on-wire counters.
+"""
+
+import gzip
+import json
+
+import pytest
+from config import Config
+from src.repositories import woo
+
+
+@pytest.fixture(autouse=True)
+def clean_state(monkeypatch, woo_tmp):
+    monkeypatch.setattr(woo, '_compress_sites', set())
+    monkeypatch.setattr(woo, '_transfer', {})
+    monkeypatch.setattr(Config, 'GZIP_REQUESTS', False)
+
+
+def test_plain_body_when_not_opted_in():
+    data, headers, raw = woo.encode_json_body("https://a.test", {"ids": list(range(1000))})
+    assert "Content-Encoding" not in headers
+    assert json.loads(data) == {"ids": list(range(1000))}
+    assert raw == len(data)
+
+
+def test_gzip_body_for_opted_in_site():
+    payload = {"products": [{"sku": f"S{i}", "description": "<p>x</p>" * 20} for i in range(50)]}
+    woo.set_compression("https://A.test/", True)
+    data, headers, raw = woo.encode_json_body("https://a.test", payload)
+    assert headers["Content-Encoding"] == "gzip"
+    assert len(data) < raw
+    assert json.loads(gzip.decompress(data)) == payload
+
+
+def test_small_body_not_compressed():
+    woo.set_compression("https://a.test", True)
+    _, headers, _ = woo.encode_json_body("https://a.test", {"ids": [1]})
+    assert "Content-Encoding" not in headers
+
+
+def test_transfer_counters_per_site_and_endpoint():
+    woo.record_transfer("https://a.test", "import-product-batch", 100, 400, 50, 200)
+    woo.record_transfer("https://a.test", "import-product-batch", 100, 400, 50, 200)
+    woo.record_transfer("https://b.test", "get-all-skus", 0, 0, 10, 90)
+    stats = woo.get_transfer_stats("https://a.test")
+    assert stats == {("https://a.test", "import-product-batch"):
+                     {"calls": 2, "sent_wire": 200, "sent_raw": 800, "recv_wire": 100, "recv_raw": 400}}
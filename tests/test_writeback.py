@@ -0,0 +1,72 @@
+"""
+Streaming sheet write-back: request paging, retries and background flushes.
+"""
+
+import threading
+import pytest
+from config import Config
+from src.repositories import journal
+from src.services import writeback
+
+SITE = "https://shop.test"
+
+
+@pytest.fixture(autouse=True)
+def setup(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(writeback.time, 'sleep', lambda s: None)
+
+
+def updates(n, start=2):
+    return [{'range': f'A{r}', 'values': [['Done']]} for r in range(start, start + n)]
+
+
+def test_pages_respect_count_and_bytes(monkeypatch):
+    monkeypatch.setattr(Config, 'SHEET_MAX_UPDATES_PER_REQUEST', 3)
+    pending = list(enumerate(updates(7)))
+    assert [len(p) for p in writeback._pages(pending)] == [3, 3, 1]
+
+    monkeypatch.setattr(Config, 'SHEET_MAX_REQUEST_BYTES', 100)
+    big = [(0, {'range': 'A2', 'values': [['x' * 80]]}), (1, {'range': 'A3', 'values': [['y']]})]
+    assert [len(p) for p in writeback._pages(big)] == [1, 1]
+
+
+def test_failed_request_stays_pending(monkeypatch):
+    monkeypatch.setattr(Config, 'SHEET_MAX_UPDATES_PER_REQUEST', 2)
+    calls = []
+    # first page goes through, second page fails (db.update_sheet_batch already retried it)
+    monkeypatch.setattr(writeback.db, 'update_sheet_batch', lambda s, t, u: calls.append(len(u)) or len(calls) == 1)
+    job = journal.start_job('import', SITE, 'sheet', 'Tab', 4)
+    journal.record_chunk(job, 4, {}, updates(4))
+
+    assert writeback.flush_pending(job, 'sheet', 'Tab') == (2, 2)
+    assert calls == [2, 2]
+    assert [u['range'] for _, u in journal.pending_writes(job)] == ['A4', 'A5']
+
+
+def test_writer_flushes_while_job_runs(monkeypatch):
+    flushed = threading.Event()
+    written = []
+    monkeypatch.setattr(writeback.db, 'update_sheet_batch', lambda s, t, u: written.extend(u) or flushed.set() or True)
+    job = journal.start_job('import', SITE, 'sheet', 'Tab', 10)
+    writer = writeback.SheetWriteBack(job, 'sheet', 'Tab', every_rows=5, every_seconds=60).start()
+
+    journal.record_chunk(job, 5, {}, updates(5))
+    writer.added(5)
+    assert flushed.wait(5)  # row threshold reached, no need to wait for the timer
+    journal.record_chunk(job, 2, {}, updates(2, start=7))
+    writer.added(2)
+
+    assert writer.close() == (7, 0)
+    assert len(written) == 7
+
+
+def test_close_flushes_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(writeback.db, 'update_sheet_batch', lambda s, t, u: calls.append(len(u)) and False)
+    job = journal.start_job('import', SITE, 'sheet', 'Tab', 3)
+    journal.record_chunk(job, 3, {}, updates(3))
+    writer = writeback.SheetWriteBack(job, 'sheet', 'Tab').start()
+    assert writer.close() == (0, 3)
+    assert writer.close() == (0, 3)  # process_import's finally after close_import_job
+    assert calls == [3]